@@ -0,0 +1,252 @@
+""" aggregate.py
+        Summarizes the results files of every subject into one table,
+        results/Summary.csv by default. Results files are read in parallel by
+        a pool of processes, and a file that has the same size and modified
+        time, and the same archive sizes, as in the last run is not read again,
+        its rows are kept in the checkpoint file results/AggregateCheckpoint.json.
+
+        Every subject gets a row for each task in each session, and a row for
+        each task over all of its sessions (session 'all'), with:
+            trials, correct, accuracy         - correct and accuracy only for MTS, DMTS and LS,
+                                                the other tasks do not log timeouts
+            trials_to_criterion               - trials the task took when the session went on to
+                                                another task after it, blank if it did not finish
+            block_accuracy                    - accuracy of every block of --block trials, separated by ';'
+            latency mean, p50, p90, min, max  - seconds from the stimulus onset to the response
+            first_move_p50                    - seconds from the stimulus onset to the first movement
+            side_levels                       - Side levels in the order they were played, separated by ';'
+            ls_curve                          - LS accuracy of the 1st, 2nd, ... trial of a problem, separated by ';'
+
+        e.g. 'python aggregate.py' or 'python aggregate.py results/ --workers 4'
+"""
+
+import os, csv, json, glob, time, argparse, collections, concurrent.futures
+
+# streaming results file parser, main/results.py
+import results
+
+# archive of the past sessions of the results files, main/archive.py
+import archive
+
+main_dir = os.path.split(os.path.abspath(__file__))[0] # current starting directory, should be main/
+
+# columns of the summary table
+COLUMNS = ('subject', 'session', 'date', 'task', 'trials', 'correct', 'accuracy', 'trials_to_criterion', 'block_accuracy',
+           'latency_mean', 'latency_p50', 'latency_p90', 'latency_min', 'latency_max', 'first_move_p50', 'side_levels', 'ls_curve')
+
+# tasks that log if the trial was correct
+CHOICE_TASKS = ('MTS', 'DMTS', 'LS')
+
+""" Function to get a percentile of sorted values
+    @param values sorted list
+    @param percent 0 to 100
+    @return value at the percentile, nearest rank """
+def percentile(values, percent):
+    index = max(0, min(len(values) - 1, int(round(percent / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+""" Function to round a number for the table
+    @param value number or None
+    @return rounded number or '' """
+def rounded(value, digits = 3):
+    return '' if value is None else round(value, digits)
+
+""" Class that keeps the trials of a task in a session, or in every session """
+class TaskStats:
+    """ TaskStats Constructor
+        @param self """
+    def __init__(self):
+        self.date = None # time of the first trial
+        self.trials = 0
+        self.correct = 0
+        self.results = [] # True/False of every trial of MTS, DMTS and LS
+        self.latencies = []
+        self.first_moves = []
+        self.levels = [] # Side levels in order
+        self.problems = collections.OrderedDict() # LS (session, problem): [True/False of its trials]
+        self.finished = False # the session went on to another task
+
+    """ Function to add a trial
+        @param self
+        @param record of the trial from results.read_records() """
+    def add(self, record):
+        if self.date is None:
+            self.date = record.time
+        self.trials += 1
+        if record.latency is not None:
+            self.latencies.append(record.latency)
+        if record.first_move is not None:
+            self.first_moves.append(record.first_move)
+
+        if record.task in CHOICE_TASKS:
+            correct = record.result == 'Correct'
+            self.correct += correct
+            self.results.append(correct)
+            if record.task == 'LS':
+                self.problems.setdefault((record.session, record.problem), []).append(correct)
+        elif record.task == 'Side' and (not self.levels or self.levels[-1] != record.level):
+            self.levels.append(record.level)
+
+    """ Function to make the row of the summary table
+        @param self
+        @param subject ID
+        @param session number or 'all'
+        @param task name
+        @param block number of trials in an accuracy block
+        @return dictionary of the COLUMNS """
+    def row(self, subject, session, task, block):
+        row = dict.fromkeys(COLUMNS, '')
+        row.update(subject = subject, session = session, task = task, trials = self.trials)
+        row['date'] = '' if self.date is None else self.date.strftime('%Y-%m-%d %H:%M:%S')
+
+        if self.results:
+            row['correct'] = self.correct
+            row['accuracy'] = rounded(self.correct / len(self.results))
+            row['block_accuracy'] = ';'.join(str(rounded(sum(self.results[i:i + block]) / len(self.results[i:i + block]))) for i in range(0, len(self.results), block))
+        if self.finished:
+            row['trials_to_criterion'] = self.trials
+
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            row['latency_mean'] = rounded(sum(latencies) / len(latencies))
+            row['latency_p50'] = rounded(percentile(latencies, 50))
+            row['latency_p90'] = rounded(percentile(latencies, 90))
+            row['latency_min'] = rounded(latencies[0])
+            row['latency_max'] = rounded(latencies[-1])
+        if self.first_moves:
+            row['first_move_p50'] = rounded(percentile(sorted(self.first_moves), 50))
+
+        if self.levels:
+            row['side_levels'] = ';'.join(str(level) for level in self.levels)
+        if self.problems:
+            # accuracy of the nth trial over every problem
+            curve = []
+            for n in range(max(len(trials) for trials in self.problems.values())):
+                nth = [trials[n] for trials in self.problems.values() if len(trials) > n]
+                curve.append(str(rounded(sum(nth) / len(nth))))
+            row['ls_curve'] = ';'.join(curve)
+        return row
+
+""" Function to summarize one results file, run in the process pool
+    @param path of {ID}Data.txt
+    @param block number of trials in an accuracy block
+    @return list of rows of the summary table """
+def summarize_file(path, block):
+    subject = results.subject_of(path)
+    sessions = collections.OrderedDict() # (session, task): TaskStats
+    overall = collections.OrderedDict() # task: TaskStats over every session
+    last = None # (session, task) of the last trial
+
+    for record in results.read_records(path, errors = 'skip'):
+        if record.task == 'Session':
+            continue
+
+        key = (record.session, record.task)
+        if last is not None and last != key and last[0] == record.session:
+            sessions[last].finished = True # the session went on to another task
+        last = key
+
+        if key not in sessions:
+            sessions[key] = TaskStats()
+        sessions[key].add(record)
+        if record.task not in overall:
+            overall[record.task] = TaskStats()
+        overall[record.task].add(record)
+
+    rows = [stats.row(subject, session, task, block) for (session, task), stats in sessions.items()]
+    rows.extend(stats.row(subject, 'all', task, block) for task, stats in overall.items())
+    return rows
+
+""" Function to read the checkpoint of the last run
+    @param path of the checkpoint file
+    @return dictionary of {results file: {'size', 'mtime', 'archive', 'block', 'rows'}} """
+def load_checkpoint(path):
+    try:
+        with open(path, 'r') as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return {}
+
+""" Function to get the sizes of the archive of a results file, the results are
+        read through it so it has to be part of the checkpoint key too
+    @param path of the results file
+    @return [index bytes, compressed archive bytes], 0 for a file that is missing """
+def archive_sizes(path):
+    sizes = []
+    for archive_file in (archive.index_path(path), archive.archive_path(path)):
+        try:
+            sizes.append(os.path.getsize(archive_file))
+        except OSError:
+            sizes.append(0)
+    return sizes
+
+""" Function to write the checkpoint, replacing the old one only once it is written
+    @param path of the checkpoint file
+    @param checkpoint dictionary from load_checkpoint() """
+def save_checkpoint(path, checkpoint):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_path, path)
+
+""" Function to summarize every results file in a directory
+    @param results_path directory of the {ID}Data.txt files
+    @param output path of the summary table
+    @param checkpoint_path path of the checkpoint file
+    @param workers number of processes, None for one per CPU
+    @param block number of trials in an accuracy block
+    @param full True to read every file again, even if it has not changed
+    @return (files read, files skipped) """
+def aggregate(results_path, output, checkpoint_path, workers = None, block = 10, full = False):
+    paths = sorted(glob.glob(os.path.join(results_path, '*Data.txt')))
+    checkpoint = {} if full else load_checkpoint(checkpoint_path)
+
+    # only read the files that changed since the last run
+    changed = []
+    for path in paths:
+        stat = os.stat(path)
+        sizes = archive_sizes(path)
+        entry = checkpoint.get(path)
+        if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns or entry.get('archive') != sizes or entry['block'] != block:
+            changed.append((path, stat, sizes))
+
+    if changed:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as pool:
+            futures = {pool.submit(summarize_file, path, block): (path, stat, sizes) for path, stat, sizes in changed}
+            for future in concurrent.futures.as_completed(futures):
+                path, stat, sizes = futures[future]
+                checkpoint[path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'archive': sizes, 'block': block, 'rows': future.result()}
+
+    # files that were removed are dropped from the checkpoint
+    checkpoint = {path: checkpoint[path] for path in paths}
+
+    with open(output, 'w', newline = '') as output_file:
+        writer = csv.DictWriter(output_file, COLUMNS)
+        writer.writeheader()
+        for path in paths:
+            writer.writerows(checkpoint[path]['rows'])
+
+    save_checkpoint(checkpoint_path, checkpoint)
+    return len(changed), len(paths) - len(changed)
+
+""" Main function, summarizes the results files given on the command line """
+def main():
+    parser = argparse.ArgumentParser(description = 'Summarize the results of every subject into one table')
+    parser.add_argument('results', nargs = '?', default = os.path.join(main_dir, 'results'), help = 'directory of the {ID}Data.txt files, main/results by default')
+    parser.add_argument('--output', help = 'summary table to write, Summary.csv in the results directory by default')
+    parser.add_argument('--checkpoint', help = 'checkpoint file, AggregateCheckpoint.json in the results directory by default')
+    parser.add_argument('--full', action = 'store_true', help = 'read every file again, even if it has not changed')
+    parser.add_argument('--workers', type = int, help = 'number of processes, one per CPU by default')
+    parser.add_argument('--block', type = int, default = 10, help = 'trials in an accuracy block, 10 by default')
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.results, 'Summary.csv')
+    checkpoint_path = args.checkpoint or os.path.join(args.results, 'AggregateCheckpoint.json')
+
+    start = time.perf_counter()
+    read, skipped = aggregate(args.results, output, checkpoint_path, args.workers, args.block, args.full)
+    print('{} files read, {} unchanged, written to {} in {:.2f}s'.format(read, skipped, output, time.perf_counter() - start))
+
+""" this calls the 'main' function when this script is executed """
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+""" archive.py
+        Keeps the results files of a subject from growing without end. When a
+        session starts, the sessions already in {ID}Data.txt and {ID}Data.jsonl
+        are moved into an archive next to the file, so the results file only
+        ever holds the session being run:
+            {ID}Data.txt.gz   - every session compressed as its own gzip member,
+                                so one can be decompressed without the others
+            {ID}Data.txt.idx  - one line per archived session:
+                                session  started  ended  offset  length  data_offset  data_length  lines
+                                started and ended are the times of its first and last line, offset and
+                                length are the bytes of its gzip member in the archive, data_offset and
+                                data_length are where its lines are in the whole history of the file
+
+        Sessions are split like results.py counts them, at a 'Session' line,
+        or in older files at a trial number that does not go up. Moving the
+        sessions only reads the results file (one session) and the end of the
+        index, so it takes the same time however many sessions are archived.
+
+        results.read_records() reads the archive before the results file, so
+        the results still read as one file. read_session() seeks straight to
+        one session.
+
+        'python archive.py results/{ID}Data.txt' lists the sessions,
+        '--session N' prints one of them, '--rotate' archives the sessions in the file now.
+"""
+
+import os, gzip, json, collections, argparse
+
+# last line repair of the results files, main/resultswriter.py
+import resultswriter
+
+# session counting of the results files, main/results.py
+import results
+
+# archived session in the index
+Segment = collections.namedtuple('Segment', 'session started ended offset length data_offset data_length lines')
+
+""" Function to get the archive of a results file
+    @param path of the results file
+    @return path of the archive """
+def archive_path(path):
+    return path + '.gz'
+
+""" Function to get the index of the archive of a results file
+    @param path of the results file
+    @return path of the index """
+def index_path(path):
+    return path + '.idx'
+
+""" Function to parse a line of the index
+    @param line text of the line
+    @return Segment """
+def parse_segment(line):
+    session, started, ended, offset, length, data_offset, data_length, lines = line.rstrip('\n').split('  ')
+    return Segment(int(session), started, ended, int(offset), int(length), int(data_offset), int(data_length), int(lines))
+
+""" Function to read every archived session of a results file
+    @param path of the results file
+    @return list of Segment, empty if nothing is archived """
+def read_index(path):
+    try:
+        with open(index_path(path), 'r') as index_file:
+            return [parse_segment(line) for line in index_file if line.strip()]
+    except OSError:
+        return []
+
+""" Function to read the last archived session, only reading the end of the index
+    @param path of the results file
+    @return Segment, or None if nothing is archived """
+def last_segment(path):
+    try:
+        with open(index_path(path), 'rb') as index_file:
+            size = index_file.seek(0, os.SEEK_END)
+            index_file.seek(max(0, size - 4096))
+            lines = index_file.read().splitlines()
+    except OSError:
+        return None
+    lines = [line for line in lines if line.strip()]
+    return parse_segment(lines[-1].decode()) if lines else None
+
+""" Function to get the size of the archived sessions of a results file
+    @param path of the results file
+    @return bytes of their lines before they were compressed """
+def archived_size(path):
+    last = last_segment(path)
+    return 0 if last is None else last.data_offset + last.data_length
+
+""" Function to get the size of the whole history of a results file
+    @param path of the results file
+    @return bytes archived plus bytes in the results file """
+def history_size(path):
+    try:
+        return archived_size(path) + os.path.getsize(path)
+    except OSError:
+        return archived_size(path)
+
+""" Function to get the time and session key of a line of a results file
+    @param line bytes of the line
+    @param json_lines True for a .jsonl results file
+    @return (time text, task, total trials) """
+def line_key(line, json_lines):
+    if json_lines:
+        record = json.loads(line)
+        return record['time'], record['task'], record.get('total_trials')
+    parts = line.decode().rstrip('\n').split('  ')
+    task = parts[1]
+    if task == 'Session':
+        return parts[0], task, None
+    try:
+        return parts[0], task, int(parts[2])
+    except ValueError:
+        return parts[0], task, results.convert('total_trials', parts[2])
+
+""" Function to split the lines of a results file into sessions
+    @param data bytes of the results file, whole lines
+    @param json_lines True for a .jsonl results file
+    @return list of (started, ended, bytes of the lines, number of lines) """
+def split_sessions(data, json_lines):
+    sessions = results.SessionCounter()
+    segments = []
+    current = None
+    stamp = ''
+    for line in data.splitlines(keepends = True):
+        try:
+            stamp, task, total_trials = line_key(line, json_lines)
+            session = sessions.next(task, total_trials)
+        except (KeyError, ValueError, IndexError):
+            session = sessions.session # a blank line or one that cannot be read stays in the session it is in
+
+        if current is None or session != current[0]:
+            current = [session, stamp, stamp, [], 0]
+            segments.append(current)
+        current[2] = stamp
+        current[3].append(line)
+        current[4] += 1
+    return [(started, ended, b''.join(lines), count) for session, started, ended, lines, count in segments]
+
+""" Function to move the sessions in a results file into its archive and empty it
+    @param path of the results file
+    @param fsync True to fsync the archive and index before the results file is emptied
+    @return number of sessions archived """
+def rotate(path, fsync = True):
+    if not os.path.exists(path):
+        return 0
+    resultswriter.repair(path) # only whole lines are archived
+    with open(path, 'rb') as results_file:
+        data = results_file.read()
+    if not data.strip():
+        return 0
+
+    segments = split_sessions(data, path.endswith('.jsonl'))
+    last = last_segment(path)
+
+    # the sessions were archived but the results file was not emptied before a crash or power cut
+    if last is not None and (last.started, last.ended, last.lines) == (segments[-1][0], segments[-1][1], segments[-1][3]):
+        segments = []
+
+    session = 0 if last is None else last.session
+    data_offset = 0 if last is None else last.data_offset + last.data_length
+    entries = []
+    with open(archive_path(path), 'ab') as archive_file:
+        offset = archive_file.seek(0, os.SEEK_END)
+        for started, ended, lines, count in segments:
+            member = gzip.compress(lines)
+            archive_file.write(member)
+            session += 1
+            entries.append('  '.join(str(value) for value in (session, started, ended, offset, len(member), data_offset, len(lines), count)) + '\n')
+            offset += len(member)
+            data_offset += len(lines)
+        if fsync:
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+    # the index only lists sessions once they are in the archive, and the results file is only emptied once they are listed
+    with open(index_path(path), 'a') as index_file:
+        index_file.write(''.join(entries))
+        if fsync:
+            index_file.flush()
+            os.fsync(index_file.fileno())
+
+    with open(path, 'wb'):
+        pass
+    return len(segments)
+
+""" Function to read the lines of an archived session
+    @param path of the results file
+    @param segment Segment of the session from the index
+    @return text of its lines """
+def read_segment(path, segment):
+    with open(archive_path(path), 'rb') as archive_file:
+        archive_file.seek(segment.offset)
+        return gzip.decompress(archive_file.read(segment.length)).decode()
+
+""" Function to read one session of a results file, archived or not
+    @param path of the results file
+    @param session number, counted from 1 over the whole history of the file
+    @return list of its lines, empty if there is no such session """
+def read_session(path, session):
+    for segment in read_index(path):
+        if segment.session == session:
+            return read_segment(path, segment).splitlines(keepends = True)
+
+    # sessions after the archived ones are in the results file
+    last = last_segment(path)
+    first = 1 if last is None else last.session + 1
+    if session < first or not os.path.exists(path):
+        return []
+    with open(path, 'rb') as results_file:
+        segments = split_sessions(results_file.read(), path.endswith('.jsonl'))
+    if session - first >= len(segments):
+        return []
+    return segments[session - first][2].decode().splitlines(keepends = True)
+
+""" Function to read every line of the whole history of a results file, one at a time
+    @param path of the results file
+    @return generator of lines, the archived sessions first, then the results file """
+def iter_lines(path):
+    for segment in read_index(path):
+        yield from read_segment(path, segment).splitlines(keepends = True)
+    if os.path.exists(path):
+        with open(path, 'r') as results_file:
+            yield from results_file
+
+""" Main function, lists, prints or archives the sessions of a results file """
+def main():
+    parser = argparse.ArgumentParser(description = 'List or read the archived sessions of a results file')
+    parser.add_argument('path', help = 'results/{ID}Data.txt or results/{ID}Data.jsonl')
+    parser.add_argument('--session', type = int, help = 'print the lines of this session')
+    parser.add_argument('--rotate', action = 'store_true', help = 'archive the sessions in the results file now')
+    args = parser.parse_args()
+
+    if args.rotate:
+        print('{} sessions archived'.format(rotate(args.path)))
+    if args.session is not None:
+        print(''.join(read_session(args.path, args.session)), end = '')
+    elif not args.rotate:
+        for segment in read_index(args.path):
+            print('{:5}  {}  {}  {:7} lines  {:9} bytes'.format(segment.session, segment.started, segment.ended, segment.lines, segment.length))
+
+""" this calls the 'main' function when this script is executed """
+if __name__ == '__main__':
+    main()
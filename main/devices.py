@@ -0,0 +1,312 @@
+""" devices.py
+        Device layer for game.py. The reward motor, the input device and the
+        display each have backends that can be picked on the command line,
+        either one at a time or all together with a profile:
+
+            rig      - adafruit stepper motor PiHAT, joystick, fullscreen display (default)
+            desktop  - simulated motor, joystick, 1280x720 window
+            sim      - simulated motor, simulated joystick, SDL dummy display with no window,
+                       so a whole session can run headless on a plain Linux machine
+
+        e.g. 'python game.py --profile sim --subject TEST --max-trials 50'
+
+        Input devices record every change of the axes as a timestamped sample
+        when it happens, instead of being polled once a frame, so the game can
+        move the Pointer and time responses between frames.
+"""
+
+import os, random, time, threading, collections, struct, logging
+
+# pip install pygame --user
+import pygame
+
+# pellet dispenser motor backends, main/dispenser.py
+import dispenser
+
+# messages about the devices, shown by the program running the session
+log = logging.getLogger('devices')
+
+# backends of every device for each profile
+PROFILES = {
+    'rig': {'motor': 'motorkit', 'input': 'joystick', 'display': 'fullscreen'},
+    'desktop': {'motor': 'simulated', 'input': 'joystick', 'display': 'window'},
+    'sim': {'motor': 'simulated', 'input': 'simulated', 'display': 'dummy'},
+}
+
+MOTORS = ('motorkit', 'simulated')
+INPUTS = ('joystick', 'simulated')
+DISPLAYS = ('fullscreen', 'window', 'dummy')
+
+# samples kept for the input device until they are read, the oldest are dropped past this
+MAX_SAMPLES = 4096
+
+# linux joystick device read on a thread, and its event struct (time in ms, value, type, axis or button number)
+JOYSTICK_DEVICE = '/dev/input/js0'
+JS_EVENT = struct.Struct('<IhBB')
+JS_EVENT_AXIS = 0x02
+
+# size of the display for the window and dummy backends
+WINDOW_SIZE = (1280, 720)
+DUMMY_SIZE = (1920, 1080)
+
+""" Class for errors setting up a device """
+class DeviceError(Exception):
+    pass
+
+""" Function to pick the backend of every device
+    @param profile name of the profile in PROFILES to start from
+    @param motor backend to use instead of the profile's, or None
+    @param input backend to use instead of the profile's, or None
+    @param display backend to use instead of the profile's, or None
+    @return dictionary of the backend names by device """
+def select(profile, motor = None, input = None, display = None):
+    backends = dict(PROFILES[profile])
+    if motor is not None:
+        backends['motor'] = motor
+    if input is not None:
+        backends['input'] = input
+    if display is not None:
+        backends['display'] = display
+    return backends
+
+""" Function to make the motor backend for the pellet dispenser
+    @param kind of backend, 'motorkit' or 'simulated'
+    @return backend with a step(forward) function """
+def make_motor(kind):
+    if kind == 'simulated':
+        return dispenser.SimulatedBackend()
+
+    try:
+        return dispenser.MotorKitBackend()
+    # if PiHAT board is not connected
+    except (NotImplementedError, ImportError, ValueError, OSError):
+        raise DeviceError('PiHAT board not setup properly')
+
+""" Base class for the input devices, keeps the axis samples in the order they happened
+        every sample is (time, x, y), time from time.perf_counter() of when the axes changed,
+        x and y the position of the axes from -1 to 1 after the change """
+class InputDevice:
+    """ InputDevice Constructor
+        @param self """
+    def __init__(self):
+        self.samples = collections.deque(maxlen = MAX_SAMPLES) # samples not read yet
+        self.axes = (0.0, 0.0) # position of the axes after the last sample
+
+    """ Function to add a sample, can be called from a sampling thread
+        @param self
+        @param t time.perf_counter() of the change
+        @param x position of axis 0
+        @param y position of axis 1 """
+    def record(self, t, x, y):
+        self.axes = (x, y)
+        self.samples.append((t, x, y))
+
+    """ Function to take every sample recorded since the last read
+        @param self
+        @return list of (time, x, y), oldest first """
+    def read(self):
+        samples = []
+        while self.samples:
+            samples.append(self.samples.popleft())
+        return samples
+
+    """ Function called once every frame before the sprites are updated
+        @param self """
+    def poll(self):
+        pass
+
+    """ Function called with every pygame event the game loop handles
+        @param self
+        @param event from pygame """
+    def handle_event(self, event):
+        pass
+
+    """ Function to get the latest position of an axis
+        @param self
+        @param axis 0 for x, 1 for y
+        @return position from -1 to 1 """
+    def get_axis(self, axis):
+        return self.axes[axis]
+
+    """ Function to stop the input device
+        @param self """
+    def close(self):
+        pass
+
+""" Class for joystick 0 as the input device. On Linux the joystick is read on its own
+        thread from JOYSTICK_DEVICE, stamped with the kernel time of every change, otherwise
+        the JOYAXISMOTION events are stamped when the game loop handles them """
+class JoystickInput(InputDevice):
+    """ JoystickInput Constructor, the pygame display needs to be initialized first
+        @param self
+        @param device_path of the linux joystick device to read on a thread """
+    def __init__(self, device_path = JOYSTICK_DEVICE):
+        InputDevice.__init__(self)
+
+        # only the joystick module of pygame is initialized for it, not the whole of pygame
+        pygame.joystick.init()
+
+        # Count the joysticks the computer has
+        if pygame.joystick.get_count() == 0:
+            # No joysticks!
+            raise DeviceError('No joystick detected')
+
+        # Use joystick #0 and initialize it
+        self.joystick = pygame.joystick.Joystick(0)
+        self.joystick.init()
+        self.record(time.perf_counter(), self.joystick.get_axis(0), self.joystick.get_axis(1))
+
+        # read the linux joystick device on a thread if there is one
+        self.thread = None
+        self.closed = False
+        self.offset = None # time.perf_counter() - kernel time of the events, smallest seen
+        try:
+            self.device = open(device_path, 'rb', buffering = 0)
+        except OSError:
+            self.device = None
+        else:
+            self.thread = threading.Thread(target = self.read_device, daemon = True)
+            self.thread.start()
+
+    """ Function run on the joystick thread, reads every event of the linux joystick device
+        @param self """
+    def read_device(self):
+        x, y = self.axes
+        while not self.closed:
+            try:
+                data = self.device.read(JS_EVENT.size)
+            except (OSError, ValueError):
+                return
+            if not data or len(data) < JS_EVENT.size:
+                return
+            now = time.perf_counter()
+            ms, value, kind, number = JS_EVENT.unpack(data)
+
+            # the kernel time of the event is in ms since boot, line it up with perf_counter
+            # using the read that came back the soonest after its event
+            offset = now - ms / 1000
+            if self.offset is None or offset < self.offset:
+                self.offset = offset
+
+            if kind & JS_EVENT_AXIS and number in (0, 1):
+                if number == 0:
+                    x = value / 32767
+                else:
+                    y = value / 32767
+                self.record(ms / 1000 + self.offset, x, y)
+
+    """ Function called with every pygame event, records the axis changes when there is no joystick thread
+        @param self
+        @param event from pygame """
+    def handle_event(self, event):
+        if self.thread is None and event.type == pygame.JOYAXISMOTION and event.joy == 0 and event.axis in (0, 1):
+            if event.axis == 0:
+                self.record(time.perf_counter(), event.value, self.axes[1])
+            else:
+                self.record(time.perf_counter(), self.axes[0], event.value)
+
+    """ Function to stop reading the joystick device
+        @param self """
+    def close(self):
+        self.closed = True
+        if self.device is not None:
+            self.device.close()
+
+""" Class for a scripted input device that plays back a list of axis positions """
+class ScriptedInput(InputDevice):
+    """ ScriptedInput Constructor
+        @param self
+        @param script list of (seconds, x, y), the joystick is held at x, y for that many seconds
+        @param loop True to start the script again when it ends, otherwise it goes back to the center """
+    def __init__(self, script, loop = True):
+        InputDevice.__init__(self)
+        self.script = list(script)
+        self.loop = loop
+        self.step = -1 # index in script of the current position
+        self.step_end = None # time.perf_counter() when the current step ends, set on the first poll
+
+    """ Function to get the next step of the script
+        @param self
+        @return (seconds, x, y) of the next step, or None when the script is over """
+    def next_step(self):
+        self.step += 1
+        if self.step >= len(self.script):
+            if not self.loop or len(self.script) == 0:
+                return None
+            self.step = 0
+        return self.script[self.step]
+
+    """ Function called once every frame, records every change of the script up to now at the time it happened
+        @param self """
+    def poll(self):
+        now = time.perf_counter()
+        if self.step_end is None:
+            self.step_end = now
+
+        while self.step_end is not None and self.step_end <= now:
+            step = self.next_step()
+            if step is None:
+                self.record(self.step_end, 0.0, 0.0)
+                self.step_end = None
+            else:
+                seconds, x, y = step
+                self.record(self.step_end, x, y)
+                self.step_end += seconds
+
+""" Class for a simulated joystick that holds a random direction for a random time """
+class SimulatedInput(ScriptedInput):
+    """ SimulatedInput Constructor
+        @param self
+        @param seed for the random directions, so runs can be repeated """
+    def __init__(self, seed = None):
+        ScriptedInput.__init__(self, [], loop = False)
+        self.random = random.Random(seed)
+
+    """ Function to get a new random step
+        @param self
+        @return (seconds, x, y) """
+    def next_step(self):
+        return (self.random.uniform(0.3, 1.0), self.random.choice((-1.0, 0.0, 1.0)), self.random.choice((-1.0, 0.0, 1.0)))
+
+""" Function to make the input device
+    @param kind of backend, 'joystick' or 'simulated'
+    @param seed for the simulated backend
+    @return InputDevice """
+def make_input(kind, seed = None):
+    if kind == 'simulated':
+        return SimulatedInput(seed)
+    return JoystickInput()
+
+""" Function to set up SDL for a display backend, needs to be called before pygame.display.init()
+    @param kind of backend, 'fullscreen', 'window' or 'dummy' """
+def prepare_display(kind):
+    if kind == 'dummy':
+        # no window and no sound card needed
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+""" Function to open the display
+    @param kind of backend, 'fullscreen', 'window' or 'dummy'
+    @param vsync True to wait for the vertical blank on every flip, the dummy display has no vsync
+    @return (pygame display surface, True if vsync is on) """
+def open_display(kind, vsync = False):
+    if kind == 'dummy':
+        return pygame.display.set_mode(DUMMY_SIZE), False
+
+    if kind == 'window':
+        size = WINDOW_SIZE
+        flags = 0
+    else:
+        size = (0, 0)
+        flags = pygame.FULLSCREEN # fullscreen
+
+    if vsync:
+        # vsync needs a renderer, which SCALED gives us, at the size of the desktop when fullscreen
+        if size == (0, 0):
+            size = pygame.display.get_desktop_sizes()[0]
+        try:
+            return pygame.display.set_mode(size, flags | pygame.SCALED, vsync = 1), True
+        except pygame.error as e:
+            log.warning('vsync is not available, running without it: %s', e)
+
+    return pygame.display.set_mode(size, flags), False
@@ -0,0 +1,145 @@
+""" dispenser.py
+        Pellet dispenser service that runs the stepper motor on its own thread.
+        Dispensing a pellet only puts a command on a queue and returns right
+        away, the thread turns the motor and then posts a DISPENSER_EVENT to
+        the pygame event queue saying if the pellet was dispensed, with the
+        times it started and finished.
+
+        The motor is driven by a backend, MotorKitBackend for the adafruit
+        stepper motor PiHAT, or SimulatedBackend that only counts the steps so
+        the dispenser can be tested without the PiHAT.
+"""
+
+import time, threading, queue
+
+# pip install pygame --user
+import pygame
+
+# pygame event type posted when a pellet is done, with the attributes
+#   success - True if the pellet was dispensed
+#   pellet - number of the pellet since the dispenser started, starting at 1
+#   start_time, end_time - time.perf_counter() when the motor started and stopped
+#   error - text of the error if it failed, otherwise None
+DISPENSER_EVENT = pygame.USEREVENT + 1
+
+""" Class for the adafruit stepper motor PiHAT backend """
+class MotorKitBackend:
+    """ MotorKitBackend Constructor, sets up the stepper motor over I2C
+        raises NotImplementedError if the PiHAT board is not setup properly """
+    def __init__(self):
+        # pip install adafruit-circuitpython-motorkit
+        from adafruit_motorkit import MotorKit
+
+        # pip install adafruit-circuitpython-motor
+        from adafruit_motor import stepper
+
+        self.stepper = stepper
+        self.kit = MotorKit() # initialize stepper motor
+
+    """ Function to move the motor one step
+        @param self
+        @param forward True to step FORWARD, False to step BACKWARD """
+    def step(self, forward):
+        if forward:
+            self.kit.stepper1.onestep(style=self.stepper.DOUBLE, direction=self.stepper.FORWARD)
+        else:
+            self.kit.stepper1.onestep(style=self.stepper.DOUBLE, direction=self.stepper.BACKWARD)
+
+""" Class for a simulated motor backend that keeps count of the steps """
+class SimulatedBackend:
+    """ SimulatedBackend Constructor
+        @param self
+        @param fail_at optional step number to raise an error at, to test failures """
+    def __init__(self, fail_at = None):
+        self.forward_steps = 0
+        self.backward_steps = 0
+        self.fail_at = fail_at
+
+    """ Function to move the simulated motor one step
+        @param self
+        @param forward True to step FORWARD, False to step BACKWARD """
+    def step(self, forward):
+        if self.fail_at is not None and self.forward_steps + self.backward_steps + 1 >= self.fail_at:
+            self.fail_at = None
+            raise OSError('simulated motor failure')
+
+        if forward:
+            self.forward_steps += 1
+        else:
+            self.backward_steps += 1
+
+""" Class for the pellet dispenser thread """
+class PelletDispenser(threading.Thread):
+    """ PelletDispenser Constructor
+        @param self
+        @param backend motor backend with a step(forward) function
+        @param steps number of motor steps for one pellet
+        @param step_delay seconds to pause before every step
+        @param post_events True to post DISPENSER_EVENTs to pygame """
+    def __init__(self, backend, steps = 30, step_delay = 0.01, post_events = True):
+        threading.Thread.__init__(self, daemon = True)
+
+        self.backend = backend
+        self.steps = steps
+        self.step_delay = step_delay
+        self.post_events = post_events
+
+        self.commands = queue.Queue() # number of pellets to dispense, None to stop
+        self.pellets = 0 # pellets attempted so far
+        self.failures = 0 # pellets that failed
+
+        self.motor_dir = 1 # direction motor is going in, 1 - forward, -1 - backward
+        self.dir_num = 0 # number of times motor has gone in this direction
+
+    """ Function to queue pellets to dispense, returns right away
+        @param self
+        @param count number of pellets """
+    def dispense(self, count = 1):
+        self.commands.put(count)
+
+    """ Function to stop the thread once every queued pellet has been dispensed
+        @param self """
+    def stop(self):
+        self.commands.put(None)
+        if self.is_alive():
+            self.join()
+
+    """ Function run on the dispenser thread, dispenses pellets as they are queued
+        @param self """
+    def run(self):
+        while True:
+            count = self.commands.get()
+            if count is None:
+                return
+
+            for i in range(count):
+                self.pellets += 1
+                start_time = time.perf_counter()
+                error = None
+
+                try:
+                    self.dispense_one()
+                except Exception as e:
+                    # keep the thread going so later pellets still get dispensed
+                    error = str(e)
+                    self.failures += 1
+
+                if self.post_events and pygame.display.get_init():
+                    pygame.event.post(pygame.event.Event(DISPENSER_EVENT, success = error is None, pellet = self.pellets, start_time = start_time, end_time = time.perf_counter(), error = error))
+
+    """ Function that dispenses 1 pellet using the stepper motor
+        @param self """
+    def dispense_one(self):
+        # 30 steps for one pellet dispensed
+        for j in range(self.steps):
+            # pause inbetween the steps
+            time.sleep(self.step_delay)
+
+            # motor direction of 1 is FORWARD, otherwise BACKWARD
+            self.backend.step(self.motor_dir == 1)
+
+        # every 6 pellets dispensed, switch motor directions
+        self.dir_num += 1
+        if self.dir_num > 5:
+            self.dir_num = 0
+            self.motor_dir = self.motor_dir * -1
@@ -0,0 +1,213 @@
+""" framestats.py
+        Times every frame of the game loop and each phase of it (input, sprite
+        update, draw, display update, task logic). Times are counted into fixed
+        size histograms per task, late and dropped frames are counted per trial,
+        frames waiting out a feedback, inter-trial interval or delay are counted
+        on their own so they are never taken for frames of a trial, and a summary for the session is written next to the results file as
+        results/{ID}FrameStats.txt.
+"""
+
+import time, datetime, array
+
+# histogram bins are 0.5ms wide up to 100ms, the last bin counts everything longer
+BIN_MS = 0.5
+NUM_BINS = 200
+
+# phases of a frame in the order they happen
+PHASES = ('input', 'update', 'draw', 'display', 'task')
+
+""" Class for a histogram of times with fixed size bins """
+class Histogram:
+    """ Histogram Constructor
+        @param self """
+    def __init__(self):
+        self.bins = array.array('L', bytes(array.array('L').itemsize * (NUM_BINS + 1)))
+        self.count = 0
+        self.total = 0.0 # sum of all times in seconds
+        self.longest = 0.0
+
+    """ Function to count a time
+        @param self
+        @param seconds time to count """
+    def add(self, seconds):
+        self.bins[min(int(seconds * 1000 / BIN_MS), NUM_BINS)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.longest:
+            self.longest = seconds
+
+    """ Function to get a percentile from the histogram
+        @param self
+        @param percent 0 to 100
+        @return time in milliseconds at the top of the bin the percentile falls in """
+    def percentile(self, percent):
+        if self.count == 0:
+            return 0.0
+        target = self.count * percent / 100
+        seen = 0
+        for i in range(NUM_BINS + 1):
+            seen += self.bins[i]
+            if seen >= target:
+                return (i + 1) * BIN_MS
+        return (NUM_BINS + 1) * BIN_MS
+
+    """ Function to get the mean time
+        @param self
+        @return mean in milliseconds """
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return 1000 * self.total / self.count
+
+""" Class for timing the frames of the game loop """
+class FrameStats:
+    """ FrameStats Constructor
+        @param self
+        @param fps frames per second the game loop is trying to run at """
+    def __init__(self, fps):
+        self.frame_time = 1.0 / fps
+        self.start_time = datetime.datetime.now()
+
+        self.histograms = {} # {task: {'frame' or phase: Histogram}}
+        self.trials = [] # (task, trial number, frames, late frames, dropped frames) of every trial
+        self.waits = {} # {(task, wait phase): [Histogram, late frames, dropped frames]} of the frames waiting for a deadline
+        self.setup_latencies = Histogram() # time from the end of an inter-trial interval to the first frame of the next trial
+
+        self.task = None # task the current frame belongs to
+        self.wait = None # wait phase of the current frame, None while a trial runs
+        self.frame_start = None # when the current frame started
+        self.phase_start = None # when the current phase started
+        self.phase_times = [0.0] * len(PHASES)
+
+        # counts for the trial that is running
+        self.ended_trial = None # (task, trial number) of a trial that ended in the current frame
+        self.trial_frames = 0
+        self.trial_late = 0
+        self.trial_dropped = 0
+
+    """ Function to get the histograms for a task, making them the first time
+        @param self
+        @param task name
+        @return dictionary of histograms """
+    def task_histograms(self, task):
+        histograms = self.histograms.get(task)
+        if histograms is None:
+            histograms = {name: Histogram() for name in ('frame',) + PHASES}
+            self.histograms[task] = histograms
+        return histograms
+
+    """ Function to call at the start of every frame, it finishes timing the last frame
+        @param self
+        @param task running this frame
+        @param wait phase the frame waits in for its deadline (scheduler.WAITING_PHASES), or None while the trial runs """
+    def begin_frame(self, task, wait = None):
+        now = time.perf_counter()
+
+        # count the last frame, from its start to now, including the time waiting for the clock
+        if self.frame_start is not None:
+            duration = now - self.frame_start
+
+            # late if the frame took more than 1.5 frames, every whole frame time past the first was dropped
+            late = duration > 1.5 * self.frame_time
+            dropped = int(round(duration / self.frame_time)) - 1 if late else 0
+
+            if self.wait is None:
+                histograms = self.task_histograms(self.task)
+                histograms['frame'].add(duration)
+                for i, name in enumerate(PHASES):
+                    histograms[name].add(self.phase_times[i])
+
+                self.trial_frames += 1
+                self.trial_late += late
+                self.trial_dropped += dropped
+            else:
+                counts = self.waits.get((self.task, self.wait))
+                if counts is None:
+                    counts = [Histogram(), 0, 0]
+                    self.waits[(self.task, self.wait)] = counts
+                counts[0].add(duration)
+                counts[1] += late
+                counts[2] += dropped
+
+        # the frame a trial ended in is its last one
+        self.keep_trial()
+
+        self.task = task
+        self.wait = wait
+        self.frame_start = now
+        self.phase_start = now
+        for i in range(len(PHASES)):
+            self.phase_times[i] = 0.0
+
+    """ Function to call at the end of a phase of the frame
+        @param self
+        @param phase index into PHASES of the phase that just ended """
+    def end_phase(self, phase):
+        now = time.perf_counter()
+        self.phase_times[phase] += now - self.phase_start
+        self.phase_start = now
+
+    """ Function to call when a wait ends and the current frame goes on to show the trial, so it is counted as a frame of the trial
+        @param self """
+    def end_wait(self):
+        self.wait = None
+
+    """ Function to call when a trial ends, its late and dropped frames are kept once the frame it ended in is over
+        @param self
+        @param task of the trial
+        @param trial number of the trial (total trials in the results file) """
+    def end_trial(self, task, trial):
+        self.ended_trial = (task, trial)
+
+    """ Function to keep the late and dropped frames of the trial that ended and start counting the next one
+        @param self """
+    def keep_trial(self):
+        if self.ended_trial is None:
+            return
+        self.trials.append(self.ended_trial + (self.trial_frames, self.trial_late, self.trial_dropped))
+        self.ended_trial = None
+        self.trial_frames = 0
+        self.trial_late = 0
+        self.trial_dropped = 0
+
+    """ Function to count how long setting up a trial took
+        @param self
+        @param seconds from the end of the inter-trial interval to the first frame of the trial """
+    def add_setup_latency(self, seconds):
+        self.setup_latencies.add(seconds)
+
+    """ Function to append the summary of the session to a file
+        @param self
+        @param path of the summary file
+        @param subject ID of the session """
+    def write(self, path, subject):
+        self.keep_trial() # the session ended in the frame of the last trial
+        lines = []
+        lines.append('Session {}  Subject {}  Target frame time {:.2f}ms'.format(self.start_time.strftime('%m-%d-%Y %H:%M:%S'), subject, 1000 * self.frame_time))
+
+        for task, histograms in self.histograms.items():
+            frames = histograms['frame']
+            late = sum(trial[3] for trial in self.trials if trial[0] == task)
+            dropped = sum(trial[4] for trial in self.trials if trial[0] == task)
+            lines.append('  {}  frames {}  mean {:.2f}ms  p50 {:.1f}ms  p95 {:.1f}ms  p99 {:.1f}ms  max {:.2f}ms  late {}  dropped {}'.format(
+                task, frames.count, frames.mean(), frames.percentile(50), frames.percentile(95), frames.percentile(99), 1000 * frames.longest, late, dropped))
+            for name in PHASES:
+                phase = histograms[name]
+                lines.append('    {:8} mean {:.2f}ms  p95 {:.1f}ms  max {:.2f}ms'.format(name, phase.mean(), phase.percentile(95), 1000 * phase.longest))
+
+        # frames that only waited for the deadline of a feedback, inter-trial interval or delay
+        for (task, wait), (frames, late, dropped) in self.waits.items():
+            lines.append('  {} {} waits  frames {}  mean {:.2f}ms  p95 {:.1f}ms  max {:.2f}ms  late {}  dropped {}'.format(
+                task, wait, frames.count, frames.mean(), frames.percentile(95), 1000 * frames.longest, late, dropped))
+
+        if self.setup_latencies.count > 0:
+            lines.append('  Trial setup latency  trials {}  mean {:.2f}ms  p95 {:.1f}ms  max {:.2f}ms'.format(
+                self.setup_latencies.count, self.setup_latencies.mean(), self.setup_latencies.percentile(95), 1000 * self.setup_latencies.longest))
+
+        # late and dropped frames of every trial, by the trial number in the results file
+        lines.append('  Trials (task trial frames late dropped)')
+        for trial in self.trials:
+            lines.append('    {}  {}  {}  {}  {}'.format(*trial))
+
+        with open(path, 'a') as summary_file:
+            summary_file.write('\n'.join(lines) + '\n\n')
@@ -9,32 +9,77 @@
             with the same name as the animal ID chosen.
 """
 
-import os, pygame, re, sys, datetime, time, random
+import time
 
-# pip install pysimplegui
-import PySimpleGUI as sg
+# time the imports started at, for the --profile-startup report
+import_start = time.perf_counter()
+
+import os, pygame, sys, random, importlib, logging, concurrent.futures, contextlib, argparse
+
+# pip install pysimplegui, only imported once a window is needed as it is slow to import, see pysimplegui()
 
 # pip install pygame --user
 from pygame.locals import *
-from pygame.compat import geterror
 
-# try to initialize adafruit motorkit
-try:
-    # pip install adafruit-circuitpython-motorkit
-    from adafruit_motorkit import MotorKit
+# stimuli surface cache, main/stimuli.py
+import stimuli
+
+# background asset loading during the subject selection menu, main/warmup.py
+import warmup
+
+# full screen or dirty rectangle drawing of the trials, main/render.py
+import render
+
+# frame timing histograms and dropped frame counts, main/framestats.py
+import framestats
+
+# trial phases and their deadlines, so the game loop never sleeps, main/scheduler.py
+import scheduler
+
+# pellet dispenser thread and stepper motor backends, main/dispenser.py
+import dispenser
+
+# reward motor, input device and display backends, main/devices.py
+import devices
+
+# pointer and target paths of every trial, written off the game loop, main/trajectory.py
+import trajectory
+
+# monotonic nanosecond clock of the session anchored to the wall clock, main/sessionclock.py
+import sessionclock
+
+# parameters file reading and checking shared with menu.py, main/parameters.py
+import parameters
+
+# results files written on a background thread, main/resultswriter.py
+import resultswriter
+
+# summary of every subject kept up to date as trials are written, main/summary.py
+import summary
+
+# optional SQLite database of the results, main/store.py
+import store
 
-# if PiHAT board is not connected
-except NotImplementedError:
-    # error popup and exit program
-    sg.Popup('Error:', 'PiHAT board not setup properly')
-    sys.exit()
+# compressed archive of the past sessions of the results files, main/archive.py
+import archive
 
-# pip install adafruit-circuitpython-motor
-from adafruit_motor import stepper
+# Pointer, Target and Stimuli sprites of the tasks, main/sprites.py
+import sprites
 
-kit = MotorKit() # initialize stepper motor
-motor_dir = 1 # direction motor is going in, 1 - forward, 0 - backward
-dir_num = 0 # number of times motor has gone in this direction
+# task classes the game loop runs by name, main/tasks.py
+import tasks
+
+# startup phase timing for --profile-startup, main/startup.py
+import startup
+
+# queue of sessions run one after another, main/sessionqueue.py
+import sessionqueue
+
+# time the imports ended at
+import_end = time.perf_counter()
+
+# messages of the sessions, for whoever runs them to show: main() and menu.py print them
+log = logging.getLogger('game')
 
 # Animal IDS file to use for ID selection menu
 animal_ids_file = 'AnimalIDs.txt'
@@ -46,210 +91,102 @@ main_dir = os.path.split(os.path.abspath(__file__))[0] # current starting direct
 data_dir = os.path.join(main_dir, 'data') # main/data
 stimuli_dir = os.path.join(data_dir, 'stimuli') # main/data/stimuli
 
-# keys to lookup the parameter values for each task
+# memory budget in bytes for the stimuli surface cache, least recently used stimuli are dropped past this
+# the default stimuli set takes about 60MB once scaled to fit and converted to the display format
+stimuli_cache_budget = 64 * 1024 * 1024
+
+# load stimuli from the preprocessed stimuli pack instead of decoding the png files,
+# the pack is rebuilt whenever a png in main/data/stimuli changes
+use_stimuli_pack = True
+stimuli_pack_file = os.path.join(data_dir, 'stimuli.pack') # main/data/stimuli.pack
+
+# results are flushed to disk once this many trials are waiting, or this many ms after the first of them,
+# and fsynced so a power cut loses at most that much
+results_flush_records = 10
+results_flush_ms = 1000
+results_fsync = True
+
+# also write every trial to the SQLite database main/results/Results.sqlite, --store turns it on too
+use_results_store = False
+
+# move the past sessions of the results files into their compressed archives when a session starts,
+# so the results files only hold the session being run
+archive_sessions = True
+
+# the parameters of a session are the dictionary of sections from parameters.validate(),
+# 'general' and one for every task, with the keys of parameters.SCHEMA:
 # *** Note Titration parameter currently does NOTHING and is not used at all ***
 # TASKORDER is Series or Random
+# RENDER_MODE is Full or Dirty, it is optional in the parameters file and Full by default
 # ACTIVE and TITRATION are boolean True/False
 # CIRCLE_SIZE is Small, Medium, or Large
 # TRIALS, START_LEVEL, TRIALS_PER_PROB, NUM_PROBS are int numbers
 # RESPONSE, TIMEOUT, PURSUIT_TIME, PERCENT are float numbers
-general_parameters_keys = ['TASKORDER']
-side_parameters_keys = ['ACTIVE', 'TRIALS', 'START_LEVEL', 'RESPONSE', 'TIMEOUT', 'TITRATION']
-chase_parameters_keys = ['ACTIVE', 'TRIALS', 'CIRCLE_SIZE', 'RESPONSE', 'TIMEOUT', 'TITRATION']
-pursuit_parameters_keys = ['ACTIVE', 'TRIALS', 'CIRCLE_SIZE', 'PURSUIT_TIME', 'RESPONSE', 'TIMEOUT', 'TITRATION']
-mts_parameters_keys = ['ACTIVE', 'TRIALS', 'PERCENT', 'RESPONSE', 'TIMEOUT', 'TITRATION']
-dmts_parameters_keys = ['ACTIVE', 'TRIALS', 'PERCENT', 'DELAY', 'RESPONSE', 'TIMEOUT', 'TITRATION']
-ls_parameters_keys = ['ACTIVE', 'TRIALS_PER_PROB', 'NUM_PROBS', 'PERCENT', 'RESPONSE', 'TIMEOUT', 'TITRATION']
-
-# generate the parameters dictionary for each task
-general_parameters = dict.fromkeys(general_parameters_keys)
-side_parameters = dict.fromkeys(side_parameters_keys)
-chase_parameters = dict.fromkeys(chase_parameters_keys)
-pursuit_parameters = dict.fromkeys(pursuit_parameters_keys)
-mts_parameters = dict.fromkeys(mts_parameters_keys)
-dmts_parameters = dict.fromkeys(dmts_parameters_keys)
-ls_parameters = dict.fromkeys(ls_parameters_keys)
-
-# list of tasks to run
-task_list = ['']
-
-RED = (255,0,0)
-GREEN = (0,255,0)
-BACKGROUND_COLOR = (250,250,250)
-
-""" Function that dispenses 1 pellet using the stepper motor """
-def pellet():
-    # need to declare as global otherwise won't interpret properly
-    global motor_dir
-    global dir_num
-
-    # 30 steps for one pellet dispensed
-    for j in range(30):
-      # pause inbetween the steps
-        time.sleep(0.01)
-
-        # motor direction of 1 is FORWARD, 0 is BACKWARD
-        if motor_dir == 1:
-            kit.stepper1.onestep(style=stepper.DOUBLE, direction=stepper.FORWARD)
-        else:
-            kit.stepper1.onestep(style=stepper.DOUBLE, direction=stepper.BACKWARD)
-    
-    # every 5 pellets dispensed, switch motor directions
-    dir_num += 1
-    if dir_num > 5:
-        dir_num = 0
-        motor_dir = motor_dir * -1
-
-""" Function to read a parameter from a given array of text and return its value
-    @param name of the parameter to search for
-    @param parameters array of text to search 
-    @return the value of the parameter found """
-def read_parameter(name, parameters):
-    # loop through every text line in parameters
-    for i in range(0, len(parameters)):
-        # search for the name and ignore upper/lower case
-        if re.search(name, parameters[i], re.IGNORECASE):
-            # return the value of the parameter which is on the next line after our found name
-            return parameters[i + 1].rstrip('\n')
-
-    # if not found, return an error popup and exit program
-    sg.Popup('Error:', '\"' + name + '\" parameter does not exist in input file \"' + parameters_file + '\"')
-    sys.exit()
-
-""" Function to load all of the task parameter dictionaries from the file passed in
-    @param filename of the parameter file to use """
-def load_and_check_params(filename):
-    # make sure file exists in main/ directory
-    if os.path.exists(filename) is False:
-        # error popup and exit program
-        sg.Popup('Error:', 'There must be a parameters file named ' + filename + ' in the current directory')
-        sys.exit()
-
-    # open the parameter file and get the array of text
-    parameter_file = open(filename, 'r')
-    parameters = parameter_file.readlines()
-    parameter_file.close()
-
-    # read general parameters
-    general_parameters['TASKORDER'] = read_parameter('Task Order', parameters)
-
-    # read side task parameters and load into side dictionary
-    side_parameters['ACTIVE'] = re.search('Yes', read_parameter('Side Task Active', parameters), re.IGNORECASE)
-    if side_parameters['ACTIVE']: # if task is active in parameters
-        side_parameters['TRIALS'] = int(read_parameter('Side Task Trials to Criterion', parameters))
-        side_parameters['START_LEVEL'] = int(read_parameter('Side Start Level', parameters))
-        side_parameters['RESPONSE'] = float(read_parameter('Side Task Response Time', parameters))
-        side_parameters['TIMEOUT'] = float(read_parameter('Side Task Timeout Time', parameters))
-        side_parameters['TITRATION'] = re.search('Yes', read_parameter('Side Task Titration', parameters), re.IGNORECASE)
-        task_list.append('Side') # add task to task list to run
-
-    # read chase task parameters and load into chase dictionary
-    chase_parameters['ACTIVE'] = re.search('Yes', read_parameter('Chase Task Active', parameters), re.IGNORECASE)
-    if chase_parameters['ACTIVE']: # if task is active in parameters
-        chase_parameters['TRIALS'] = int(read_parameter('Chase Task Trials to Criterion', parameters))
-        chase_parameters['CIRCLE_SIZE'] = read_parameter('Chase Circle Size', parameters)
-        chase_parameters['RESPONSE'] = float(read_parameter('Chase Task Response Time', parameters))
-        chase_parameters['TIMEOUT'] = float(read_parameter('Chase Task Timeout Time', parameters))
-        chase_parameters['TITRATION'] = re.search('Yes', read_parameter('Chase Task Titration', parameters), re.IGNORECASE)
-        task_list.append('Chase') # add task to task list to run
-
-    # read pursuit task parameters and load into pursuit dictionary
-    pursuit_parameters['ACTIVE'] = re.search('Yes', read_parameter('Pursuit Task Active', parameters), re.IGNORECASE)
-    if pursuit_parameters['ACTIVE']: # if task is active in parameters
-        pursuit_parameters['TRIALS'] = int(read_parameter('Pursuit Task Trials to Criterion', parameters))
-        pursuit_parameters['CIRCLE_SIZE'] = read_parameter('Pursuit Circle Size', parameters)
-        pursuit_parameters['PURSUIT_TIME'] = float(read_parameter('Pursuit Task Pursuit Time', parameters))
-        pursuit_parameters['RESPONSE'] = float(read_parameter('Pursuit Task Response Time', parameters))
-        pursuit_parameters['TIMEOUT'] = float(read_parameter('Pursuit Task Timeout Time', parameters))
-        pursuit_parameters['TITRATION'] = re.search('Yes', read_parameter('Pursuit Task Titration', parameters), re.IGNORECASE)
-        task_list.append('Pursuit') # add task to task list to run
-
-    # read side mts parameters and load into mts dictionary
-    mts_parameters['ACTIVE'] = re.search('Yes', read_parameter('MTS Task Active', parameters), re.IGNORECASE)
-    if mts_parameters['ACTIVE']: # if task is active in parameters
-        mts_parameters['TRIALS'] = float(read_parameter('MTS Task Trials for Criterion', parameters))
-        mts_parameters['PERCENT'] = float(read_parameter('MTS Task % Correct for Criterion', parameters))
-        mts_parameters['RESPONSE'] = float(read_parameter('MTS Task Response Time', parameters))
-        mts_parameters['TIMEOUT'] = float(read_parameter('MTS Task Timeout Time', parameters))
-        mts_parameters['TITRATION'] = re.search('Yes', read_parameter('MTS Task Titration', parameters), re.IGNORECASE)
-        task_list.append('MTS') # add task to task list to run
-
-    # read dmts task parameters and load into dmts dictionary
-    dmts_parameters['ACTIVE'] = re.search('Yes', read_parameter('DMTS Task Active', parameters), re.IGNORECASE)
-    if dmts_parameters['ACTIVE']: # if task is active in parameters
-        dmts_parameters['TRIALS'] = int(read_parameter('DMTS Task Trials for Criterion', parameters))
-        dmts_parameters['PERCENT'] = float(read_parameter('DMTS Task % Correct for Criterion', parameters))
-        dmts_parameters['DELAY'] = float(read_parameter('DMTS Delay Time', parameters))
-        dmts_parameters['RESPONSE'] = float(read_parameter('DMTS Task Response Time', parameters))
-        dmts_parameters['TIMEOUT'] = float(read_parameter('DMTS Task Timeout Time', parameters))
-        dmts_parameters['TITRATION'] = re.search('Yes', read_parameter('DMTS Task Titration', parameters), re.IGNORECASE)
-        task_list.append('DMTS') # add task to task list to run
-
-    # read learning set task parameters and load into learning set task dictionary
-    ls_parameters['ACTIVE'] = re.search('Yes', read_parameter('Learning Set Task Active', parameters), re.IGNORECASE)
-    if ls_parameters['ACTIVE']: # if task is active in parameters
-        ls_parameters['TRIALS_PER_PROB'] = int(read_parameter('Learning Set Trials Per Problem', parameters))
-        ls_parameters['NUM_PROBS'] = int(read_parameter('Learning Set Number of Problems', parameters))
-        ls_parameters['PERCENT'] = float(read_parameter('Learning Set % Correct for Criterion', parameters))
-        ls_parameters['RESPONSE'] = float(read_parameter('Learning Set Response Time', parameters))
-        ls_parameters['TIMEOUT'] = float(read_parameter('Learning Set Timeout Time', parameters))
-        ls_parameters['TITRATION'] = re.search('Yes', read_parameter('Learning Set Titration', parameters), re.IGNORECASE)
-        task_list.append('LS') # add task to task list to run
+
+""" Class for an error that stops a session from running, like a missing device or file """
+class SessionError(Exception):
+    pass
+
+""" Function to import pysimplegui the first time a window is needed, running headless never imports it
+    @return PySimpleGUI module """
+def pysimplegui():
+    import PySimpleGUI
+    return PySimpleGUI
+
+""" Function to show an error and exit the program, as a popup or printed when running headless
+    @param message of the error
+    @param headless True when there is no display for popups, the error is printed instead """
+def show_error(message, headless = False):
+    if headless:
+        print('Error: ' + message, file = sys.stderr)
+    else:
+        pysimplegui().Popup('Error:', message)
+    sys.exit(1)
 
 """ Function to write event from task into results file
-    @param file to write to
+    @param writer resultswriter.ResultsWriter to queue the event on
+    @param session_clock sessionclock.SessionClock of the session
     @param task currently running
-    @param value string from task to write """
-def write_event(file, task, value):
-    # get current time
-    time = datetime.datetime.now()
-    file.write(time.strftime('%m-%d-%Y %H:%M:%S  ') + task + '  ' + value + '\n')
-
-""" Function to return a randomly generated list
-    @param start value for list
-    @param end value for list
-    @param length of list to return
-    @return random list generated """
-def random_list(start, end, length):
-    # make empty list
-    rlist = [] 
-  
-    # loop until rlist is of desired length
-    while len(rlist) != length:
-        # generate random int in desired range
-        r = random.randint(start, end)
-
-        # only add if random int is not already in rlist
-        if r not in rlist:
-            rlist.append(r)
-  
-    return rlist
+    @param value tuple of the fields of the task from resultswriter.SCHEMAS to write """
+def write_event(writer, session_clock, task, value):
+    # get current time to the millisecond, from the session clock so it does not jump with the wall clock
+    time = session_clock.wall_time()
+    writer.write(time.strftime('%m-%d-%Y %H:%M:%S.') + '{:03d}'.format(time.microsecond // 1000), task, value)
 
 """ Function to load images for pygame
     @param filename of the image to load
     @param colorkey
+    @param box (width, height) to scale the image down to fit in
+    @param decoded optional image already loaded and scaled from the file, only needs converting
+    @param pack optional stimuli.StimuliPack to take the image from without decoding the png
     @return pygame image and rect loaded from file """
-def load_image(filename, colorkey=None):
+def load_image(filename, colorkey=None, box=stimuli.STIMULI_BOX, decoded=None, pack=None):
     # get full path main/data/stimuli/filename
     image_path = os.path.join(stimuli_dir, filename)
 
-    try:
-        # load file as pygame image
-        image = pygame.image.load(image_path)
+    # if the image is in the stimuli pack, it is already scaled and converted, no need to decode the png
+    if pack is not None and pack.box == tuple(box) and filename in pack:
+        image = pack.surface(filename, pygame.display.get_surface())
 
-        # scale image so that it will fit nicely in screen (650 width x 300 height)
-        while (image.get_width() > 650 or image.get_height() > 300):
-            # scale down image by 0.9, keep widthxlength ratio
-            image = pygame.transform.rotozoom(image, 0, 0.9)
+    # if the image was decoded and scaled during the warm up, it only needs converting
+    elif decoded is not None:
+        image = decoded.convert()
 
-    # if it doesn't load properly
-    except pygame.error:
-        # error popup and exit program
-        sg.Popup('Error:', 'Cannot load image:' + image_path)
-        sys.exit()
+    else:
+        try:
+            # load file as pygame image
+            image = pygame.image.load(image_path)
+
+            # scale image so that it will fit nicely in screen (650 width x 300 height by default)
+            image = stimuli.fit_to_box(image, box)
+
+        # if it doesn't load properly, the session cannot run
+        except pygame.error:
+            raise SessionError('Cannot load image:' + image_path)
+
+        # convert pygame image into pygame object
+        image = image.convert()
 
-    # convert pygame image into pygame object and return
-    image = image.convert()
     if colorkey is not None:
         if colorkey == -1:
             colorkey = image.get_at((0,0))
@@ -259,8 +196,9 @@ def load_image(filename, colorkey=None):
 
 """ Function to load sound for pygame
     @param filename of sound file
+    @param parsed optional ((frequency, size, channels), frames) already parsed from the file
     @return pygame sound object """
-def load_sound(filename):
+def load_sound(filename, parsed=None):
     # make empty sound class for pygame sound with play function
     class NoneSound:
         def play(self): pass
@@ -273,216 +211,35 @@ def load_sound(filename):
     sound_path = os.path.join(data_dir, filename)
 
     try:
-        # try to load pygame sound from file
-        sound = pygame.mixer.Sound(sound_path)
+        # if the sound was parsed during the warm up in the format the mixer uses, no need to read the file
+        if parsed is not None and pygame.mixer.get_init() == parsed[0]:
+            sound = pygame.mixer.Sound(buffer = parsed[1])
+        else:
+            # try to load pygame sound from file
+            sound = pygame.mixer.Sound(sound_path)
 
-    # if sound does not properly open
+    # if sound does not properly open, the session cannot run
     except pygame.error:
-        # error popup and exit program
-        sg.Popup('Error:', 'Cannot load sound:' + sound_path)
-        sys.exit()
+        raise SessionError('Cannot load sound:' + sound_path)
 
     return sound
 
-""" Class for Stimuli inside of our pygame setup for MTS, DMTS, LS """
-class Stimuli(pygame.sprite.Sprite):
-    """ Stimuli Constructor
-        @param self
-        @param stimuli filename to use for self.image
-        @param x position to place stimuli
-        @param y position to place stimuli """
-    def __init__(self, stimuli, x, y):
-        pygame.sprite.Sprite.__init__(self)  # call Sprite initializer
-        self.image, self.rect = load_image(stimuli, -1) # load stimuli image pygame object
-        self.rect = self.image.get_rect(center=(x,y)) # place Stimuli on passed in x,y
-
-""" Class for Target circle for Chase, Pursuit """
-class Target(pygame.sprite.Sprite):
-    """ Target Constructor
-        @param self
-        @param background from pygame
-        @param current_task that is running
-        @param diameter for the circle """
-    def __init__(self, background, current_task, diameter):
-        pygame.sprite.Sprite.__init__(self) #call Sprite initializer
-
-        self.diameter = int(diameter) # set desired diameter
-        self.current_task = current_task # set current_task
-        self.velX = random.choice((-5, 5)) # random X initial vel 5 left or 5 right
-        self.velY = random.choice((-5, 5)) # random Y initial vel 5 up or 5 down
-
-        # set Target object to a green circle of desired diameter with background color filled in
-        self.image = pygame.Surface([self.diameter,self.diameter])
-        self.image.fill((BACKGROUND_COLOR))
-        self.rect = pygame.draw.circle(self.image, GREEN, (int(self.diameter/2),int(self.diameter/2)), int(self.diameter/2), 2)
-
-        # set initial x and y to be randomly somewhere on the screen atleast diameter distance away from the edges
-        self.rect.x = random.randint(0, background.get_width() - self.diameter)
-        self.rect.y = random.randint(0, background.get_height() - self.diameter)
-
-        # Set joystick for Target to activate on during Chase
-        # Count the joysticks the computer has
-        self.joystick_count = pygame.joystick.get_count()
-        if self.joystick_count == 0:
-            # No joysticks!
-            sg.Popup("Error:", "No joystick detected")
-            sys.exit()
-        else:
-            # Use joystick #0 and initialize it
-            self.my_joystick = pygame.joystick.Joystick(0)
-            self.my_joystick.init()
-
-    """ Function to change Target's color during Pursuit
-        @param self
-        @param color to set the circle to """
-    def change_color(self, color):
-        # save x, y coords
-        x = self.rect.x
-        y = self.rect.y
-
-        # redraw circle with same x, y and diameter but change color to passed in color
-        self.rect = pygame.draw.circle(self.image, color, (int(self.diameter/2),int(self.diameter/2)), int(self.diameter/2), 2)
-
-        # reassign x, y coords
-        self.rect.x = x
-        self.rect.y = y
-
-    """ Update function for Target movement
-        @param self
-        @param background from pygame """
-    def update(self, background):
-        joystick_moved = False
-
-        # if Chase task
-        if self.current_task == 'Chase':
-            # move based on joystick as long as there is a joystick
-            if self.joystick_count != 0:
-                # check if joystick has moved in x axis atleast 0.1
-                horiz_axis_pos = self.my_joystick.get_axis(0)
-                if abs(horiz_axis_pos) < 0.1:
-                    horiz_axis_pos = 0
-
-                # check if joystick has move in y axis atleast 0.1
-                vert_axis_pos = self.my_joystick.get_axis(1)
-                if abs(vert_axis_pos) < 0.1:
-                    vert_axis_pos = 0
-    
-                # if joystick has moved atleast 0.1, 
-                if (horiz_axis_pos != 0 or vert_axis_pos != 0):
-                    joystick_moved = True
-        
-        # if Pursuit task, or if in Chase task and joystick has moved
-        if (joystick_moved or self.current_task == 'Pursuit'):
-            # update x,y based on velocities
-            self.rect.x = self.rect.x + self.velX;
-            self.rect.y = self.rect.y + self.velY;
-
-        # if Target hits any screen border, reverse directions and 
-        # make sure it does not go through the border
-        if self.rect.x >= background.get_width() - (self.diameter + 1):
-            self.rect.x = background.get_width() - (self.diameter + 1)
-            self.velX *= -1
-        if self.rect.x < 0:
-            self.rect.x = 0
-            self.velX *= -1
-        if self.rect.y >= background.get_height() - (self.diameter + 1):
-            self.rect.y = background.get_height() - (self.diameter + 1)
-            self.velY *= -1
-        if self.rect.y < 0:
-            self.rect.y = 0
-            self.velY *= -1
-
-""" Class for Pointer that follows joystick """
-class Pointer(pygame.sprite.Sprite):
-    """ Pointer Constructor
-        @param self
-        @param diameter for the Pointer """
-    def __init__(self, diameter):
-        pygame.sprite.Sprite.__init__(self) # call Sprite initializer
-
-        # make pygame object of a RED filled in circle of desired diameter
-        self.diameter = int(diameter) # set diameter of circle
-        self.image = pygame.Surface([self.diameter,self.diameter])
-        self.image.fill(BACKGROUND_COLOR)
-        self.rect = pygame.draw.circle(self.image, RED, (int(self.diameter/2),int(self.diameter/2)), int(self.diameter/2))
-
-        # Initiliaze joystick for the Pointer
-        # Count the joysticks the computer has
-        self.joystick_count = pygame.joystick.get_count()
-        if self.joystick_count == 0:
-            # No joysticks!
-            sg.Popup("Error:", "No joystick detected")
-            sys.exit()
-        else:
-            # Use joystick #0 and initialize it
-            self.my_joystick = pygame.joystick.Joystick(0)
-            self.my_joystick.init()
-
-    """ Function to reset Pointer to desired location
-        @param self
-        @param x position
-        @param y position """
-    def reset(self, x, y):
-        self.rect.x = x
-        self.rect.y = y
-
-    """ Function to update the Pointer on screen
-        @param self
-        @param background from pygame """
-    def update(self, background):
-        # move based on joystick as long as there is a joystick
-        if self.joystick_count != 0:
- 
-            # if joystick has not moved atleast 0.1, set x movement to 0
-            horiz_axis_pos = self.my_joystick.get_axis(0)
-            if abs(horiz_axis_pos) < 0.1:
-                horiz_axis_pos = 0
-
-            # if joystick has not moved atleast 0.1, set y movement to 0
-            vert_axis_pos = self.my_joystick.get_axis(1)
-            if abs(vert_axis_pos) < 0.1:
-                vert_axis_pos = 0
- 
-            # move x,y according to the joystick axes with a velocity of 10
-            self.rect.x = self.rect.x + horiz_axis_pos * 10
-            self.rect.y = self.rect.y + vert_axis_pos * 10
-
-            # if Pointer reaches a screen border, make sure it doesnt go past it
-            if self.rect.x >= background.get_width() - (self.diameter+1):
-                self.rect.x = background.get_width() - (self.diameter+1)
-            if self.rect.x < 0:
-                self.rect.x = 0
-            if self.rect.y >= background.get_height() - (self.diameter+1):
-                self.rect.y = background.get_height() - (self.diameter+1)
-            if self.rect.y < 0:
-                self.rect.y = 0
-
-
-""" Main function called when the program starts. Runs inital menu
-        for animal ID selection, reads parameters from parameter_file, 
-        and then starts the pygame loop running every task in task_list """
-def main():
-    # check if animal_ids_file in in main/
-    animal_ids_path = os.path.join(main_dir, animal_ids_file)
-    if os.path.exists(animal_ids_path) is False:
-        sg.Popup('Error:', animal_ids_path + ' does not exist')
-        sys.exit()
-
-    # read animal IDs from file
-    animal_ids = open(animal_ids_path, 'r')
-    ids = animal_ids.read().splitlines()
-    animal_ids.close()
-
-    # load parameters from main/parameter_file
-    load_and_check_params(os.path.join(main_dir, parameters_file))
+""" Function to show the animal ID selection menu while the assets load in the background
+    @param ids list of animal IDs to choose from
+    @param assets warmup.AssetWarmup thread, to show its progress
+    @param results_path directory of the results files, the summary of the picked subject is shown
+    @return animal ID chosen, or None if the window was closed """
+def pick_subject(ids, assets, results_path):
+    sg = pysimplegui()
 
     # establish layout for animal ID selection menu
     layout = [
                 [sg.T(' '  * 10)], # Blank space
-                [sg.Text('Subject', font = ('Arial', 15, 'bold')), sg.Combo([''] + ids, key = 'SUBJECT')], # Combo box with animal IDs listed
+                [sg.Text('Subject', font = ('Arial', 15, 'bold')), sg.Combo([''] + ids, key = 'SUBJECT', enable_events = True)], # Combo box with animal IDs listed
+                [sg.Text('', size = (60, 1), key = 'SUMMARY')], # sessions, Side level and accuracy of the picked subject
                 [sg.T(' '  * 10)], # Blank space
                 [sg.T(' '  * 10), sg.Button('Run', font = ('Arial', 15, 'bold'), button_color = ('white', 'green'))], # Button to Run tasks
-                [sg.T(' '  * 10)] # Blank space
+                [sg.Text(assets.progress(), size = (40, 1), key = 'ASSETS')] # progress of loading the assets
              ]
 
     # Create the PySimpleGui Window with menu
@@ -490,13 +247,18 @@ def main():
 
     # Loop until user makes an animal ID selection or exits
     while True:
-        # update current pysimplegui values
-        event, values = window.read()
+        # update current pysimplegui values, every 100ms so the loading progress stays current
+        event, values = window.read(timeout = 100)
+        window['ASSETS'].Update(assets.progress())
 
         # if user closes window
         if event in ([None]):
             window.close()
-            sys.exit()
+            return None
+
+        # if user picks a subject, show where it is from its summary
+        if event in (['SUBJECT']):
+            window['SUMMARY'].Update(summary.read(results_path, values['SUBJECT']).describe() if values['SUBJECT'] else '')
 
         # if user clicks Run button
         if event in (['Run']):
@@ -506,111 +268,387 @@ def main():
                 sg.Popup('Error:', 'Subject field cannot be blank')
             else:
                 # Close window
+                window.close()
                 break
 
-    # set subject ID for results file logging from user selection in previous menu
-    subject = values['SUBJECT']
+    # subject ID for results file logging from user selection in the menu
+    return values['SUBJECT']
 
-    # check if main/results exists, if not make it
-    results_path = os.path.join(main_dir, 'results')
-    if not os.path.exists(results_path):
-        os.makedirs(results_path)
-    # make or append to results file main/results/{subject}Data.txt
-    results_file = open(os.path.join(results_path, subject + 'Data.txt'), 'a+')
+""" Function to time a startup phase when the startup is being profiled
+    @param profile startup.StartupProfile, or None
+    @param name of the phase
+    @return context manager timing the phase """
+def startup_phase(profile, name):
+    return profile.phase(name) if profile is not None else contextlib.nullcontext()
 
-    # initialize pygame
-    pygame.init()
-    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN) # fullscreen
-    pygame.mouse.set_visible(0) # make mouse dissapear
+""" Class for the devices, display and loaded assets of the testing station,
+        opened once and kept open for every session run on it """
+class Station:
+    """ Station Constructor, nothing is opened until it is needed
+        @param self
+        @param backends dictionary of the 'motor', 'input' and 'display' backends from devices.select()
+        @param vsync True to wait for the vertical blank on every display update
+        @param seed for the simulated input so runs can be repeated, or None
+        @param profile startup.StartupProfile to time the startup with, or None """
+    def __init__(self, backends, vsync = False, seed = None, profile = None):
+        self.backends = backends
+        self.vsync = vsync
+        self.seed = seed
+        self.profile = profile
+        self.motor = None # future reward motor backend, made in the background by start_motor()
+        self.assets = None # warmup.AssetWarmup thread loading the stimuli and sounds, started by start()
+        self.pellet_dispenser = None # pellet dispenser thread, started by open() once the motor is ready
+        self.input_device = None # joystick or simulated input device, made by open() once pygame is initialized
+        self.screen = None # pygame display, opened by open()
+        self.hidden = False # True if the display was hidden by hide() until the next session
+        self.display_vsync = False # True if the display waits for the vertical blank
+        self.background = None # grey background surface the size of the screen
+        self.stimuli_catalogue = None # stimuli the trials are drawn from, listed once by the asset warm up
+        self.stimuli_pack = None # mapped by open() once the display is setup
+        # display-ready stimuli surfaces shared by MTS, DMTS and LS, images are only loaded on the first use
+        self.stimuli_cache = stimuli.StimuliCache(lambda filename, box: load_image(filename, -1, box, pack = self.stimuli_pack)[0], stimuli_cache_budget)
+        self.sounds = {} # filename: pygame sound
+
+    """ Function to make the reward motor backend, run on a background thread
+        @param self
+        @return backend for dispenser.PelletDispenser """
+    def make_motor(self):
+        with startup_phase(self.profile, 'reward motor init'):
+            return devices.make_motor(self.backends['motor'])
+
+    """ Function to start setting up the reward motor in the background, so the I2C setup
+            of the PiHAT happens while the subject selection menu is open
+        @param self """
+    def start_motor(self):
+        if self.motor is None:
+            setup = concurrent.futures.ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'motor')
+            self.motor = setup.submit(self.make_motor)
+            setup.shutdown(wait = False)
+
+    """ Function to start setting up the reward motor and loading the stimuli and sounds in the background,
+            does nothing for what is already started
+        @param self """
+    def start(self):
+        self.start_motor()
+        if self.assets is None:
+            self.assets = start_assets()
+
+    """ Function to check if the station is open
+        @param self
+        @return True if open() was done and close() was not called since """
+    def is_open(self):
+        return self.screen is not None
+
+    """ Function to open the devices and the display and get the assets ready, does nothing if it is already open.
+            Only the pygame modules the sessions use are initialized: the display, the mixer and the joystick.
+            If it cannot be opened, what was opened is closed again so the next open() starts over
+        @param self """
+    def open(self):
+        if self.is_open():
+            return
+
+        self.start()
+        try:
+            self.open_devices(self.assets)
+        except Exception:
+            self.close()
+            raise
+
+    """ Function to open the devices and the display, called by open()
+        @param self
+        @param assets warmup.AssetWarmup thread loading the stimuli and sounds """
+    def open_devices(self, assets):
+        # wait for the reward motor, if PiHAT board is not connected the session cannot run
+        with startup_phase(self.profile, 'wait for reward motor'):
+            try:
+                motor = self.motor.result()
+            except devices.DeviceError as e:
+                raise SessionError(str(e))
+        self.pellet_dispenser = dispenser.PelletDispenser(motor)
+        self.pellet_dispenser.start()
+
+        # wait for the assets to finish loading if the subject was picked quickly
+        with startup_phase(self.profile, 'wait for assets'):
+            assets.join()
+        if self.profile is not None and assets.elapsed is not None:
+            self.profile.add('asset load', assets.start_time, assets.start_time + assets.elapsed, assets.name)
+        if assets.error is not None:
+            raise SessionError('Cannot load assets: ' + str(assets.error))
+
+        # trials draw their stimuli from the catalogue listed once in the warm up instead of the directory
+        self.stimuli_catalogue = assets.catalogue
+        if len(self.stimuli_catalogue) < 2:
+            raise SessionError('Need atleast 2 stimuli images in ' + stimuli_dir)
+
+        with startup_phase(self.profile, 'display init'):
+            devices.prepare_display(self.backends['display'])
+            pygame.display.init()
+            self.screen, self.display_vsync = devices.open_display(self.backends['display'], self.vsync)
+            pygame.mouse.set_visible(0) # make mouse dissapear
+
+            # create pygame background based on screen size
+            self.background = pygame.Surface(self.screen.get_size())
+            self.background = self.background.convert()
+            self.background.fill((sprites.BACKGROUND_COLOR)) # grey by default
+
+            # display the background
+            self.screen.blit(self.background, (0, 0))
+            pygame.display.flip() # display first frame
+
+        # initialize the mixer in the format of the sounds so they can be used as they were parsed,
+        # without a sound card the sessions run silently
+        with startup_phase(self.profile, 'mixer init'):
+            try:
+                if assets.mixer_format() is not None:
+                    pygame.mixer.init(*assets.mixer_format())
+                else:
+                    pygame.mixer.init()
+            except pygame.error as e:
+                log.warning('No sound, running without it: %s', e)
+
+        # joystick or simulated input device for the Pointer and Target
+        with startup_phase(self.profile, 'input device init'):
+            try:
+                self.input_device = devices.make_input(self.backends['input'], self.seed)
+            except devices.DeviceError as e:
+                raise SessionError(str(e))
+
+        # map the stimuli pack so stimuli are loaded without decoding png files, rebuild it if the stimuli changed
+        with startup_phase(self.profile, 'stimuli pack'):
+            if use_stimuli_pack:
+                self.stimuli_pack = stimuli.load_pack(stimuli_pack_file, self.stimuli_catalogue, stimuli.STIMULI_BOX, self.screen, assets.images)
+
+        # fill the stimuli cache so the first trials do not have to load anything, until the memory budget is used up
+        with startup_phase(self.profile, 'stimuli cache'):
+            self.fill_stimuli_cache(assets.images)
+            assets.images.clear() # decoded images are not needed anymore
+
+        # sounds to play for correct and incorrect responses
+        with startup_phase(self.profile, 'sounds'):
+            for filename in ('incorrect.wav', 'correct.wav'):
+                self.sounds[filename] = load_sound(filename, assets.sounds.get(filename))
+
+    """ Function to fill the stimuli cache with the stimuli of the catalogue, until the memory budget is used up
+        @param self
+        @param images dictionary of images already decoded and scaled by filename """
+    def fill_stimuli_cache(self, images):
+        for filename in self.stimuli_catalogue.filenames:
+            image = load_image(filename, -1, stimuli.STIMULI_BOX, images.get(filename), self.stimuli_pack)[0]
+            if stimuli.surface_bytes(image) > self.stimuli_cache.budget - self.stimuli_cache.size:
+                break
+            self.stimuli_cache.put(filename, stimuli.STIMULI_BOX, image)
+
+    """ Function to pick up stimuli images added, changed or removed since the station was opened, called before
+            every session after the first on an open station. The pack is rebuilt and the cache filled again if they changed
+        @param self """
+    def refresh_stimuli(self):
+        if not self.stimuli_catalogue.refresh():
+            return
+        if len(self.stimuli_catalogue) < 2:
+            raise SessionError('Need atleast 2 stimuli images in ' + stimuli_dir)
+
+        # the cache and the pack may hold images that changed or were removed
+        self.stimuli_cache.clear()
+        if self.stimuli_pack is not None:
+            self.stimuli_pack.close()
+            self.stimuli_pack = None
+        if use_stimuli_pack:
+            self.stimuli_pack = stimuli.load_pack(stimuli_pack_file, self.stimuli_catalogue, stimuli.STIMULI_BOX, self.screen)
+        self.fill_stimuli_cache({})
+
+    """ Function to hide the display until the next session, so the window behind it can be used
+        @param self """
+    def hide(self):
+        if self.is_open() and not self.hidden:
+            pygame.display.iconify()
+            self.hidden = True
+
+    """ Function to show the display again if hide() hid it
+        @param self """
+    def show(self):
+        if self.is_open() and self.hidden:
+            self.screen, self.display_vsync = devices.open_display(self.backends['display'], self.vsync)
+            pygame.mouse.set_visible(0)
+            self.screen.blit(self.background, (0, 0))
+            pygame.display.flip()
+            self.hidden = False
+
+    """ Function to close everything the station opened or started, it can be opened again afterwards
+        @param self """
+    def close(self):
+        if self.pellet_dispenser is not None:
+            self.pellet_dispenser.stop() # let the last pellet finish
+            self.pellet_dispenser = None
+        self.motor = None
+        self.assets = None
+        if self.input_device is not None:
+            self.input_device.close()
+            self.input_device = None
+        self.stimuli_cache.clear()
+        if self.stimuli_pack is not None:
+            self.stimuli_pack.close()
+            self.stimuli_pack = None
+        self.screen = None
+        self.hidden = False
+        self.background = None
+        self.sounds = {}
+        pygame.quit()
+
+""" Function to import the modules with more tasks given with --task-plugin, they register their Task classes
+        with tasks.register and their parameters and results fields with tasks.add_task, see main/tasks.py
+    @param names of the modules in main/ """
+def load_task_plugins(names):
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            raise SessionError('Task plugin {} could not be loaded: {}'.format(name, e))
+
+""" Function to read the animal IDs to choose from
+    @return list of animal IDs in animal_ids_file """
+def read_animal_ids():
+    # check if animal_ids_file in in main/
+    animal_ids_path = os.path.join(main_dir, animal_ids_file)
+    if os.path.exists(animal_ids_path) is False:
+        raise SessionError(animal_ids_path + ' does not exist')
 
-    # create pygame background based on screen size
-    background = pygame.Surface(screen.get_size())
-    background = background.convert()
-    background.fill((BACKGROUND_COLOR)) # grey by default
+    # read animal IDs from file
+    with open(animal_ids_path, 'r') as animal_ids:
+        return animal_ids.read().splitlines()
+
+""" Function to start loading the stimuli and sounds in the background
+    @return started warmup.AssetWarmup thread """
+def start_assets():
+    assets = warmup.AssetWarmup(stimuli_dir, data_dir, ['incorrect.wav', 'correct.wav'], stimuli.STIMULI_BOX, stimuli_pack_file if use_stimuli_pack else None)
+    assets.start()
+    return assets
+
+""" Function to run one session of a subject on an open station, every task active in the parameters is run in turn.
+        Everything about the session is kept in this function, so sessions can be run one after another
+    @param station open Station to run the session on
+    @param subject animal ID, its results are written to main/results/{subject}Data.txt
+    @param values dictionary of sections from parameters.validate()
+    @param parameters_text text of the parameters file, kept with the session in the results database, or None
+    @param max_trials end the session after this many trials, or None to run every task to its end
+    @param use_store True to also write the results to the SQLite database main/results/Results.sqlite
+    @return True if every task was finished, False if it was quit with escape or by closing the window """
+def run_session(station, subject, values, parameters_text = None, max_trials = None, use_store = False):
+    # general parameters, the parameters of every task are given to it when it starts
+    general_parameters = values['general']
+
+    # list of tasks to run, the first one removed is the empty task before the session starts
+    task_list = [''] + parameters.active_tasks(values)
+
+    # devices and assets of the station
+    input_device = station.input_device
+    background = station.background
+    stimuli_catalogue = station.stimuli_catalogue
+    stimuli_cache = station.stimuli_cache
+
+    # results files of the subject, timed as part of the startup of the first session
+    with startup_phase(station.profile, 'results files'):
+        # check if main/results exists, if not make it
+        results_path = os.path.join(main_dir, 'results')
+        if not os.path.exists(results_path):
+            os.makedirs(results_path)
+
+        # move the past sessions into main/results/{subject}Data.txt.gz and main/results/{subject}Data.jsonl.gz
+        data_path = os.path.join(results_path, subject + 'Data.txt')
+        if archive_sessions:
+            for path in (data_path, os.path.join(results_path, subject + 'Data.jsonl')):
+                archive.rotate(path, results_fsync)
+
+        # make or append to results file main/results/{subject}Data.txt
+        # and main/results/{subject}Data.jsonl, written on their own thread,
+        # which also keeps main/results/{subject}Summary.json up to date,
+        # and to main/results/Results.sqlite with the parameters of the session if asked
+        results_store = None
+        if use_store:
+            results_store = store.ResultsStore(os.path.join(results_path, store.STORE_FILE), parameters_text)
+        results_writer = resultswriter.ResultsWriter(results_path, subject, results_flush_records, results_flush_ms, results_fsync, summary.read(results_path, subject), results_store, archive.archived_size(data_path))
+
+    # start the session clock, the wall clock it is anchored to is written once at the start of the session
+    session_clock = sessionclock.SessionClock()
+    write_event(results_writer, session_clock, 'Session', (subject, session_clock.anchor_ns, session_clock.wall_ns))
 
     # display the background
-    screen.blit(background, (0, 0))
-    pygame.display.flip() # display first frame
+    station.screen.blit(background, (0, 0))
+    pygame.display.flip()
+
+    # the first session is ready to run, show how long the startup took if it was profiled
+    if station.profile is not None and station.profile.ready():
+        log.info('%s', station.profile.report())
 
     # initialize pygame objects
     clock = pygame.time.Clock()
-    incorrect_sound = load_sound('incorrect.wav') # sound to play for incorrect response
-    correct_sound = load_sound('correct.wav') # sound to play for correct response
+    incorrect_sound = station.sounds['incorrect.wav'] # sound to play for incorrect response
+    correct_sound = station.sounds['correct.wav'] # sound to play for correct response
     
-    pointer = Pointer(24) # construct pointer circle with 24 diameter
+    pointer = sprites.Pointer(24, input_device) # construct pointer circle with 24 diameter
     pointer.reset(background.get_width()/2, background.get_height()/2) # set pointer to be in center of screen 
 
-    # make list of sprites to render during tasks, initially just the pointer
-    allsprites = pygame.sprite.RenderPlain((pointer))
+    # renderer for the sprites of the tasks, initially just the pointer
+    # 'Dirty' render mode only redraws and sends to the display the parts of the screen that changed
+    renderer = render.Renderer(station.screen, background, general_parameters['RENDER_MODE'] == 'Dirty', station.display_vsync)
+    renderer.set_sprites((pointer,))
 
     # general variables
     current_task = ''
     task_over = True
-    setup = False
-
-    correct_trials = 0
-    trials = 0
-    total_trials = 0
-
-    # task ending variables
-    correct = False
-    timeout = False
-    chosen = False
-
-    # side variables
-    side_level = side_parameters['START_LEVEL']
-
-    side_walls = [ # list of all the possible walls for side, first 4 are full length, last 4 are partial
-                    pygame.Rect(0,0,background.get_width(),200),
-                    pygame.Rect(0,background.get_height() - 200,background.get_width(),200),
-                    pygame.Rect(0,0,200,background.get_height()),
-                    pygame.Rect(background.get_width()-200,0,200,background.get_height()),
-                    pygame.Rect(0,0,background.get_width()/4,200),
-                    pygame.Rect(0,background.get_height() - 200,background.get_width()/4,200),
-                    pygame.Rect(0,0,200,background.get_height()/4),
-                    pygame.Rect(background.get_width()-200,0,200,background.get_height()/4)
-                 ]
-
-    # pursuit variables
-    inside = False
-
-    # dmts variables
-    delay_over = False
-
-    # learning set variables
-    new_stimuli = True
-    problem_trials = 0
-    problems = 1
+    task = None # tasks.Task running, made from tasks.REGISTRY when it starts
+    onset_time = None # session time the trial was first shown
+
+    # the next MTS, DMTS or LS trial is prepared on this thread while the current one is in its inter-trial interval
+    prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+    # it draws the stimuli with its own generator, seeded from the trial randomness, so a seeded session repeats
+    # however the thread interleaves with the main loop drawing from the random module
+    stimuli_random = random.Random(random.getrandbits(64))
+    iti_end_time = None # when the last inter-trial interval ended, to time the setup of the next trial
+
+    # phase of the current trial, feedback, inter-trial intervals and delays end on a deadline instead of sleeping
+    trial_scheduler = scheduler.TrialScheduler()
+
+    # time every frame and its phases, summary is written to main/results/{subject}FrameStats.txt
+    frame_stats = framestats.FrameStats(60)
+    frame_stats_path = os.path.join(results_path, subject + 'FrameStats.txt')
+
+    # record the Pointer and Target path of every trial to main/results/{subject}Trajectory_{session start}.npz
+    trajectories = trajectory.TrajectoryRecorder(os.path.join(results_path, subject + 'Trajectory_' + frame_stats.start_time.strftime('%m-%d-%Y_%H-%M-%S') + '.npz'), session_clock)
+
+    # what the tasks share, every task keeps the rest of its state in its own object
+    context = tasks.TaskContext(background, pointer, renderer, session_clock, trial_scheduler, stimuli_catalogue, stimuli_cache, stimuli_random, prefetcher, input_device)
 
     # main loop to run pygame
     going = True
+    finished = False
+    writer_error = None # resultswriter.WriterError that stopped the session
     while going:
 
-        # if task is over
-        if task_over:
+        # if task is over, once the feedback or timeout of its last trial has finished
+        if task_over and not trial_scheduler.waiting():
             # remove whatever task was currently running
             task_list.remove(current_task)
 
-            # if task_list is empty, end program
+            # if task_list is empty, every task is finished and the session is over
             if len(task_list) == 0:
-                pygame.quit()
-                results_file.close()
-                sys.exit()
+                finished = True
+                break
 
             # if task order is Random, get random task
-            if re.search('Random', general_parameters['TASKORDER'], re.IGNORECASE):
+            if general_parameters['TASKORDER'] == 'Random':
                 current_task = random.choice(task_list)
             # if task order is Series, get next task
             else:
                 current_task = task_list[0]
 
-            # reset task variables
-            trials = 0
-            correct_trials = 0
+            # make the task, only its own methods are called every frame from here on
+            task = tasks.make(current_task, values[current_task], context)
             task_over = False
 
         # 60 fps, update and draw every 1/60 sec
         clock.tick(60)
+        # frames waiting out a feedback, inter-trial interval or delay are not counted as frames of the trial
+        frame_stats.begin_frame(current_task, trial_scheduler.phase if trial_scheduler.waiting() else None)
 
         # handle input, escape key = exit
         for event in pygame.event.get():
@@ -618,537 +656,331 @@ def main():
                 going = False
             elif event.type == KEYDOWN and event.key == K_ESCAPE:
                 going = False
-
-        # update all current sprites
-        allsprites.update(background)
-        pygame.display.update()
-
-        # draw background and all current sprites in list
-        screen.blit(background, (0, 0))
-        allsprites.draw(screen)
-
-        # Side task
-        if current_task == 'Side':
-            # if already setup
-            if setup:
-                # if no response in Reponse Time seconds, timeout
-                if (time.time() - start_time > side_parameters['RESPONSE']):
-                    timeout = True
-
-                elif side_level == 1: # side level 1
-                    # draw random green walls from setup selection
-                    for i in side_wall_list:
-                        screen.fill(GREEN, side_walls[i])
-
-                    # every joystick event, check if Pointer was moved
-                    # if Pointer was moved, correct criterion
-                    for event in pygame.event.get():
-                        if pointer.rect.x != background.get_width()/2 or pointer.rect.y != background.get_height()/2:
-                            correct = True
-
-                elif side_level in (2, 3, 4, 5, 6): # side level > 1
-                    # draw random green walls from setup selection
-                    for i in side_wall_list:
-                        screen.fill(GREEN, side_walls[i])
-
-                        # if Pointer collides with a wall, correct criterion
-                        if side_walls[i].colliderect(pointer):
-                            correct = True
-
-            # need to setup
+            elif event.type == dispenser.DISPENSER_EVENT and not event.success:
+                log.error('Pellet %s failed to dispense: %s', event.pellet, event.error)
             else:
-                # based on current side_level, generate a random list of indices for the side_wall array
-                if side_level in (1, 2):
-                    side_wall_list = (0, 1, 2, 3)
-                elif side_level == 3:
-                    side_wall_list = random_list(0, 3, 3)
-                elif side_level == 4:
-                    side_wall_list = random_list(0, 3, 2)
-                elif side_level == 5:
-                    side_wall_list = random_list(0, 3, 1)
-                elif side_level == 6:
-                    side_wall_list = random_list(4, 7, 1)
-
-                # reset pointer to the center of the screen
-                pointer.reset(background.get_width() / 2, background.get_height() / 2)
-                allsprites = pygame.sprite.RenderPlain((pointer))
-
-                # reset task variables
-                setup = True
-                start_time = time.time()
-
-            # trial over
-            if correct or timeout:
-                trials += 1
-                total_trials += 1
-
-                # generate side log string for which walls are up
-                # T - top, R - right, B - bottom, L - left
-                side_walls_str = ''
-                if 0 in side_wall_list or 4 in side_wall_list:
-                    side_walls_str += 'T'
-                if 3 in side_wall_list or 7 in side_wall_list:
-                    side_walls_str +='R'
-                if 1 in side_wall_list or 5 in side_wall_list:
-                    side_walls_str += 'B'
-                if 2 in side_wall_list or 6 in side_wall_list:
-                    side_walls_str += 'L'
-
-                # if correct criterion update correct_trials
-                if correct:
-                    correct_trials += 1
-
-                # set timeout time for incorrect response
-                timeout_time = side_parameters['TIMEOUT']
-
-                # set log value with relevant side information
-                value = "{}  {}  {}  {}  {}".format(total_trials, trials, side_level, side_walls_str, round(time.time() - start_time, 2))
-
-                # if enough correct trials have been completed, go to next side level
-                if correct_trials >= side_parameters['TRIALS']:
-                    correct_trials = 0
-                    side_level += 1
-
-                    # if level 6 has been completed, go to next task
-                    if side_level > 6:
-                        side_level = side_parameters['START_LEVEL']
-                        task_over = True
-
-
-
-        # Chase task
-        elif current_task == 'Chase':
-            # if already setup
-            if setup:
-                # if no response in Reponse Time seconds, timeout
-                if (time.time() - start_time > chase_parameters['RESPONSE']):
-                    timeout = True
-                # check if Pointer has reached Target circle
-                elif target.rect.contains(pointer):
-                    correct = True
-
-            # need to set up
-            else:
-                # decide circle size of target from parameters
-                if re.search('Small', chase_parameters['CIRCLE_SIZE'], re.IGNORECASE):
-                    target_size = 100
-                elif re.search('Medium', chase_parameters['CIRCLE_SIZE'], re.IGNORECASE):
-                    target_size = 200
-                elif re.search('Large', chase_parameters['CIRCLE_SIZE'], re.IGNORECASE):
-                    target_size = 300
-
-                # construct Target circle for Chase
-                target = Target(background, 'Chase', target_size)
-
-                # loop until Pointer is placed somewhere not colliding with Target
-                while(target.rect.colliderect(pointer)):
-                    newX = random.randInt(0, background.get_width() - pointer.diameter)
-                    newY = random.randInt(0, background.get_height() - pointer.diameter)
-                    pointer.reset(newX, newY)
-
-                # add Target to list of sprites to maintain
-                allsprites = pygame.sprite.RenderPlain((target, pointer))
-
-                # reset task variables
-                setup = True
-                start_time = time.time()
-
-            # trial ended
-            if correct or timeout:
-                trials += 1
-                total_trials += 1
-
-                # if correct criterion update correct_trials
-                if correct:
-                    correct_trials += 1
-
-                # set timeout time for incorrect response
-                timeout_time = chase_parameters['TIMEOUT']
-
-                # set log value with relevant chase information
-                value = "{}  {}  {}  {}".format(total_trials, trials, chase_parameters['CIRCLE_SIZE'], round(time.time() - start_time, 2))
-
-                # if enough correct trials have been completed, go to next task
-                if correct_trials >= chase_parameters['TRIALS']:
-                    task_over = True
-
-
-
-        # Pursuit task
-        elif current_task == 'Pursuit':
-            # if already set
-            if setup:
-                # if no response in Reponse Time seconds, timeout
-                if (time.time() - start_time > pursuit_parameters['RESPONSE']):
-                    timeout = True
-
-                # if Pointer is inside of Target
-                elif target.rect.contains(pointer):
-                    # if it was already inside
-                    if inside:
-                        target.change_color(GREEN) # change target color to green
-                        # if its been Pursuit Time, correct criterion
-                        if (time.time() - start_contains_time >= pursuit_parameters['PURSUIT_TIME']):
-                            correct = True
-
-                    # if Pointer has not been inside Target yet
-                    else:
-                        inside = True
-                        start_contains_time = time.time() # reset timer
-
-                # if Pointer is not inside of Target, change circle color to red
-                else:
-                    target.change_color(RED)
-                    inside = False
+                input_device.handle_event(event)
 
-            # need to setup
-            else:
-                # decide circle size of target from parameters
-                if re.search('Small', pursuit_parameters['CIRCLE_SIZE'], re.IGNORECASE):
-                    target_size = 100
-                elif re.search('Medium', pursuit_parameters['CIRCLE_SIZE'], re.IGNORECASE):
-                    target_size = 200
-                elif re.search('Large', pursuit_parameters['CIRCLE_SIZE'], re.IGNORECASE):
-                    target_size = 300
-
-                # construct Target circle for Pursuit
-                target = Target(background, 'Pursuit', target_size)
-
-                # loop until Pointer is placed somewhere not colliding with Target
-                while(target.rect.colliderect(pointer)):
-                    newX = random.randint(0, background.get_width() - pointer.diameter)
-                    newY = random.randint(0, background.get_height() - pointer.diameter)
-                    pointer.reset(newX, newY)
-
-                # add Target to list of sprites to maintain
-                allsprites = pygame.sprite.RenderPlain((target, pointer))
-
-                # reset task variables
-                inside = False
-                setup = True
-                start_time = time.time()
-
-            # trial ended
-            if correct or timeout:
-                trials += 1
-                total_trials += 1
-
-                # if correct criterion update correct_trials
-                if correct:
-                    correct_trials += 1
-
-                # set timeout time for incorrect response
-                timeout_time = pursuit_parameters['TIMEOUT']
-
-                # set log value with relevant pursuit information
-                value = "{}  {}  {}  {}".format(total_trials, trials, pursuit_parameters['CIRCLE_SIZE'], round(time.time() - start_time, 2))
-                
-                # if enough correct trials have been completed, go to next task
-                if correct_trials >= pursuit_parameters['TRIALS']:
-                    task_over = True
-
-
-
-        # Match-to-Sample task
-        elif current_task == 'MTS':
-            # if already set up
-            if setup:
-                # if no response in Reponse Time seconds, timeout
-                if (time.time() - start_time > mts_parameters['RESPONSE']):
-                    timeout = True
-
-                # if Pointer collides with correct stimuli, correct criterion
-                elif stimuli_correct.rect.contains(pointer):
-                    correct = True
-                    chosen = True
-
-                # if Pointer collides with incorrect stimuli, incorrect criterion
-                elif stimuli_wrong.rect.contains(pointer):
-                    correct = False
-                    chosen = True
-
-            # need to set up
-            else:
-                # randomly select stimuli files from main/data/stimuli/
-                correct_stimuli = random.choice(os.listdir(stimuli_dir))
-                wrong_stimuli = random.choice(os.listdir(stimuli_dir))
-
-                # loop until the two stimuli are different
-                while (correct_stimuli == wrong_stimuli):
-                    wrong_stimuli = random.choice(os.listdir(stimuli_dir))
-
-                # randomly decide whether the correct will be on the left or right
-                correct_position = random.choice([0.15, 0.85])
-
-                # assign stimuli_correct_str for logging
-                if correct_position == 0.15:
-                    stimuli_correct_str = 'Left'
-                    left_stimuli = correct_stimuli
-                    right_stimuli = wrong_stimuli
-                else:
-                    stimuli_correct_str = 'Right'
-                    right_stimuli = correct_stimuli
-                    left_stimuli = wrong_stimuli
-
-                # construct Stimuli objects for pygame
-                stimuli_correct = Stimuli(correct_stimuli, background.get_width() * correct_position, background.get_height()/4)
-                stimuli_wrong = Stimuli(wrong_stimuli, background.get_width() * (1 - correct_position), background.get_height()/4)
-                stimuli_bottom = Stimuli(correct_stimuli, background.get_width()/2, background.get_height()*.8)
-                
-                # add stimuli to list of sprites
-                allsprites = pygame.sprite.RenderPlain((stimuli_correct, stimuli_wrong, stimuli_bottom, pointer))
-
-                # reset Pointer to center of screen
-                pointer.reset(background.get_width()/2, background.get_height()/2)
-                
-                # reset task variables
-                setup = True
-                start_time = time.time()
-
-            if chosen or timeout:
-                trials += 1
-                total_trials += 1
-
-                # if correct criterion, update correct_trials
-                if correct:
-                    correct_trials += 1
-
-                    # set log value with relevant mts information
-                    value = "{}  {}  {}  {}  {}  {}  {}  Correct".format(total_trials, trials, round(mts_parameters['PERCENT'],2), os.path.splitext(os.path.basename(left_stimuli))[0], stimuli_correct_str, os.path.splitext(os.path.basename(right_stimuli))[0], round(time.time() - start_time, 2))
-                
-                # if incorrect criterion or timeout
-                else:
-                    # set log value with relevant mts information
-                    value = "{}  {}  {}  {}  {}  {}  {}  Incorrect".format(total_trials, trials, round(mts_parameters['PERCENT'],2), os.path.splitext(os.path.basename(left_stimuli))[0], stimuli_correct_str, os.path.splitext(os.path.basename(right_stimuli))[0], round(time.time() - start_time, 2))
-                
-                # set timeout time for incorrect response
-                timeout_time = mts_parameters['TIMEOUT']
-
-                # if enough correct trials have been completed
-                if correct_trials >= mts_parameters['TRIALS']:
-                    # if accuracy of trials is > parameters percent, go to next task
-                    if (correct_trials / trials) >= (mts_parameters['PERCENT'] / 100):
-                        task_over = True
-
-
-
-        # Delayed-Match-to-Sample Task
-        elif current_task == 'DMTS':
-            # if already set up
-            if setup:
-                # if delay is over
-                if delay_over:
-                    # if no response in Reponse Time seconds, timeout
-                    if (time.time() - start_time > dmts_parameters['RESPONSE']):
-                        timeout = True
-
-                    # if Pointer collides with correct stimuli, correct criterion
-                    elif stimuli_correct.rect.contains(pointer):
-                        correct = True
-                        chosen = True
-
-                    # if Pointer collides with incorrect stimuli, incorrect criterion
-                    elif stimuli_wrong.rect.contains(pointer):
-                        correct = False
-                        chosen = True
-
-                # delay needs to happen
-                else:
-                    # start delay when Pointer collides bottom stimuli
-                    if stimuli_bottom.rect.contains(pointer):
-                        # blank screen
-                        screen.blit(background, (0, 0))
-                        pygame.display.update()
-                        time.sleep(dmts_parameters['DELAY']) # delay
+        input_device.poll()
+        frame_stats.end_phase(0) # input
 
-                        # add wrong and correct stimuli to sprites, remove bottom one
-                        allsprites = pygame.sprite.RenderPlain((stimuli_wrong, stimuli_correct, pointer))
+        # during feedback, inter-trial intervals and delays the screen stays as it is and the task does not run,
+        # but we keep handling events and ticking the clock until the deadline of the phase
+        if trial_scheduler.waiting():
+            if not trial_scheduler.expired():
+                frame_stats.end_phase(4) # task logic
+                continue
 
-                        delay_over = True
-                        start_time = time.time() # reset timer
+            # the Pointer was not shown during the wait, it goes on from where the stick is now
+            pointer.skip_input()
 
-            # need to setup
-            else:
-                # randomly select stimuli files from main/data/stimuli/
-                correct_stimuli = random.choice(os.listdir(stimuli_dir))
-                wrong_stimuli = random.choice(os.listdir(stimuli_dir))
-
-                # loop until the two stimuli are different
-                while (correct_stimuli == wrong_stimuli):
-                    wrong_stimuli = random.choice(os.listdir(stimuli_dir))
-
-                # randomly decide whether the correct will be on the left or right
-                correct_position = random.choice([0.15, 0.85])
-
-                # assign stimuli_correct_str for logging
-                if correct_position == 0.15:
-                    stimuli_correct_str = 'Left'
-                    left_stimuli = correct_stimuli
-                    right_stimuli = wrong_stimuli
-                else:
-                    stimuli_correct_str = 'Right'
-                    right_stimuli = correct_stimuli
-                    left_stimuli = wrong_stimuli
-
-                # construct Stimuli objects for pygame
-                stimuli_correct = Stimuli(correct_stimuli, background.get_width() * correct_position, background.get_height()/4)
-                stimuli_wrong = Stimuli(wrong_stimuli, background.get_width() * (1 - correct_position), background.get_height()/4)
-                stimuli_bottom = Stimuli(correct_stimuli, background.get_width()/2, background.get_height()*.8)
-
-                # add only bottom stimuli to sprite list
-                allsprites = pygame.sprite.RenderPlain((stimuli_bottom, pointer))
-
-                # reset pointer to center of screen
-                pointer.reset(background.get_width()/2, background.get_height()/2)
-                
-                # reset task variables
-                delay_over = False
-                setup = True
-
-            # trial over
-            if chosen or timeout:
-                trials += 1
-                total_trials += 1
-
-                # if correct criterion, update correct_trials
-                if correct:
-                    correct_trials += 1
-
-                    # set log value with relevant dmts information
-                    value = "{}  {}  {}  {}  {}  {}  {}  Correct".format(total_trials, trials, round(dmts_parameters['PERCENT'],2), os.path.splitext(os.path.basename(left_stimuli))[0], stimuli_correct_str, os.path.splitext(os.path.basename(right_stimuli))[0], round(time.time() - start_time, 2))
-                else:
-                    # set log value with relevant dmts information
-                    value = "{}  {}  {}  {}  {}  {}  {}  Incorrect".format(total_trials, trials, round(dmts_parameters['PERCENT'],2), os.path.splitext(os.path.basename(left_stimuli))[0], stimuli_correct_str, os.path.splitext(os.path.basename(right_stimuli))[0], round(time.time() - start_time, 2))
-
-                # set timeout time for incorrect response
-                timeout_time = dmts_parameters['TIMEOUT']
-
-                # if enough correct trials have been completed
-                if correct_trials >= dmts_parameters['TRIALS']:
-                    # if accuracy of trials is > parameters percent, go to next task
-                    if (correct_trials / trials) >= (dmts_parameters['PERCENT'] / 100):
-                        task_over = True
-
-
-      
-        # Learning Set task
-        elif current_task == 'LS':
-            # if already set up
-            if setup:
-                # if no response in Reponse Time seconds, timeout
-                if (time.time() - start_time > ls_parameters['RESPONSE']):
-                    timeout = True
-
-                # if Pointer collides with correct stimuli, correct criterion
-                elif stimuli_correct.rect.contains(pointer):
-                    correct = True
-                    chosen = True
-
-                # if Pointer collides with incorrect stimuli, incorrect criterion
-                elif stimuli_wrong.rect.contains(pointer):
-                    correct = False
-                    chosen = True
-
-            # need to set up
+            # DMTS delay is over, show the choices and start the response window once they are on screen
+            if trial_scheduler.phase == scheduler.DELAY:
+                task.end_delay(context)
+                trial_scheduler.enter(scheduler.STIMULUS)
+
+            # feedback or inter-trial interval is over, the next trial is set up and shown in this frame
             else:
-                # if we're at the start of a problem, we need a new correct stimuli
-                if new_stimuli:
-                    new_stimuli = False
+                iti_end_time = time.perf_counter()
+                trial_scheduler.enter(scheduler.SETUP)
+
+                # the last trial of the task, the next task is made and set up at the start of the next frame
+                if task_over:
+                    frame_stats.end_phase(4) # task logic
+                    continue
+
+            # this frame shows the trial, it is not a frame of the wait
+            frame_stats.end_wait()
+
+        # set up the next trial before drawing, so its first frame is shown in the frame it was set up in
+        if trial_scheduler.phase == scheduler.SETUP:
+            task.setup(context)
+            trial_scheduler.enter(scheduler.STIMULUS)
+            frame_stats.end_phase(4) # task logic
+
+        # update all current sprites, then draw them and send them to the display
+        renderer.update(background)
+        trajectories.add_pointer(context.total_trials + 1, pointer, task.target)
+        frame_stats.end_phase(1) # sprite update
+        rects = renderer.draw()
+        frame_stats.end_phase(2) # draw
+        renderer.present(rects)
+        frame_stats.end_phase(3) # display update
+
+        # first frame of the trial has been shown, the response window is open
+        if trial_scheduler.phase == scheduler.STIMULUS:
+            trial_scheduler.enter(scheduler.RESPONSE)
+
+            # the stimulus onset is when the display update that first showed it returned,
+            # every response window and latency is timed from it
+            context.start_time = session_clock.at(renderer.present_time)
+            if onset_time is None:
+                onset_time = context.start_time
+                pointer.start_trial(renderer.present_time) # time the first movement from the onset
+
+        # first frame of a new trial is on screen, time how long it took since the inter-trial interval ended
+        if iti_end_time is not None:
+            frame_stats.add_setup_latency(time.perf_counter() - iti_end_time)
+            iti_end_time = None
+
+        # check the response to the trial on screen
+        task.step(context)
 
-                    # randomly select stimuli files from main/data/stimuli/
-                    correct_stimuli = random.choice(os.listdir(stimuli_dir))
+        # any time a trial ends (correct criterion OR no response in Reponse Time OR a choice was made)
+        if task.ended():
+            # count and record the trial, then check if the task is over
+            value = task.end_trial(context)
+            task_over = task.over
 
-                wrong_stimuli = random.choice(os.listdir(stimuli_dir))
+            # prepare the next trial while we wait, if the task is going to continue
+            task.prefetch(context)
 
-                # loop until the two stimuli are different
-                while (correct_stimuli == wrong_stimuli):
-                    wrong_stimuli = random.choice(os.listdir(stimuli_dir))
+            feedback_time = session_clock.now()
+            if task.correct:
+                correct_sound.play()
+                station.pellet_dispenser.dispense() # returns right away, the dispenser thread posts a dispenser.DISPENSER_EVENT once the pellet is done
+                trial_scheduler.enter(scheduler.FEEDBACK, 4) # wait for sound to play and pellet to dispense
+            else:
+                incorrect_sound.play()
 
-                # randomly decide whether the correct will be on the left or right
-                correct_position = random.choice([0.15, 0.85])
+                # make screen blank for the timeout time of the task
+                renderer.blank()
+                trial_scheduler.enter(scheduler.ITI, task.parameters['TIMEOUT'])
 
-                # assign stimuli_correct_str for logging
-                if correct_position == 0.15:
-                    stimuli_correct_str = 'Left'
-                    left_stimuli = correct_stimuli
-                    right_stimuli = wrong_stimuli
-                else:
-                    stimuli_correct_str = 'Right'
-                    right_stimuli = correct_stimuli
-                    left_stimuli = wrong_stimuli
-
-                # construct Stimuli objects for pygame
-                stimuli_correct = Stimuli(correct_stimuli, background.get_width() * correct_position, background.get_height()/2)
-                stimuli_wrong = Stimuli(wrong_stimuli, background.get_width() * (1 - correct_position), background.get_height()/2)
-
-                # add stimuli to sprite list
-                allsprites = pygame.sprite.RenderPlain((stimuli_correct, stimuli_wrong, pointer))
-
-                # reset pointer to center of screen
-                pointer.reset(background.get_width()/2, background.get_height()/2)
-                
-                # reset task variables
-                setup = True
-                start_time = time.time() # reset timer
-
-            # trial over
-            if chosen or timeout:
-                trials += 1
-                total_trials += 1
-                problem_trials += 1
-
-                # if correct criterion, update correct_trials
-                if correct:
-                    correct_trials += 1
-
-                    # set log value with relevant ls information
-                    value = "{}  {}  {}  {}  {}  {}  {}  {}  Correct".format(total_trials, problems, trials, round(ls_parameters['PERCENT'],2), os.path.splitext(os.path.basename(left_stimuli))[0], stimuli_correct_str, os.path.splitext(os.path.basename(right_stimuli))[0], round(time.time() - start_time, 2))
-                else:
-                    # set log value with relevant ls information
-                    value = "{}  {}  {}  {}  {}  {}  {}  {}  Incorrect".format(total_trials, problems, trials, round(ls_parameters['PERCENT'],2), os.path.splitext(os.path.basename(left_stimuli))[0], stimuli_correct_str, os.path.splitext(os.path.basename(right_stimuli))[0], round(time.time() - start_time, 2))
-                
-                # set timeout time for incorrect response
-                timeout_time = ls_parameters['TIMEOUT']
+            # add the time from the start of the trial to the first joystick movement,
+            # and the session times in nanoseconds of the stimulus onset, response and feedback
+            value += (pointer.first_move_latency(), onset_time, task.response_time, feedback_time)
+
+            # write log for task to results file, if it cannot be written the session stops
+            try:
+                write_event(results_writer, session_clock, current_task, value)
+            except resultswriter.WriterError as e:
+                writer_error = e
+                going = False
 
-                # if enough problem trials have been completed
-                if problem_trials >= ls_parameters['TRIALS_PER_PROB']:
-                    problem_trials = 0
-                    problems += 1 # increment number of problems
-                    new_stimuli = True # new problem
+            # keep the late and dropped frames of the trial
+            frame_stats.end_trial(current_task, context.total_trials)
 
-                    # if enough problems have been completed
-                    if (problems > ls_parameters['NUM_PROBS']):
-                        # if accuracy of all ls trials is > parameters percent, go to next task
-                        if (correct_trials / trials) >= (ls_parameters['PERCENT'] / 100):
-                            task_over = True
+            # reset the trial ending variables, the next trial is set up once the feedback or timeout is over
+            task.reset_trial()
+            onset_time = None
 
+            # end the session early if a trial limit was given on the command line
+            if max_trials is not None and context.total_trials >= max_trials:
+                going = False
 
+        frame_stats.end_phase(4) # task logic
+
+    # session over, every task was finished, or user quit with escape or by closing the window
+    results_writer.close() # write the last results to disk
+    prefetcher.shutdown()
+    trajectories.close()
+    frame_stats.write(frame_stats_path, subject)
+
+    if writer_error is not None:
+        raise SessionError(str(writer_error))
+    return finished
+
+""" Function to run a session on a station that is kept between sessions, like menu.py does when 'Go' is clicked:
+        picks the subject unless one is given, opens the station if it is not open yet and runs the session.
+        The station is left open, the caller closes it
+    @param station Station to run the session on
+    @param values dictionary of sections from parameters.validate()
+    @param parameters_text text of the parameters file, kept with the session in the results database, or None
+    @param subject animal ID, or None to pick it in the selection menu
+    @param max_trials end the session after this many trials, or None
+    @param use_store True to also write the results to the SQLite database
+    @return True if every task was finished, False if it was quit, None if no subject was picked,
+            raises SessionError if it cannot run """
+def run_on(station, values, parameters_text, subject = None, max_trials = None, use_store = False):
+    # start setting up the reward motor and loading the stimuli and sounds in the background while the user picks a subject
+    station.start()
+
+    with startup_phase(station.profile, 'animal IDs'):
+        ids = read_animal_ids()
+
+    # subject given, no need for the selection menu
+    if subject is None:
+        with startup_phase(station.profile, startup.PICKER_PHASE):
+            subject = pick_subject(ids, station.assets, os.path.join(main_dir, 'results'))
+        if subject is None:
+            return None
+
+    # a station kept from an earlier session picks up the stimuli added or removed since
+    if station.is_open():
+        station.refresh_stimuli()
+    else:
+        station.open()
+    station.show()
+    return run_session(station, subject, values, parameters_text, max_trials, use_store)
+
+""" Function to run a session on a new station: picks the subject unless one is given, opens the devices
+        and the display, runs the session and closes them again
+    @param values dictionary of sections from parameters.validate()
+    @param parameters_text text of the parameters file, kept with the session in the results database, or None
+    @param backends dictionary of the 'motor', 'input' and 'display' backends from devices.select()
+    @param subject animal ID, or None to pick it in the selection menu
+    @param vsync True to wait for the vertical blank on every display update
+    @param seed for the trials and the simulated input so runs can be repeated, or None
+    @param max_trials end the session after this many trials, or None
+    @param use_store True to also write the results to the SQLite database
+    @param profile startup.StartupProfile to time the startup with and print once the session is ready, or None
+    @return True if every task was finished, False if it was quit, None if no subject was picked,
+            raises SessionError if it cannot run """
+def run(values, parameters_text, backends, subject = None, vsync = False, seed = None, max_trials = None, use_store = False, profile = None):
+    # seed the trial randomness so simulated sessions can be repeated
+    if seed is not None:
+        random.seed(seed)
+
+    station = Station(backends, vsync, seed, profile)
+    try:
+        return run_on(station, values, parameters_text, subject, max_trials, use_store)
+    finally:
+        station.close()
+
+""" Function to show which session is next and wait for the operator to start it once the animal is in
+    @param station open Station
+    @param lines list of text lines to show
+    @return True to start the session, False to end the queue """
+def wait_for_operator(station, lines):
+    screen = station.screen
+    screen.blit(station.background, (0, 0))
+
+    # the font module is only initialized for this screen
+    pygame.font.init()
+    font = pygame.font.Font(None, 48)
+    for i, line in enumerate(lines):
+        text = font.render(line, True, (0, 0, 0))
+        screen.blit(text, text.get_rect(center = (screen.get_width() / 2, screen.get_height() / 2 + (i - (len(lines) - 1) / 2) * 60)))
+    pygame.display.flip()
 
-        # any time a trial ends (correct criterion OR no response in Reponse Time OR a choice was made)
-        if correct or timeout or chosen:
-            if correct:
-                correct_sound.play()
-                pellet()
-                time.sleep(4) # wait for sound to play and pellet to dispense
-            else:
-                incorrect_sound.play()
+    clock = pygame.time.Clock()
+    while True:
+        clock.tick(30)
 
-                # make screen blank for timeout_time
-                screen.blit(background, (0, 0))
-                pygame.display.update()
-                time.sleep(timeout_time)
+        # enter or space starts the session, escape ends the queue
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                return False
+            elif event.type == KEYDOWN and event.key in (K_RETURN, K_KP_ENTER, K_SPACE):
+                return True
+            else:
+                station.input_device.handle_event(event)
+
+        # drop the input of the wait, the Pointer of the session starts from when it starts
+        station.input_device.poll()
+        station.input_device.read()
+
+""" Function to run a queue of sessions one after another on one station, the devices, display, mixer
+        and stimuli cache are opened for the first session and kept warm for the rest. Every session is
+        written to the results files of its subject, which only hold that session once it starts
+    @param sessions list of sessionqueue.QueuedSession
+    @param backends dictionary of the 'motor', 'input' and 'display' backends from devices.select()
+    @param vsync True to wait for the vertical blank on every display update
+    @param seed for the trials and the simulated input so runs can be repeated, or None
+    @param max_trials end every session after this many trials, or None
+    @param use_store True to also write the results to the SQLite database
+    @param profile startup.StartupProfile to time the startup with and print once the first session is ready, or None
+    @return number of sessions run, raises SessionError if they cannot run """
+def run_queue(sessions, backends, vsync = False, seed = None, max_trials = None, use_store = False, profile = None):
+    # seed the trial randomness so simulated sessions can be repeated
+    if seed is not None:
+        random.seed(seed)
+
+    # the operator starts every session once the animal is in, without a display nobody is there to
+    wait = backends['display'] != 'dummy'
+
+    station = Station(backends, vsync, seed, profile)
+    sessions_run = 0
+    try:
+        station.open()
+
+        for number, session in enumerate(sessions, 1):
+            if wait:
+                with startup_phase(profile, startup.OPERATOR_PHASE):
+                    lines = ['Session {} of {}: {}'.format(number, len(sessions), session.subject),
+                             os.path.basename(session.parameters_file),
+                             'Enter to start, Escape to end the queue']
+                    if not wait_for_operator(station, lines):
+                        break
+
+            # stimuli may have been added or removed while the last session ran
+            if sessions_run > 0:
+                station.refresh_stimuli()
+
+            run_session(station, session.subject, session.values, session.text, max_trials, use_store)
+            sessions_run += 1
+    finally:
+        station.close()
+
+    return sessions_run
+
+""" Function to read the command line arguments
+    @return argparse namespace of the arguments """
+def parse_arguments():
+    parser = argparse.ArgumentParser(description = 'Run the tasks of the cognitive testing platform')
+    parser.add_argument('--profile', choices = sorted(devices.PROFILES), default = 'rig', help = 'backends of all the devices, rig by default')
+    parser.add_argument('--motor', choices = devices.MOTORS, help = 'reward motor backend instead of the profile\'s')
+    parser.add_argument('--input', choices = devices.INPUTS, help = 'input device backend instead of the profile\'s')
+    parser.add_argument('--display', choices = devices.DISPLAYS, help = 'display backend instead of the profile\'s')
+    parser.add_argument('--vsync', action = 'store_true', help = 'wait for the vertical blank on every display update')
+    parser.add_argument('--subject', help = 'animal ID to run, skips the selection menu')
+    parser.add_argument('--queue', help = 'file in main/ of animal IDs and their parameters files to run one after another, see sessionqueue.py')
+    parser.add_argument('--parameters', default = parameters_file, help = 'parameters file in main/ to use')
+    parser.add_argument('--seed', type = int, help = 'seed for the trials and the simulated input so runs can be repeated')
+    parser.add_argument('--max-trials', type = int, help = 'end the session after this many trials')
+    parser.add_argument('--store', action = 'store_true', help = 'also write the results to the SQLite database main/results/' + store.STORE_FILE)
+    parser.add_argument('--task-plugin', action = 'append', default = [], metavar = 'MODULE', help = 'module in main/ with more tasks to import before the parameters are read, can be given more than once')
+    parser.add_argument('--profile-startup', action = 'store_true', help = 'print how long every step of the startup took once the session is ready to run')
+    return parser.parse_args()
+
+""" Main function called when the program starts. Reads the parameters
+        from parameter_file, then runs the initial menu for animal ID
+        selection and every task in the parameters with run() """
+def main():
+    args = parse_arguments()
 
-            # write log for task to results file
-            write_event(results_file, current_task, value)
+    # print the messages of the sessions
+    logging.basicConfig(level = logging.INFO, format = '%(message)s')
 
-            # reset trial ending variables
-            correct = False
-            timeout = False
-            chosen = False
+    # time the startup from the imports on if asked
+    profile = None
+    if args.profile_startup:
+        profile = startup.StartupProfile(import_start)
+        profile.add('imports', import_start, import_end)
 
-            # reset the next trial
-            setup = False
+    # pick the reward motor, input device and display backends
+    backends = devices.select(args.profile, args.motor, args.input, args.display)
+    headless = backends['display'] == 'dummy'
+    if headless and args.subject is None and args.queue is None:
+        show_error('--subject or --queue is needed when running without a display', headless)
 
+    try:
+        # the tasks of the plugins have to be registered before their parameters are read
+        load_task_plugins(args.task_plugin)
+
+        # run every session of the queue, their parameters files are all checked first
+        if args.queue is not None:
+            sessions = sessionqueue.load(os.path.join(main_dir, args.queue), read_animal_ids())
+            run_queue(sessions, backends, args.vsync, args.seed, args.max_trials, use_results_store or args.store, profile)
+            return
+
+        # load parameters from main/parameter_file, every parameter is checked before the session starts
+        parameters_path = os.path.join(main_dir, args.parameters)
+        with startup_phase(profile, 'parameters'):
+            values = parameters.load(parameters_path)
+
+        # the text of the parameters is kept with the session in the results database
+        parameters_text = None
+        if use_results_store or args.store:
+            with open(parameters_path, 'r') as parameter_file:
+                parameters_text = parameter_file.read()
+
+        run(values, parameters_text, backends, args.subject, args.vsync, args.seed, args.max_trials, use_results_store or args.store, profile)
+
+    # error popup and exit program if the parameters or the queue are wrong or a device or file is missing
+    except (parameters.ParameterError, sessionqueue.QueueError, SessionError) as e:
+        show_error(str(e), headless)
 
 """ this calls the 'main' function when this script is executed """
 if __name__ == '__main__':
@@ -4,20 +4,33 @@
         the desired parameters for every task to run. The user has the option to
         save the parameters to a named file. When 'Go' is clicked, the current
         parameters from the window are saved to parameters_file and then 
-        game.py is called.
+        a session is run with them by game.py, in this same program. The
+        menu comes back once the session is over, ready for the next one.
 """
 
-import os, sys, re
+import os, logging
 
 # pip install pysimplegui
 import PySimpleGUI as sg
 
+# parameters file reading and checking shared with game.py, main/parameters.py
+import parameters
+
+# sessions of the tasks, run in this program, main/game.py
+import game
+
+# reward motor, input device and display backends, main/devices.py
+import devices
+
 main_dir = os.path.split(os.path.abspath(__file__))[0] # directory where this file is, should be main/
 os.chdir(main_dir) # make sure we are in this directory
 
 # parameters file to use for running the game
 parameters_file = 'parameters.txt'
 
+# devices.PROFILES profile of the backends the sessions are run with
+device_profile = 'rig'
+
 # lambda function overloading pysimplegui Text and Input so that they are all the same size/font
 # basically just a macro to make code look nicer and save text
 TextCustom = lambda text, font = ('Arial', 11):sg.Text(text = text, font = font, size = (30, 1))
@@ -29,6 +42,7 @@ options = [
             [TextCustom('Use Parameters from File', font = ('Arial', 11, 'bold')), InputTextCustom('IN_FILE'), sg.FileBrowse()], # file browser for loading parameters file
             [TextCustom(' '), sg.Button('Load')], # Load button
             [TextCustom('Task Order'), sg.Radio('Series', 'RADIO_TASKORDER', key = 'TASKORDER_SERIES'), sg.Radio('Random', 'RADIO_TASKORDER', key = 'TASKORDER_RAND')], # Yes/No button for Taskorder
+            [TextCustom('Render Mode'), sg.Combo(('','Full','Dirty'), key = 'RENDERMODE')], # Drop down box for full screen or dirty rectangle drawing
 
             [sg.T(' '  * 10)], # Blank space
 
@@ -101,219 +115,158 @@ layout = [
          ]
 
 
-""" Function to read a parameter from a given array of text and return its value
-    @param name of the parameter to search for
-    @param parameters array of text to search 
-    @return the value of the parameter found """
-def read_parameter(name, parameters):
-    # loop through every text line in parameters
-    for i in range(0, len(parameters)):
-        # search for the name and ignore upper/lower case
-        if re.search(name, parameters[i], re.IGNORECASE):
-            # return the value of the parameter which is on the next line after our found name
-            return parameters[i + 1].rstrip('\n')
-
-    # if parameter not found, make value in menu blank
-    return ''
-
-""" Function to write a parameter to a given array of text by name
-    @param name of parameter to search for
-    @param value of parameter to write
-    @param parameters array of text to search """
-def write_parameter(name, value, parameters):
-    # only write parameters that have filled out fields
-    if value not in ('', None):
-        # loop through every text line in parameters
-        for i in range(0, len(parameters)):
-            # search for the name and ignore upper/lower case
-            if re.search(name, parameters[i], re.IGNORECASE):
-                # write the value of the parameter which is on the next line after our found name
-                parameters[i + 1] = value + '\n'
-                return
-
-    # if parameter not found, give warning popup
-    sg.Popup('Warning:', name + ' not found in input parameter format, so not saved to output file')
+# parameters filled in with a text box or drop down box: (name in the parameters file, key of the box)
+FIELDS = [
+            ('Render Mode', 'RENDERMODE'),
+            ('Side Task Trials to Criterion', 'TRIALS_S'),
+            ('Side Start Level', 'LEVEL_S'),
+            ('Side Task Response Time', 'RESPONSE_S'),
+            ('Side Task Timeout Time', 'TIMEOUT_S'),
+            ('Chase Task Trials to Criterion', 'TRIALS_C'),
+            ('Chase Circle Size', 'CIRCLE_C'),
+            ('Chase Task Response Time', 'RESPONSE_C'),
+            ('Chase Task Timeout Time', 'TIMEOUT_C'),
+            ('Pursuit Task Trials to Criterion', 'TRIALS_P'),
+            ('Pursuit Circle Size', 'CIRCLE_P'),
+            ('Pursuit Task Pursuit Time', 'PURSUIT_P'),
+            ('Pursuit Task Response Time', 'RESPONSE_P'),
+            ('Pursuit Task Timeout Time', 'TIMEOUT_P'),
+            ('MTS Task Trials for Criterion', 'TRIALS_MTS'),
+            ('MTS Task % Correct for Criterion', 'PERCENT_MTS'),
+            ('MTS Task Response Time', 'RESPONSE_MTS'),
+            ('MTS Task Timeout Time', 'TIMEOUT_MTS'),
+            ('DMTS Task Trials for Criterion', 'TRIALS_DMTS'),
+            ('DMTS Task % Correct for Criterion', 'PERCENT_DMTS'),
+            ('DMTS Delay Time', 'DELAY_DMTS'),
+            ('DMTS Task Response Time', 'RESPONSE_DMTS'),
+            ('DMTS Task Timeout Time', 'TIMEOUT_DMTS'),
+            ('Learning Set Trials Per Problem', 'TRIALSPERPROB_LS'),
+            ('Learning Set Number of Problems', 'NUMPROBS_LS'),
+            ('Learning Set % Correct for Criterion', 'PERCENT_LS'),
+            ('Learning Set Response Time', 'RESPONSE_LS'),
+            ('Learning Set Timeout Time', 'TIMEOUT_LS'),
+         ]
+
+# parameters picked with a pair of radio buttons: (name in the parameters file, value and key of the first button, value and key of the second)
+RADIOS = [
+            ('Task Order', 'Series', 'TASKORDER_SERIES', 'Random', 'TASKORDER_RAND'),
+            ('Side Task Active', 'Yes', 'S_YES', 'No', 'S_NO'),
+            ('Side Task Titration', 'Yes', 'TIT_S_YES', 'No', 'TIT_S_NO'),
+            ('Chase Task Active', 'Yes', 'C_YES', 'No', 'C_NO'),
+            ('Chase Task Titration', 'Yes', 'TIT_C_YES', 'No', 'TIT_C_NO'),
+            ('Pursuit Task Active', 'Yes', 'P_YES', 'No', 'P_NO'),
+            ('Pursuit Task Titration', 'Yes', 'TIT_P_YES', 'No', 'TIT_P_NO'),
+            ('MTS Task Active', 'Yes', 'MTS_YES', 'No', 'MTS_NO'),
+            ('MTS Task Titration', 'Yes', 'TIT_MTS_YES', 'No', 'TIT_MTS_NO'),
+            ('DMTS Task Active', 'Yes', 'DMTS_YES', 'No', 'DMTS_NO'),
+            ('DMTS Task Titration', 'Yes', 'TIT_DMTS_YES', 'No', 'TIT_DMTS_NO'),
+            ('Learning Set Task Active', 'Yes', 'L_YES', 'No', 'L_NO'),
+            ('Learning Set Titration', 'Yes', 'TIT_LS_YES', 'No', 'TIT_LS_NO'),
+         ]
 
 """ Function to update all of the window parameter values from the file passed in
     @param filename of the parameter file to use
     @param window from pysimplegui to update with values
-    @return parameters array of text from file """
+    @return parameters.ParameterFile read from the file """
 def load_parameters(filename, window):
     # check if filename exists in main/ directory
     if os.path.exists(filename) is False:
         sg.Popup('Error:', filename + ' does not exist')
         return None
 
-    # read array of text from passed in file
-    parameter_file = open(filename, 'r')
-    parameters = parameter_file.readlines()
-    parameter_file.close()
-
-    # the keys of pysimplegui objects established in layout[] is used to index the window to update their values
-
-    # udpate general parameters on window
-    window['TASKORDER_SERIES'].Update(re.search('Series', read_parameter('Task Order', parameters), re.IGNORECASE))
-    window['TASKORDER_RAND'].Update(re.search('Random', read_parameter('Task Order', parameters), re.IGNORECASE))
-
-    # update side task parameters on window
-    window['S_YES'].Update(re.search('Yes', read_parameter('Side Task Active', parameters), re.IGNORECASE))
-    window['S_NO'].Update(re.search('No', read_parameter('Side Task Active', parameters), re.IGNORECASE))
-    window['TRIALS_S'].Update(read_parameter('Side Task Trials to Criterion', parameters))
-    window['LEVEL_S'].Update(read_parameter('Side Start Level', parameters))
-    window['RESPONSE_S'].Update(read_parameter('Side Task Response Time', parameters))
-    window['TIMEOUT_S'].Update(read_parameter('Side Task Timeout Time', parameters))
-    window['TIT_S_YES'].Update(re.search('Yes', read_parameter('Side Task Titration', parameters), re.IGNORECASE))
-    window['TIT_S_NO'].Update(re.search('No', read_parameter('Side Task Titration', parameters), re.IGNORECASE))
-
-    # update chase task parameters on window
-    window['C_YES'].Update(re.search('Yes', read_parameter('Chase Task Active', parameters), re.IGNORECASE))
-    window['C_NO'].Update(re.search('No', read_parameter('Chase Task Active', parameters), re.IGNORECASE))
-    window['TRIALS_C'].Update(read_parameter('Chase Task Trials to Criterion', parameters))
-    window['CIRCLE_C'].Update(read_parameter('Chase Circle Size', parameters))
-    window['RESPONSE_C'].Update(read_parameter('Chase Task Response Time', parameters))
-    window['TIMEOUT_C'].Update(read_parameter('Chase Task Timeout Time', parameters))
-    window['TIT_C_YES'].Update(re.search('Yes', read_parameter('Chase Task Titration', parameters), re.IGNORECASE))
-    window['TIT_C_NO'].Update(re.search('No', read_parameter('Chase Task Titration', parameters), re.IGNORECASE))
-
-    # update pursuit task parameters on window
-    window['P_YES'].Update(re.search('Yes', read_parameter('Pursuit Task Active', parameters), re.IGNORECASE))
-    window['P_NO'].Update(re.search('No', read_parameter('Pursuit Task Active', parameters), re.IGNORECASE))
-    window['TRIALS_P'].Update(read_parameter('Pursuit Task Trials to Criterion', parameters))
-    window['CIRCLE_P'].Update(read_parameter('Pursuit Circle Size', parameters))
-    window['PURSUIT_P'].Update(read_parameter('Pursuit Task Pursuit Time', parameters))
-    window['RESPONSE_P'].Update(read_parameter('Pursuit Task Response Time', parameters))
-    window['TIMEOUT_P'].Update(read_parameter('Pursuit Task Timeout Time', parameters))
-    window['TIT_P_YES'].Update(re.search('Yes', read_parameter('Pursuit Task Titration', parameters), re.IGNORECASE))
-    window['TIT_P_NO'].Update(re.search('No', read_parameter('Pursuit Task Titration', parameters), re.IGNORECASE))
-
-    # update mts task parameters on window
-    window['MTS_YES'].Update(re.search('Yes', read_parameter('MTS Task Active', parameters), re.IGNORECASE))
-    window['MTS_NO'].Update(re.search('No', read_parameter('MTS Task Active', parameters), re.IGNORECASE))
-    window['TRIALS_MTS'].Update(read_parameter('MTS Task Trials for Criterion', parameters))
-    window['PERCENT_MTS'].Update(read_parameter('MTS Task % Correct for Criterion', parameters))
-    window['RESPONSE_MTS'].Update(read_parameter('MTS Task Response Time', parameters))
-    window['TIMEOUT_MTS'].Update(read_parameter('MTS Task Timeout Time', parameters))
-    window['TIT_MTS_YES'].Update(re.search('Yes', read_parameter('MTS Task Titration', parameters), re.IGNORECASE))
-    window['TIT_MTS_NO'].Update(re.search('No', read_parameter('MTS Task Titration', parameters), re.IGNORECASE))
-
-    # update dmts task parameters on window
-    window['DMTS_YES'].Update(re.search('Yes', read_parameter('DMTS Task Active', parameters), re.IGNORECASE))
-    window['DMTS_NO'].Update(re.search('No', read_parameter('DMTS Task Active', parameters), re.IGNORECASE))
-    window['TRIALS_DMTS'].Update(read_parameter('DMTS Task Trials for Criterion', parameters))
-    window['PERCENT_DMTS'].Update(read_parameter('DMTS Task % Correct for Criterion', parameters))
-    window['DELAY_DMTS'].Update(read_parameter('DMTS Delay Time', parameters))
-    window['RESPONSE_DMTS'].Update(read_parameter('DMTS Task Response Time', parameters))
-    window['TIMEOUT_DMTS'].Update(read_parameter('DMTS Task Timeout Time', parameters))
-    window['TIT_DMTS_YES'].Update(re.search('Yes', read_parameter('DMTS Task Titration', parameters), re.IGNORECASE))
-    window['TIT_DMTS_NO'].Update(re.search('No', read_parameter('DMTS Task Titration', parameters), re.IGNORECASE))
-
-    # update learning set task parameters on window
-    window['L_YES'].Update(re.search('Yes', read_parameter('Learning Set Task Active', parameters), re.IGNORECASE))
-    window['L_NO'].Update(re.search('No', read_parameter('Learning Set Task Active', parameters), re.IGNORECASE))
-    window['TRIALSPERPROB_LS'].Update(read_parameter('Learning Set Trials Per Problem', parameters))
-    window['NUMPROBS_LS'].Update(read_parameter('Learning Set Number of Problems', parameters))
-    window['PERCENT_LS'].Update(read_parameter('Learning Set % Correct for Criterion', parameters))
-    window['RESPONSE_LS'].Update(read_parameter('Learning Set Response Time', parameters))
-    window['TIMEOUT_LS'].Update(read_parameter('Learning Set Timeout Time', parameters))
-    window['TIT_LS_YES'].Update(re.search('Yes', read_parameter('Learning Set Titration', parameters), re.IGNORECASE))
-    window['TIT_LS_NO'].Update(re.search('No', read_parameter('Learning Set Titration', parameters), re.IGNORECASE))
-
-
-    return parameters
+    # read the file once, parameters are looked up by their exact name
+    parameter_file = parameters.read(filename)
+
+    # the keys of pysimplegui objects established in layout[] is used to index the window to update their values,
+    # parameters not in the file are left blank
+    for name, key in FIELDS:
+        window[key].Update(parameter_file.get(name, ''))
+    for name, first_value, first_key, second_value, second_key in RADIOS:
+        value = parameter_file.get(name, '').lower()
+        window[first_key].Update(value == first_value.lower())
+        window[second_key].Update(value == second_value.lower())
+
+    return parameter_file
+
+""" Function to set all of the current window parameter values in the parameters
+    @param values pysimplegui array to take parameters from
+    @param parameter_file parameters.ParameterFile to set them in """
+def update_parameters(values, parameter_file):
+    # the keys of pysimplegui objects established in layout[] is used to index the values array for their current value
+    changes = [(name, values[key]) for name, key in FIELDS]
+    changes += [(name, first_value if values[first_key] else second_value) for name, first_value, first_key, second_value, second_key in RADIOS]
+
+    missing = []
+    for name, value in changes:
+        # only write parameters that have filled out fields
+        if value in ('', None):
+            continue
+        if parameter_file.has(name):
+            parameter_file.set(name, value)
+        else:
+            missing.append(name)
+
+    # if parameters are not found, give warning popup
+    if missing:
+        sg.Popup('Warning:', ', '.join(missing) + ' not found in input parameter format, so not saved to output file')
 
 """ Function to write all of the current window parameter values to a file
     @param filename of the parameter file to write to
     @param values pysimplegui array to take parameters from
-    @param parameters array of text to use as file base """
-def save_parameters(filename, values, parameters):
-    # the keys of pysimplegui objects established in layoutr[] is used to index the values array for their current value
-
-    # save general parameters
-    write_parameter('Task Order', ('Random','Series')[values['TASKORDER_SERIES']], parameters)
-
-    # save side task parameters from window
-    write_parameter('Side Task Active', ('No','Yes')[values['S_YES']], parameters)
-    write_parameter('Side Task Trials to Criterion', values['TRIALS_S'], parameters)
-    write_parameter('Side Start Level', values['LEVEL_S'], parameters)
-    write_parameter('Side Task Response Time', values['RESPONSE_S'], parameters)
-    write_parameter('Side Task Timeout Time', values['TIMEOUT_S'], parameters)
-    write_parameter('Side Task Titration', ('No','Yes')[values['TIT_S_YES']], parameters)
-
-    # save chase task parameters from window
-    write_parameter('Chase Task Active', ('No','Yes')[values['C_YES']], parameters)
-    write_parameter('Chase Task Trials to Criterion', values['TRIALS_C'], parameters)
-    write_parameter('Chase Circle Size', values['CIRCLE_C'], parameters)
-    write_parameter('Chase Task Response Time', values['RESPONSE_C'], parameters)
-    write_parameter('Chase Task Timeout Time', values['TIMEOUT_C'], parameters)
-    write_parameter('Chase Task Titration', ('No','Yes')[values['TIT_C_YES']], parameters)
-
-    # save pursuit task parameters from window
-    write_parameter('Pursuit Task Active', ('No','Yes')[values['P_YES']], parameters)
-    write_parameter('Pursuit Task Trials to Criterion', values['TRIALS_P'], parameters)
-    write_parameter('Pursuit Circle Size', values['CIRCLE_P'], parameters)
-    write_parameter('Pursuit Task Pursuit Time', values['PURSUIT_P'], parameters)
-    write_parameter('Pursuit Task Response Time', values['RESPONSE_P'], parameters)
-    write_parameter('Pursuit Task Timeout Time', values['TIMEOUT_P'], parameters)
-    write_parameter('Pursuit Task Titration', ('No','Yes')[values['TIT_P_YES']], parameters)
-
-    # save mts task parameters from window
-    write_parameter('MTS Task Active', ('No','Yes')[values['MTS_YES']], parameters)
-    write_parameter('MTS Task Trials for Criterion', values['TRIALS_MTS'], parameters)
-    write_parameter('MTS Task % Correct for Criterion', values['PERCENT_MTS'], parameters)
-    write_parameter('MTS Task Response Time', values['RESPONSE_MTS'], parameters)
-    write_parameter('MTS Task Timeout Time', values['TIMEOUT_MTS'], parameters)
-    write_parameter('MTS Task Titration', ('No','Yes')[values['TIT_MTS_YES']], parameters)
-
-    # save dmts task parameters from window
-    write_parameter('DMTS Task Active', ('No','Yes')[values['DMTS_YES']], parameters)
-    write_parameter('DMTS Task Trials for Criterion', values['TRIALS_DMTS'], parameters)
-    write_parameter('DMTS Task % Correct for Criterion', values['PERCENT_DMTS'], parameters)
-    write_parameter('DMTS Delay Time', values['DELAY_DMTS'], parameters)
-    write_parameter('DMTS Task Response Time', values['RESPONSE_DMTS'], parameters)
-    write_parameter('DMTS Task Timeout Time', values['TIMEOUT_DMTS'], parameters)
-    write_parameter('DMTS Task Titration', ('No','Yes')[values['TIT_DMTS_YES']], parameters)
-
-    # save learning set task parameters from window
-    write_parameter('Learning Set Task Active', ('No','Yes')[values['L_YES']], parameters)
-    write_parameter('Learning Set Trials Per Problem', values['TRIALSPERPROB_LS'], parameters)
-    write_parameter('Learning Set Number of Problems', values['NUMPROBS_LS'], parameters)
-    write_parameter('Learning Set % Correct for Criterion', values['PERCENT_LS'], parameters)
-    write_parameter('Learning Set Response Time', values['RESPONSE_LS'], parameters)
-    write_parameter('Learning Set Timeout Time', values['TIMEOUT_LS'], parameters)
-    write_parameter('Learning Set Titration', ('No','Yes')[values['TIT_LS_YES']], parameters)
-
-    # write array of text to file passed in
-    parameter_file = open(filename, 'w')
-    parameter_file.writelines(parameters)
-    parameter_file.close()
+    @param parameter_file parameters.ParameterFile to use as file base """
+def save_parameters(filename, values, parameter_file):
+    update_parameters(values, parameter_file)
+
+    # write the file in one pass
+    parameter_file.write(filename)
 
 """ Main function called at runtime, starts the pysimplegui window and
-        handles user input for loading/saving/writing parameters, ends
-        when user hits 'Go' and a parameter file was loaded atleast once. """
+        handles user input for loading/saving/writing parameters, runs
+        a session when user hits 'Go' and a parameter file was loaded
+        atleast once, ends when the window is closed. The sessions share one
+        game.Station, which is closed with the window """
 def main():
-    loaded = False
+    # the messages of the sessions, like a pellet that failed to dispense, are printed to the console the menu runs in
+    logging.basicConfig(level = logging.INFO, format = '%(message)s')
 
     # start the pysimplegui window based on the layout we defined
     window = sg.Window('Cognitive Testing System', layout)
 
+    # one station for every session run from the menu, the reward motor and the assets are set up in the background
+    # while the parameters are changed, it is opened by the first session and kept open until the window is closed
+    station = game.Station(devices.select(device_profile))
+    station.start()
+    try:
+        run_menu(window, station)
+    finally:
+        station.close()
+
+    # close pysimplegui window
+    window.close()
+
+""" Function to process the events of the menu window until it is closed
+    @param window pysimplegui window of the menu
+    @param station game.Station the sessions are run on """
+def run_menu(window, station):
+    loaded = False
+
     # event loop to process 'events' and get the 'values' of the inputs
     while True:             
         event, values = window.read() # update pysimplegui values
 
         # if user closes Window
         if event in ([None]):
-            window.close()
-            sys.exit()
+            break
 
         # if user clicks 'Load' button
         if event in (['Load']):
             # if there is a filename in load parameters file selection
             if (values['IN_FILE'] not in ('', None)):
-                # get array of text from parameter file
-                parameters = load_parameters(values['IN_FILE'], window)
+                # get the parameters from the parameter file
+                parameter_file = load_parameters(values['IN_FILE'], window)
 
-                # if array of text is not empty, we have successfully loaded our parameters
-                if parameters is not None:
+                # if the file could be read, we have successfully loaded our parameters
+                if parameter_file is not None:
                     loaded = True
 
             # if user did not select a file to load but clicked Load button
@@ -326,7 +279,7 @@ def main():
             if (values['OUT_FILE'] not in ('', None)):
                 # make sure we have loaded atleast once before saving file
                 if loaded is True:
-                    save_parameters(values['OUT_FILE'], values, parameters)
+                    save_parameters(values['OUT_FILE'], values, parameter_file)
                 else:
                     sg.Popup('Error:', 'Need to load parameters from file once first to get format')
 
@@ -336,20 +289,29 @@ def main():
 
         # if user clicks 'Go' button
         if event in (['Go']):
-            # if we have loaded a parameters file atleast once, then we can end
+            # if we have loaded a parameters file atleast once, then we can run a session
             if loaded is False:
                 sg.Popup('Error:', 'Must load parameters from file first')
             else:
-                break
-
-    # close pysimplegui window
-    window.close()
-
-    # write our current window parameters to parmeters_file that is used by game.py
-    save_parameters(os.path.join(main_dir, parameters_file), values, parameters)
-
-    # call game.py to run the tasks with out parameters
-    os.system('python3 {}'.format(os.path.join(main_dir, 'game.py')))
+                # check every parameter before the session starts, so a wrong value can be fixed here
+                update_parameters(values, parameter_file)
+                try:
+                    session_parameters = parameters.validate(parameter_file)
+                except parameters.ParameterError as e:
+                    sg.Popup('Error:', str(e))
+                    continue
+
+                # write our current window parameters to parmeters_file, so game.py can be run with them on its own
+                parameter_file.write(os.path.join(main_dir, parameters_file))
+
+                # run the session with the parameters as they are, hiding the menu until it is over and the display after it
+                window.Hide()
+                try:
+                    game.run_on(station, session_parameters, parameter_file.text(), use_store = game.use_results_store)
+                except game.SessionError as e:
+                    sg.Popup('Error:', str(e))
+                station.hide()
+                window.UnHide()
 
 # this calls the 'main' function when this script is executed
 if __name__ == '__main__':
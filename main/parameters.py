@@ -0,0 +1,252 @@
+""" parameters.py
+        Reads and writes the parameters files used by menu.py and game.py
+        (defaults.txt, parameters.txt). A parameters file is a name line, like
+        'Side Task Active [Yes, No]', then a line with its value, with blank
+        lines between parameters. The file is read in one pass into a
+        dictionary of the exact names (without the [choices], ignoring upper
+        and lower case), and written back in one pass with only the values
+        changed, so the layout and comments of the file are kept.
+
+        SCHEMA lists every parameter with its type and allowed values. load()
+        checks all of them at once before a session starts and raises
+        ParameterError listing every problem, instead of a session stopping
+        halfway on the first bad value. Parameters of a task that is not active
+        do not have to be filled in.
+"""
+
+import os, collections
+
+""" Class for a parameters file that cannot be used """
+class ParameterError(ValueError):
+    pass
+
+# parameter of the SCHEMA
+#   name       - name in the parameters file
+#   section    - 'general' or the task it is for ('Side', 'Chase', 'Pursuit', 'MTS', 'DMTS', 'LS')
+#   key        - key in the dictionary of the section game.py uses
+#   kind       - 'int', 'float', 'bool' (Yes or No) or 'choice'
+#   choices    - allowed values of 'choice' parameters
+#   minimum, maximum - allowed range of 'int' and 'float' parameters, None for no limit
+#   default    - value of a parameter older files may not have, None if it is needed
+Parameter = collections.namedtuple('Parameter', 'name section key kind choices minimum maximum default')
+
+""" Function to make a Parameter, leaving out what does not apply
+    @return Parameter """
+def parameter(name, section, key, kind, choices = (), minimum = None, maximum = None, default = None):
+    return Parameter(name, section, key, kind, choices, minimum, maximum, default)
+
+# every parameter in the order of the parameters file
+SCHEMA = (
+    parameter('Task Order', 'general', 'TASKORDER', 'choice', ('Series', 'Random')),
+    parameter('Render Mode', 'general', 'RENDER_MODE', 'choice', ('Full', 'Dirty'), default = 'Full'),
+
+    parameter('Side Task Active', 'Side', 'ACTIVE', 'bool'),
+    parameter('Side Task Trials to Criterion', 'Side', 'TRIALS', 'int', minimum = 1),
+    parameter('Side Start Level', 'Side', 'START_LEVEL', 'int', minimum = 1, maximum = 6),
+    parameter('Side Task Response Time', 'Side', 'RESPONSE', 'float', minimum = 0),
+    parameter('Side Task Timeout Time', 'Side', 'TIMEOUT', 'float', minimum = 0),
+    parameter('Side Task Titration', 'Side', 'TITRATION', 'bool'),
+
+    parameter('Chase Task Active', 'Chase', 'ACTIVE', 'bool'),
+    parameter('Chase Task Trials to Criterion', 'Chase', 'TRIALS', 'int', minimum = 1),
+    parameter('Chase Circle Size', 'Chase', 'CIRCLE_SIZE', 'choice', ('Small', 'Medium', 'Large')),
+    parameter('Chase Task Response Time', 'Chase', 'RESPONSE', 'float', minimum = 0),
+    parameter('Chase Task Timeout Time', 'Chase', 'TIMEOUT', 'float', minimum = 0),
+    parameter('Chase Task Titration', 'Chase', 'TITRATION', 'bool'),
+
+    parameter('Pursuit Task Active', 'Pursuit', 'ACTIVE', 'bool'),
+    parameter('Pursuit Task Trials to Criterion', 'Pursuit', 'TRIALS', 'int', minimum = 1),
+    parameter('Pursuit Circle Size', 'Pursuit', 'CIRCLE_SIZE', 'choice', ('Small', 'Medium', 'Large')),
+    parameter('Pursuit Task Pursuit Time', 'Pursuit', 'PURSUIT_TIME', 'float', minimum = 0),
+    parameter('Pursuit Task Response Time', 'Pursuit', 'RESPONSE', 'float', minimum = 0),
+    parameter('Pursuit Task Timeout Time', 'Pursuit', 'TIMEOUT', 'float', minimum = 0),
+    parameter('Pursuit Task Titration', 'Pursuit', 'TITRATION', 'bool'),
+
+    parameter('MTS Task Active', 'MTS', 'ACTIVE', 'bool'),
+    parameter('MTS Task Trials for Criterion', 'MTS', 'TRIALS', 'int', minimum = 1),
+    parameter('MTS Task % Correct for Criterion', 'MTS', 'PERCENT', 'float', minimum = 0, maximum = 100),
+    parameter('MTS Task Response Time', 'MTS', 'RESPONSE', 'float', minimum = 0),
+    parameter('MTS Task Timeout Time', 'MTS', 'TIMEOUT', 'float', minimum = 0),
+    parameter('MTS Task Titration', 'MTS', 'TITRATION', 'bool'),
+
+    parameter('DMTS Task Active', 'DMTS', 'ACTIVE', 'bool'),
+    parameter('DMTS Task Trials for Criterion', 'DMTS', 'TRIALS', 'int', minimum = 1),
+    parameter('DMTS Task % Correct for Criterion', 'DMTS', 'PERCENT', 'float', minimum = 0, maximum = 100),
+    parameter('DMTS Delay Time', 'DMTS', 'DELAY', 'float', minimum = 0),
+    parameter('DMTS Task Response Time', 'DMTS', 'RESPONSE', 'float', minimum = 0),
+    parameter('DMTS Task Timeout Time', 'DMTS', 'TIMEOUT', 'float', minimum = 0),
+    parameter('DMTS Task Titration', 'DMTS', 'TITRATION', 'bool'),
+
+    parameter('Learning Set Task Active', 'LS', 'ACTIVE', 'bool'),
+    parameter('Learning Set Trials Per Problem', 'LS', 'TRIALS_PER_PROB', 'int', minimum = 1),
+    parameter('Learning Set Number of Problems', 'LS', 'NUM_PROBS', 'int', minimum = 1),
+    parameter('Learning Set % Correct for Criterion', 'LS', 'PERCENT', 'float', minimum = 0, maximum = 100),
+    parameter('Learning Set Response Time', 'LS', 'RESPONSE', 'float', minimum = 0),
+    parameter('Learning Set Timeout Time', 'LS', 'TIMEOUT', 'float', minimum = 0),
+    parameter('Learning Set Titration', 'LS', 'TITRATION', 'bool'),
+)
+
+# tasks in the order game.py runs them in Series
+TASKS = ('Side', 'Chase', 'Pursuit', 'MTS', 'DMTS', 'LS')
+
+""" Function to add the parameters of a task from a plugin, tasks.add_task() calls it
+    @param task name of the task, run after the others in Series
+    @param specs list of Parameter of the task, give its 'ACTIVE' parameter a default of 'No' so older files still load """
+def add_task(task, specs):
+    global SCHEMA, TASKS
+    if task in TASKS:
+        raise ValueError('there is already a task named ' + task)
+    SCHEMA += tuple(specs)
+    TASKS += (task,)
+
+""" Function to get the name a parameter is looked up by
+    @param line name line of the parameters file, like 'Side Task Active [Yes, No]'
+    @return name without the [choices] in lower case, like 'side task active' """
+def lookup_name(line):
+    name = line.strip()
+    if name.endswith(']') and '[' in name:
+        name = name[:name.rindex('[')]
+    return name.strip().lower()
+
+""" Class for the text of a parameters file """
+class ParameterFile:
+    """ ParameterFile Constructor, reads the lines in one pass
+        @param self
+        @param lines list of the text lines of the file """
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.values = {} # lookup name: index of its value line
+
+        i = 0
+        while i < len(self.lines):
+            if self.lines[i].strip():
+                # a name line, its value is the next line
+                self.values.setdefault(lookup_name(self.lines[i]), i + 1)
+                i += 2
+            else:
+                i += 1
+
+    """ Function to get the text of a parameter
+        @param self
+        @param name of the parameter
+        @param default to return if the file does not have it
+        @return value text, without the newline """
+    def get(self, name, default = None):
+        i = self.values.get(lookup_name(name))
+        if i is None:
+            return default
+        return self.lines[i].strip() if i < len(self.lines) else ''
+
+    """ Function to check if the file has a parameter
+        @param self
+        @param name of the parameter
+        @return True if it has """
+    def has(self, name):
+        return lookup_name(name) in self.values
+
+    """ Function to set the text of a parameter
+        @param self
+        @param name of the parameter, it has to be in the file
+        @param value text """
+    def set(self, name, value):
+        i = self.values[lookup_name(name)]
+        if i == len(self.lines):
+            self.lines.append('')
+        self.lines[i] = str(value) + '\n'
+
+    """ Function to get the whole text of the file
+        @param self
+        @return text """
+    def text(self):
+        # the last line may not end with a newline, a value written to it needs one before it
+        return ''.join(line if line.endswith('\n') or i == len(self.lines) - 1 else line + '\n' for i, line in enumerate(self.lines))
+
+    """ Function to write the file
+        @param self
+        @param path to write to """
+    def write(self, path):
+        with open(path, 'w') as parameter_file:
+            parameter_file.write(self.text())
+
+""" Function to read a parameters file
+    @param path of the file
+    @return ParameterFile """
+def read(path):
+    with open(path, 'r') as parameter_file:
+        return ParameterFile(parameter_file.readlines())
+
+""" Function to parse the text of a parameters file
+    @param text of the file
+    @return ParameterFile """
+def parse(text):
+    return ParameterFile(text.splitlines(keepends = True))
+
+""" Function to convert the text of a parameter to its type
+    @param spec Parameter from SCHEMA
+    @param text value text
+    @return typed value, raises ValueError with the reason it is not allowed """
+def convert(spec, text):
+    if spec.kind == 'bool':
+        if text.lower() not in ('yes', 'no'):
+            raise ValueError('has to be Yes or No')
+        return text.lower() == 'yes'
+
+    if spec.kind == 'choice':
+        for choice in spec.choices:
+            if text.lower() == choice.lower():
+                return choice
+        raise ValueError('has to be one of ' + ', '.join(spec.choices))
+
+    try:
+        value = int(text) if spec.kind == 'int' else float(text)
+    except ValueError:
+        raise ValueError('has to be a{} number'.format('' if spec.kind == 'float' else ' whole'))
+    if spec.minimum is not None and value < spec.minimum or spec.maximum is not None and value > spec.maximum:
+        limits = ' to '.join(str(limit) for limit in (spec.minimum, spec.maximum) if limit is not None)
+        raise ValueError('has to be {} {}'.format('at least' if spec.maximum is None else 'from', limits))
+    return value
+
+""" Function to check every parameter and convert them to their types
+    @param parameter_file ParameterFile
+    @return dictionary of sections ('general' and every task) of dictionaries of typed values by key,
+            only the 'ACTIVE' key for tasks that are not active, raises ParameterError with every problem """
+def validate(parameter_file):
+    values = {section: {} for section in ('general',) + TASKS}
+    errors = []
+
+    for spec in SCHEMA:
+        # only the active parameter of a task that is not active is needed
+        if spec.section != 'general' and spec.key != 'ACTIVE' and not values[spec.section].get('ACTIVE'):
+            continue
+
+        text = parameter_file.get(spec.name)
+        if text is None:
+            if spec.default is None:
+                errors.append('"{}" parameter does not exist'.format(spec.name))
+                continue
+            text = spec.default
+        try:
+            values[spec.section][spec.key] = convert(spec, text)
+        except ValueError as e:
+            errors.append('"{}" is "{}", {}'.format(spec.name, text, e))
+
+    if errors:
+        raise ParameterError('\n'.join(errors))
+    return values
+
+""" Function to read and check a parameters file
+    @param path of the file
+    @return dictionary of sections from validate(), raises ParameterError if it cannot be used """
+def load(path):
+    if not os.path.exists(path):
+        raise ParameterError('There must be a parameters file named ' + path)
+    try:
+        return validate(read(path))
+    except ParameterError as e:
+        raise ParameterError('{}:\n{}'.format(path, e))
+
+""" Function to get the tasks to run
+    @param values dictionary of sections from validate()
+    @return list of the active tasks in Series order """
+def active_tasks(values):
+    return [task for task in TASKS if values[task].get('ACTIVE')]
@@ -0,0 +1,118 @@
+""" render.py
+        Draws the sprites and walls of the current trial to the screen. In
+        'Full' render mode the whole screen is redrawn and sent to the display
+        every frame. In 'Dirty' render mode the background, walls and stimuli
+        that do not move are drawn once into a cached scene, and every frame
+        only the areas under the moving sprites (Pointer, Target) are redrawn
+        and sent to the display.
+
+        present() keeps the time the display update returned, which is when
+        a new stimulus is taken to be on screen. With vsync the update waits
+        for the vertical blank, so that time is when the frame was flipped.
+"""
+
+import time
+
+# pip install pygame --user
+import pygame
+
+""" Class for drawing the current trial to the screen """
+class Renderer:
+    """ Renderer Constructor
+        @param self
+        @param screen pygame display surface
+        @param background pygame surface drawn behind everything
+        @param dirty True for 'Dirty' render mode, False for 'Full' render mode
+        @param vsync True if the display was opened with vsync, every frame is then flipped whole """
+    def __init__(self, screen, background, dirty, vsync = False):
+        self.screen = screen
+        self.background = background
+        self.dirty = dirty
+        self.vsync = vsync
+        self.present_time = None # time.perf_counter() when the last display update returned
+
+        self.sprites = pygame.sprite.RenderPlain() # every sprite of the trial, in drawing order
+        self.fills = [] # (color, rect) walls drawn over the background
+        self.scene = background # cached background with walls and still sprites, used in 'Dirty' mode
+        self.moving = pygame.sprite.RenderUpdates() # sprites redrawn every frame in 'Dirty' mode
+        self.full_redraw = True # next frame needs the whole screen sent to the display
+
+    """ Function to set what is drawn for the trial
+        @param self
+        @param sprites list of pygame sprites, sprites with a 'still' attribute set to True never move
+        @param fills list of (color, rect) to fill over the background, like the Side walls """
+    def set_sprites(self, sprites, fills = ()):
+        self.sprites = pygame.sprite.RenderPlain(sprites)
+        self.fills = list(fills)
+
+        if self.dirty:
+            # draw everything that does not move into the cached scene once
+            self.scene = self.background.copy()
+            for color, rect in self.fills:
+                self.scene.fill(color, rect)
+            moving = []
+            for sprite in sprites:
+                if getattr(sprite, 'still', False):
+                    self.scene.blit(sprite.image, sprite.rect)
+                else:
+                    moving.append(sprite)
+            self.moving = pygame.sprite.RenderUpdates(moving)
+
+        # the whole scene changed
+        self.full_redraw = True
+
+    """ Function to update all of the sprites
+        @param self
+        @param background from pygame, passed to the sprite update functions """
+    def update(self, background):
+        if self.dirty:
+            self.moving.update(background)
+        else:
+            self.sprites.update(background)
+
+    """ Function to draw the trial to the screen
+        @param self
+        @return list of rects of the screen that changed, or None if the whole screen changed """
+    def draw(self):
+        # 'Full' mode, draw everything every frame
+        if not self.dirty:
+            self.screen.blit(self.background, (0, 0))
+            for color, rect in self.fills:
+                self.screen.fill(color, rect)
+            self.sprites.draw(self.screen)
+            return None
+
+        # 'Dirty' mode and the scene changed, draw the whole cached scene once
+        if self.full_redraw:
+            self.screen.blit(self.scene, (0, 0))
+            self.moving.draw(self.screen)
+            self.full_redraw = False
+            return None
+
+        # 'Dirty' mode, erase the moving sprites with the cached scene and draw them in their new place
+        self.moving.clear(self.screen, self.scene)
+        return self.moving.draw(self.screen)
+
+    """ Function to send what was drawn to the display
+        @param self
+        @param rects list of changed rects from draw(), or None for the whole screen
+        @return time.perf_counter() when the display update returned """
+    def present(self, rects):
+        if self.vsync:
+            # waits for the vertical blank, a vsync display can only be flipped whole
+            pygame.display.flip()
+        elif rects is None:
+            pygame.display.update()
+        elif len(rects) > 0:
+            pygame.display.update(rects)
+        self.present_time = time.perf_counter()
+        return self.present_time
+
+    """ Function to show only the background, for timeouts and delays
+        @param self """
+    def blank(self):
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.update()
+
+        # the next frame has to redraw the scene over the blank screen
+        self.full_redraw = True
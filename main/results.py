@@ -0,0 +1,381 @@
+""" results.py
+        Streams the results files written by game.py, results/{ID}Data.txt or
+        results/{ID}Data.jsonl, as typed records, one namedtuple per line,
+        without reading the whole file into memory. Every record has the
+        subject, the session number in the file, the time as a datetime, the
+        task, then the fields of its task from SCHEMAS in resultswriter.py.
+        Lines from older versions of game.py that do not have the trial timing
+        fields have None for them.
+
+        Sessions archived by archive.py are read first, so a results file
+        reads the same before and after its sessions are archived.
+
+        Sessions are numbered from 1 in every file. A new session starts at a
+        'Session' line, or in older files that do not have them, when the trial
+        number (total trials) does not go up.
+
+        to_columns() turns records into a dictionary of columns that
+        pandas.DataFrame() takes, to_structured() into a numpy structured array.
+
+        'python results.py results/{ID}Data.txt' prints the trials per task.
+"""
+
+import os, json, array, datetime, collections, argparse, time
+
+# fields of every task, shared with the writer, main/resultswriter.py
+import resultswriter
+
+# archived sessions of the results files, main/archive.py
+import archive
+
+# type of every field, fields not listed are text
+FIELD_TYPES = {
+    'total_trials': int,
+    'trials': int,
+    'problem': int,
+    'level': int,
+    'percent': float,
+    'latency': float,
+    'first_move': float,
+    'onset_ns': int,
+    'response_ns': int,
+    'feedback_ns': int,
+    'perf_counter_ns': int,
+    'time_ns': int,
+}
+
+# fields every record starts with
+RECORD_FIELDS = ('subject', 'session', 'time', 'task')
+
+""" Class for a line of a results file that cannot be parsed """
+class ParseError(ValueError):
+    pass
+
+""" Function to make the record type of every task
+    @return dictionary of namedtuple classes by task """
+def make_record_types():
+    record_types = {}
+    for task in resultswriter.SCHEMAS:
+        names = RECORD_FIELDS + tuple(name for name in resultswriter.fields(task) if name not in RECORD_FIELDS)
+        record_types[task] = collections.namedtuple(task + 'Record', names)
+    return record_types
+
+RECORD_TYPES = make_record_types()
+
+""" Function to get the subject of a results file from its name
+    @param path of the results file
+    @return subject ID """
+def subject_of(path):
+    name = os.path.basename(path)
+    for suffix in ('Data.txt', 'Data.jsonl'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+""" Function to parse the date and time a line was written
+    @param stamp text 'MM-DD-YYYY HH:MM:SS' or 'MM-DD-YYYY HH:MM:SS.mmm'
+    @return datetime """
+def parse_stamp(stamp):
+    # reorder into ISO format, datetime.fromisoformat() is much faster than datetime.strptime()
+    try:
+        return datetime.datetime.fromisoformat(stamp[6:10] + '-' + stamp[0:5] + stamp[10:])
+    except ValueError:
+        fraction = (stamp[20:] + '000000')[:6]
+        return datetime.datetime(int(stamp[6:10]), int(stamp[0:2]), int(stamp[3:5]), int(stamp[11:13]), int(stamp[14:16]), int(stamp[17:19]), int(fraction))
+
+""" Function to convert a field that can be 'NA' to an int
+    @param value text of the field
+    @return int, or None for 'NA' """
+def optional_int(value):
+    return None if value == 'NA' else int(value)
+
+""" Function to convert a field that can be 'NA' to a float
+    @param value text of the field
+    @return float, or None for 'NA' """
+def optional_float(value):
+    return None if value == 'NA' else float(value)
+
+""" Function to convert an int field that older versions wrote as a float, or that can be 'NA'
+    @param value text of the field
+    @return int, or None for 'NA' """
+def legacy_int(value):
+    return None if value == 'NA' else int(float(value))
+
+""" Function to convert a field of a line to its type
+    @param name of the field
+    @param value text of the field, or the value from a JSON line
+    @return typed value, None for 'NA' """
+def convert(name, value):
+    if value is None or value == 'NA':
+        return None
+    field_type = FIELD_TYPES.get(name)
+    if field_type is int and isinstance(value, str) and '.' in value:
+        # trial numbers of MTS were written as floats by older versions
+        return int(float(value))
+    if field_type is not None:
+        return field_type(value)
+    return value
+
+""" Class that keeps the session numbers of the records of a file as it is read """
+class SessionCounter:
+    """ SessionCounter Constructor
+        @param self """
+    def __init__(self):
+        self.session = 0
+        self.last_trial = None # total trials of the last trial of the session
+
+    """ Function to get the session of a record
+        @param self
+        @param task of the record
+        @param total_trials of the record, None for 'Session' records
+        @return session number """
+    def next(self, task, total_trials):
+        if task == 'Session':
+            self.session += 1
+            self.last_trial = None
+        else:
+            if self.session == 0 or (self.last_trial is not None and total_trials <= self.last_trial):
+                self.session += 1
+            self.last_trial = total_trials
+        return self.session
+
+""" Function to read the records of a results file one at a time
+    @param path of {ID}Data.txt or {ID}Data.jsonl
+    @param tasks optional collection of tasks to keep, others are skipped
+    @param errors 'raise' to raise ParseError on a bad line, 'skip' to leave it out
+    @return generator of records """
+def read_records(path, tasks = None, errors = 'raise'):
+    if path.endswith('.jsonl'):
+        return read_json_records(path, tasks, errors)
+    return read_text_records(path, tasks, errors)
+
+""" Function to make the converters of a task's columns lenient where a line did not convert,
+        so the lines after it convert without raising. A file writes a column the same way on
+        every line, so this happens once per task and file, like for the trial numbers of MTS
+        that older versions wrote as floats
+    @param converters list of the converter of every column, changed in place
+    @param values text of the fields of the line that did not convert
+    @return True if a converter was changed, False if the line does not convert with any """
+def widen(converters, values):
+    widened = False
+    for i, value in enumerate(values):
+        try:
+            converters[i](value)
+        except ValueError:
+            if converters[i] is int and value == 'NA':
+                converters[i] = optional_int
+            elif converters[i] in (int, optional_int):
+                converters[i] = legacy_int
+            elif converters[i] is float:
+                converters[i] = optional_float
+            else:
+                return False
+            widened = True
+    return widened
+
+""" Class for the columns of a task in a text results file, makes the records of its lines """
+class TextLayout:
+    """ TextLayout Constructor
+        @param self
+        @param task name, a key of resultswriter.SCHEMAS """
+    def __init__(self, task):
+        names = resultswriter.fields(task)
+        self.task = task
+        # text fields are taken as they are, widen() makes a column lenient once it has 'NA' in it
+        self.converters = [FIELD_TYPES.get(name, str) for name in names]
+        self.length = len(names)
+        self.fewest = len(resultswriter.SCHEMAS[task]) # older lines do not have the trial timing fields
+        self.first = 1 if task == 'Session' else 0 # the subject of 'Session' lines is already the first field of the record
+        self.record_type = RECORD_TYPES[task]
+        self.makers = {} # number of parts of a line: function making its record
+
+    """ Function to make the function that makes the record of a line, made like namedtuple makes its
+            classes: one expression that converts every field by the type of its column in turn
+        @param self
+        @param count number of parts of the line, its time and task then its fields
+        @return function(parts, subject, session, time) returning the record, None for the fields the line does not have """
+    def record_maker(self, count):
+        fields = []
+        for i in range(self.first, self.length):
+            if i + 2 >= count:
+                fields.append('None')
+            elif self.converters[i] is str:
+                fields.append('v[{}]'.format(i + 2))
+            else:
+                fields.append('c{}(v[{}])'.format(i, i + 2))
+        namespace = {'c{}'.format(i): converter for i, converter in enumerate(self.converters)}
+        namespace.update(record_type = self.record_type, task = self.task)
+        return eval('lambda v, subject, session, time: record_type(subject, session, time, task, {})'.format(', '.join(fields)), namespace)
+
+    """ Function to make the record of a line
+        @param self
+        @param parts of the line split on its separators
+        @param subject, session, time of the record
+        @return record, raises ValueError if the line does not fit the task """
+    def make(self, parts, subject, session, time):
+        maker = self.makers.get(len(parts))
+        if maker is None:
+            maker = self.makers[len(parts)] = self.record_maker(len(parts))
+        try:
+            return maker(parts, subject, session, time)
+        except ValueError:
+            # 'NA' or floats where an int is expected, the columns are made lenient once for the rest of the file
+            if not widen(self.converters, parts[2:]):
+                raise
+            self.makers.clear()
+            return self.make(parts, subject, session, time)
+
+    """ Function to get the total trials of a line
+        @param self
+        @param parts of the line split on its separators
+        @return total trials """
+    def total_trials(self, parts):
+        try:
+            return self.converters[0](parts[2])
+        except ValueError:
+            if not widen(self.converters, parts[2:3]):
+                raise
+            self.makers.clear()
+            return self.converters[0](parts[2])
+
+""" Function to read the records of a text results file one at a time
+    @param path of {ID}Data.txt
+    @param tasks optional collection of tasks to keep
+    @param errors 'raise' or 'skip'
+    @return generator of records """
+def read_text_records(path, tasks = None, errors = 'raise'):
+    subject = subject_of(path)
+    next_session = SessionCounter().next
+    layouts = {task: TextLayout(task) for task in resultswriter.SCHEMAS}
+
+    for number, line in enumerate(archive.iter_lines(path), 1):
+        parts = line.rstrip('\n').split('  ')
+        if len(parts) < 2:
+            continue # blank line
+
+        try:
+            task = parts[1]
+            layout = layouts[task]
+            count = len(parts) - 2
+            if count > layout.length or count < layout.fewest:
+                raise ValueError('{} fields for {}'.format(count, task))
+
+            # sessions are counted from every line, even the ones that are skipped
+            session = next_session(task, None if task == 'Session' else layout.total_trials(parts))
+            if tasks is not None and task not in tasks:
+                continue
+
+            yield layout.make(parts, subject, session, parse_stamp(parts[0]))
+
+        except (KeyError, ValueError, IndexError) as e:
+            if errors == 'raise':
+                raise ParseError('{} line {}: {}'.format(path, number, e))
+
+""" Function to read the records of a JSON lines results file one at a time
+    @param path of {ID}Data.jsonl
+    @param tasks optional collection of tasks to keep
+    @param errors 'raise' or 'skip'
+    @return generator of records """
+def read_json_records(path, tasks = None, errors = 'raise'):
+    subject = subject_of(path)
+    sessions = SessionCounter()
+
+    for number, line in enumerate(archive.iter_lines(path), 1):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+            task = record['task']
+            names = resultswriter.fields(task)
+            typed = [convert(name, record.get(name)) for name in names]
+            session = sessions.next(task, None if task == 'Session' else typed[0])
+
+            if tasks is not None and task not in tasks:
+                continue
+
+            if task == 'Session':
+                typed = typed[1:]
+            yield RECORD_TYPES[task](subject, session, parse_stamp(record['time']), task, *typed)
+
+        except (KeyError, ValueError, TypeError) as e:
+            if errors == 'raise':
+                raise ParseError('{} line {}: {}'.format(path, number, e))
+
+""" Function to put the records of one task into columns
+    @param records iterable of records of one task, like read_records(path, ['MTS'])
+    @return dictionary of columns by field name, numbers in array.array (NaN for None), text and times in lists """
+def to_columns(records):
+    columns = None
+    for record in records:
+        if columns is None:
+            names = record._fields
+            columns = {}
+            for name in names:
+                field_type = FIELD_TYPES.get(name)
+                if name == 'session':
+                    columns[name] = array.array('q')
+                elif field_type is int and not name.endswith('_ns'):
+                    columns[name] = array.array('q')
+                elif field_type is not None:
+                    # float, and nanosecond times that can be None, as float64 with NaN
+                    columns[name] = array.array('d')
+                else:
+                    columns[name] = []
+            appends = [columns[name].append for name in names]
+
+        for append, value in zip(appends, record):
+            append(float('nan') if value is None else value)
+
+    return columns if columns is not None else {}
+
+""" Function to put the records of one task into a numpy structured array, needs numpy
+    @param records iterable of records of one task
+    @return numpy structured array, times as datetime64[ms] """
+def to_structured(records):
+    # pip install numpy
+    import numpy
+
+    columns = to_columns(records)
+    if not columns:
+        return numpy.zeros(0)
+
+    dtype = []
+    for name, column in columns.items():
+        if isinstance(column, array.array):
+            dtype.append((name, 'i8' if column.typecode == 'q' else 'f8'))
+        elif name == 'time':
+            dtype.append((name, 'datetime64[ms]'))
+        else:
+            dtype.append((name, 'U{}'.format(max([len(str(value)) for value in column] + [1]))))
+
+    length = len(next(iter(columns.values())))
+    structured = numpy.empty(length, dtype = dtype)
+    for name, column in columns.items():
+        if isinstance(column, array.array):
+            structured[name] = numpy.frombuffer(column, dtype = structured.dtype[name])
+        else:
+            structured[name] = column
+    return structured
+
+""" Main function, prints the trials per task and session of results files """
+def main():
+    parser = argparse.ArgumentParser(description = 'Parse results files of the cognitive testing platform')
+    parser.add_argument('paths', nargs = '+', help = 'results/{ID}Data.txt or results/{ID}Data.jsonl files')
+    parser.add_argument('--skip-errors', action = 'store_true', help = 'leave out lines that cannot be parsed')
+    args = parser.parse_args()
+
+    for path in args.paths:
+        start = time.perf_counter()
+        counts = collections.Counter()
+        sessions = 0
+        for record in read_records(path, errors = 'skip' if args.skip_errors else 'raise'):
+            counts[record.task] += 1
+            sessions = record.session
+        print('{}  {} sessions  {} records  {:.2f}s'.format(path, sessions, sum(counts.values()), time.perf_counter() - start))
+        for task, count in sorted(counts.items()):
+            print('    {:8} {}'.format(task, count))
+
+""" this calls the 'main' function when this script is executed """
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+""" resultswriter.py
+        Writes the results of game.py on a background thread, so the game loop
+        only puts a record on a queue. Every record is written twice:
+            results/{ID}Data.txt   - the text line write_event() has always written
+            results/{ID}Data.jsonl - one JSON object per line with a fixed set of
+                                     fields for each task, listed in SCHEMAS
+
+        Records are written in batches. The files are flushed, and fsynced if
+        asked, once flush_records records are waiting or flush_ms milliseconds
+        have passed since the first of them was written, and when the writer
+        is closed. When the files are opened, a last line cut off by a crash or
+        power cut (no newline at the end) is removed.
+
+        The writer can also keep the subject's summary (summary.py) up to date,
+        it is saved every time the files are flushed, and add every batch of
+        records to the results database (store.py) in one transaction.
+"""
+
+import os, json, queue, threading, time, logging
+
+# messages about the results files, shown by the program running the session
+log = logging.getLogger('resultswriter')
+
+""" Class for an error of the writer thread, records can no longer be written """
+class WriterError(Exception):
+    pass
+
+# fields of every record of a task, in the order they are written in the text line
+SCHEMAS = {
+    'Session': ('subject', 'perf_counter_ns', 'time_ns'),
+    'Side': ('total_trials', 'trials', 'level', 'walls', 'latency'),
+    'Chase': ('total_trials', 'trials', 'circle_size', 'latency'),
+    'Pursuit': ('total_trials', 'trials', 'circle_size', 'latency'),
+    'MTS': ('total_trials', 'trials', 'percent', 'left', 'correct_side', 'right', 'latency', 'result'),
+    'DMTS': ('total_trials', 'trials', 'percent', 'left', 'correct_side', 'right', 'latency', 'result'),
+    'LS': ('total_trials', 'problem', 'trials', 'percent', 'left', 'correct_side', 'right', 'latency', 'result'),
+}
+
+# fields every trial of every task ends with
+#   first_move - seconds from the stimulus onset to the first joystick movement out of the deadzone, 0 if the stick
+#                was already out of it at the onset, None if it never moved during the trial
+#   onset_ns, response_ns, feedback_ns - session clock times of the stimulus onset, response and feedback
+TRIAL_FIELDS = ('first_move', 'onset_ns', 'response_ns', 'feedback_ns')
+
+# fields in seconds, written with 3 decimals in the text line
+SECONDS_FIELDS = ('latency', 'first_move')
+
+""" Function to get every field of a task's records
+    @param task name, a key of SCHEMAS
+    @return tuple of field names """
+def fields(task):
+    if task == 'Session':
+        return SCHEMAS[task]
+    return SCHEMAS[task] + TRIAL_FIELDS
+
+""" Function to format a record as the text line of the results file
+    @param stamp date and time text of the record
+    @param task name
+    @param values of the fields of the task, in order
+    @return text line with the newline """
+def text_line(stamp, task, values):
+    text = []
+    for name, value in zip(fields(task), values):
+        if value is None:
+            text.append('NA')
+        elif name in SECONDS_FIELDS:
+            text.append('{:.3f}'.format(value))
+        else:
+            text.append(str(value))
+    return stamp + '  ' + task + '  ' + '  '.join(text) + '\n'
+
+""" Function to format a record as a JSON line
+    @param stamp date and time text of the record
+    @param task name
+    @param values of the fields of the task, in order
+    @return JSON line with the newline """
+def json_line(stamp, task, values):
+    record = {'time': stamp, 'task': task}
+    record.update(zip(fields(task), values))
+    return json.dumps(record) + '\n'
+
+""" Function to remove a last line that was cut off before its newline was written
+    @param path of the file
+    @return number of bytes removed """
+def repair(path):
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, 'r+b') as results_file:
+        size = results_file.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        results_file.seek(size - 1)
+        if results_file.read(1) == b'\n':
+            return 0
+
+        # find the end of the last whole line, reading back in blocks
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            results_file.seek(start)
+            newline = results_file.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+
+        results_file.truncate(end)
+        return size - end
+
+""" Class for the results writer thread """
+class ResultsWriter(threading.Thread):
+    """ ResultsWriter Constructor, repairs and opens the results files and starts the thread
+        @param self
+        @param results_path directory of the results files
+        @param subject ID, the files are {subject}Data.txt and {subject}Data.jsonl
+        @param flush_records number of records to write before the files are flushed
+        @param flush_ms milliseconds a written record can wait before the files are flushed
+        @param fsync True to fsync the files every time they are flushed
+        @param summary optional summary.SubjectSummary of the subject to update with every record
+        @param store optional store.ResultsStore to add every record to, closed with the writer
+        @param archived bytes of the text results file already moved to its archive (archive.py), the summary covers them too """
+    def __init__(self, results_path, subject, flush_records = 10, flush_ms = 1000, fsync = True, summary = None, store = None, archived = 0):
+        threading.Thread.__init__(self, daemon = True)
+
+        self.flush_records = flush_records
+        self.flush_seconds = flush_ms / 1000
+        self.fsync = fsync
+
+        self.paths = [os.path.join(results_path, subject + 'Data.txt'), os.path.join(results_path, subject + 'Data.jsonl')]
+        for path in self.paths:
+            removed = repair(path)
+            if removed > 0:
+                log.warning('Removed %d bytes of a cut off last line from %s', removed, path)
+        self.files = [open(path, 'a') for path in self.paths]
+
+        # the summary has to cover the repaired results file before records are added to it
+        self.summary = summary
+        self.archived = archived
+        if summary is not None:
+            summary.sync()
+        self.store = store
+
+        self.records = queue.Queue() # (stamp, task, values) to write, None to stop
+        self.written = 0 # records written so far
+        self.error = None
+        self.start()
+
+    """ Function to queue a record, returns right away. Raises WriterError if the writer thread has stopped,
+            so the session stops instead of running trials that are never written
+        @param self
+        @param stamp date and time text of the record
+        @param task name, a key of SCHEMAS
+        @param values of the fields of the task, in order """
+    def write(self, stamp, task, values):
+        if self.error is not None or not self.is_alive():
+            raise WriterError('Results writer failed: {}'.format(self.error))
+        if len(values) != len(fields(task)):
+            raise ValueError('{} records have {} fields, got {}'.format(task, len(fields(task)), len(values)))
+        self.records.put((stamp, task, tuple(values)))
+
+    """ Function to write every queued record, flush and close the files, waits for the thread
+        @param self """
+    def close(self):
+        self.records.put(None)
+        if self.is_alive():
+            self.join()
+        if self.error is not None:
+            log.error('Results writer failed: %s', self.error)
+
+    """ Function to flush the files to disk
+        @param self """
+    def flush(self):
+        for results_file in self.files:
+            results_file.flush()
+            if self.fsync:
+                os.fsync(results_file.fileno())
+        if self.summary is not None:
+            self.summary.save(self.archived + os.fstat(self.files[0].fileno()).st_size, self.fsync)
+
+    """ Function run on the writer thread, writes the records in batches
+        @param self """
+    def run(self):
+        text_file, json_file = self.files
+        waiting = 0 # records written but not flushed
+        deadline = None # when the written records have to be flushed
+        try:
+            while True:
+                # wait for a record, or until the written records have to be flushed
+                try:
+                    if deadline is None:
+                        item = self.records.get()
+                    else:
+                        item = self.records.get(timeout = max(0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    item = False
+
+                # take every other record that is already queued into the batch
+                batch = []
+                while item:
+                    batch.append(item)
+                    try:
+                        item = self.records.get_nowait()
+                    except queue.Empty:
+                        item = False
+                stop = item is None
+
+                if batch:
+                    text_file.write(''.join(text_line(*record) for record in batch))
+                    json_file.write(''.join(json_line(*record) for record in batch))
+                    self.written += len(batch)
+                    if self.summary is not None:
+                        for record in batch:
+                            self.summary.add(*record)
+                    if self.store is not None:
+                        self.store.write(batch)
+                    if waiting == 0:
+                        deadline = time.perf_counter() + self.flush_seconds
+                    waiting += len(batch)
+
+                if waiting > 0 and (stop or waiting >= self.flush_records or time.perf_counter() >= deadline):
+                    self.flush()
+                    waiting = 0
+                    deadline = None
+
+                if stop:
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            for results_file in self.files:
+                results_file.close()
+            if self.store is not None:
+                self.store.close()
@@ -0,0 +1,59 @@
+""" scheduler.py
+        Keeps track of which phase a trial is in and when timed phases end, so
+        the game loop never has to sleep. The loop keeps handling events and
+        drawing frames while a phase is waiting for its deadline, and moves on
+        in the first frame after the deadline has passed.
+
+        Phases of a trial:
+            SETUP     - choosing and building the next trial
+            STIMULUS  - the trial has been built, waiting for its first frame to be shown
+            RESPONSE  - the response window is open
+            FEEDBACK  - reward sound and pellet after a correct response
+            ITI       - blank screen after an incorrect response or timeout
+            DELAY     - blank screen between the sample and the choices in DMTS
+"""
+
+import time
+
+SETUP = 'Setup'
+STIMULUS = 'Stimulus'
+RESPONSE = 'Response'
+FEEDBACK = 'Feedback'
+ITI = 'ITI'
+DELAY = 'Delay'
+
+# phases that only wait for their deadline, the task does not run during them
+WAITING_PHASES = (FEEDBACK, ITI, DELAY)
+
+""" Class for the phase state machine of the trials """
+class TrialScheduler:
+    """ TrialScheduler Constructor
+        @param self """
+    def __init__(self):
+        self.phase = SETUP
+        self.phase_start = time.perf_counter()
+        self.deadline = None # when the current phase ends, None if it ends on an event instead
+
+    """ Function to move to a new phase
+        @param self
+        @param phase to move to
+        @param duration in seconds the phase lasts, or None if it ends on an event """
+    def enter(self, phase, duration = None):
+        self.phase = phase
+        self.phase_start = time.perf_counter()
+        if duration is None:
+            self.deadline = None
+        else:
+            self.deadline = self.phase_start + duration
+
+    """ Function to check if the current phase is only waiting for its deadline
+        @param self
+        @return True during FEEDBACK, ITI and DELAY """
+    def waiting(self):
+        return self.phase in WAITING_PHASES
+
+    """ Function to check if the deadline of the current phase has passed
+        @param self
+        @return True if the phase has a deadline and it has passed """
+    def expired(self):
+        return self.deadline is not None and time.perf_counter() >= self.deadline
@@ -0,0 +1,70 @@
+""" sessionclock.py
+        One clock for a whole session of game.py. Times are integer
+        nanoseconds since the session started, from time.perf_counter_ns(),
+        which never jumps when NTP changes the wall clock. The wall clock is
+        read once when the session starts as its anchor, so any session time
+        can still be turned into a date and time for the results file.
+"""
+
+import time, datetime
+
+""" Function to turn nanoseconds into seconds
+    @param ns nanoseconds
+    @return seconds as a float """
+def to_seconds(ns):
+    return ns / 1e9
+
+""" Function to turn seconds into nanoseconds
+    @param seconds as a float
+    @return nanoseconds as an int """
+def to_ns(seconds):
+    return int(round(seconds * 1e9))
+
+""" Function to format a latency for the results file, to the millisecond
+    @param ns nanoseconds
+    @return text of the seconds with 3 decimals """
+def format_seconds(ns):
+    return '{:.3f}'.format(ns / 1e9)
+
+""" Class for the clock of a session """
+class SessionClock:
+    """ SessionClock Constructor, anchors the session to the wall clock
+        @param self """
+    def __init__(self):
+        # read the wall clock between two reads of the session clock, the anchor is the middle of them
+        before = time.perf_counter_ns()
+        self.wall_ns = time.time_ns()
+        after = time.perf_counter_ns()
+        self.anchor_ns = (before + after) // 2 # time.perf_counter_ns() at the start of the session
+        self.wall = datetime.datetime.fromtimestamp(self.wall_ns / 1e9) # local date and time at the start of the session
+
+    """ Function to get the current session time
+        @param self
+        @return nanoseconds since the session started """
+    def now(self):
+        return time.perf_counter_ns() - self.anchor_ns
+
+    """ Function to turn a time.perf_counter() value into session time
+        @param self
+        @param t time.perf_counter() in seconds, or None for now
+        @return nanoseconds since the session started """
+    def at(self, t = None):
+        if t is None:
+            return self.now()
+        return to_ns(t) - self.anchor_ns
+
+    """ Function to get the seconds passed since a session time
+        @param self
+        @param ns session time in nanoseconds
+        @return seconds as a float """
+    def elapsed(self, ns):
+        return (self.now() - ns) / 1e9
+
+    """ Function to get the wall clock date and time of a session time
+        @param self
+        @param ns session time in nanoseconds, or None for now
+        @return datetime """
+    def wall_time(self, ns = None):
+        if ns is None:
+            ns = self.now()
+        return self.wall + datetime.timedelta(microseconds = ns // 1000)
@@ -0,0 +1,112 @@
+""" sessionqueue.py
+        Reads a queue of sessions for 'python game.py --queue queue.txt', which
+        runs them one after another without restarting, keeping the devices,
+        display and stimuli loaded between animals. Every line of the queue
+        is an animal ID and the parameters file to run it with, separated by
+        spaces, lines starting with # are comments:
+            # subject  parameters file
+            A123  parameters.txt
+            B456  defaults.txt
+
+        Parameters files are found from the directory of the queue file. Every
+        parameters file is read and checked, and every subject looked up in the
+        animal IDs, before the first session starts, so a mistake is found
+        before an animal is waiting on it.
+
+        'python sessionqueue.py queue.txt' checks a queue and lists its sessions.
+"""
+
+import os, collections, argparse
+
+# parameters file reading and checking, main/parameters.py
+import parameters
+
+main_dir = os.path.split(os.path.abspath(__file__))[0] # current starting directory, should be main/
+
+""" Class for a queue file that cannot be run """
+class QueueError(ValueError):
+    pass
+
+# session in the queue
+#   subject         - animal ID
+#   parameters_file - path of its parameters file
+#   values          - dictionary of sections from parameters.validate()
+#   text            - text of the parameters file, kept with the session in the results database
+QueuedSession = collections.namedtuple('QueuedSession', 'subject parameters_file values text')
+
+""" Function to read the lines of a queue file
+    @param path of the queue file
+    @return list of (line number, subject, parameters file as written) """
+def read_lines(path):
+    entries = []
+    with open(path, 'r') as queue_file:
+        for number, line in enumerate(queue_file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(None, 1)
+            entries.append((number, parts[0], parts[1].strip() if len(parts) > 1 else None))
+    return entries
+
+""" Function to read and check a queue file
+    @param path of the queue file
+    @param ids list of the animal IDs the subjects have to be in, or None to allow any
+    @return list of QueuedSession, raises QueueError listing every problem """
+def load(path, ids = None):
+    if not os.path.exists(path):
+        raise QueueError('There must be a queue file named ' + path)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    loaded = {} # parameters file: (values, text), every file is only read once
+    sessions = []
+    errors = []
+
+    for number, subject, parameters_file in read_lines(path):
+        if parameters_file is None:
+            errors.append('line {}: "{}" has no parameters file'.format(number, subject))
+            continue
+        if ids is not None and subject not in ids:
+            errors.append('line {}: "{}" is not an animal ID'.format(number, subject))
+
+        parameters_path = os.path.join(directory, parameters_file)
+        if parameters_path not in loaded:
+            try:
+                values = parameters.load(parameters_path)
+                with open(parameters_path, 'r') as text_file:
+                    loaded[parameters_path] = (values, text_file.read())
+            except parameters.ParameterError as e:
+                loaded[parameters_path] = None
+                errors.append('line {}: {}'.format(number, e))
+        if loaded[parameters_path] is not None:
+            sessions.append(QueuedSession(subject, parameters_path, *loaded[parameters_path]))
+
+    if not sessions and not errors:
+        errors.append('no sessions in the queue')
+    if errors:
+        raise QueueError('{}:\n{}'.format(path, '\n'.join(errors)))
+    return sessions
+
+""" Main function, checks a queue file and lists its sessions """
+def main():
+    parser = argparse.ArgumentParser(description = 'Check a queue of sessions for game.py --queue')
+    parser.add_argument('path', help = 'queue file')
+    parser.add_argument('--ids', default = os.path.join(main_dir, 'AnimalIDs.txt'), help = 'animal IDs file the subjects have to be in, main/AnimalIDs.txt by default')
+    args = parser.parse_args()
+
+    ids = None
+    if os.path.exists(args.ids):
+        with open(args.ids, 'r') as ids_file:
+            ids = ids_file.read().splitlines()
+
+    try:
+        sessions = load(args.path, ids)
+    except QueueError as e:
+        print('Error: ' + str(e))
+        return
+
+    for number, session in enumerate(sessions, 1):
+        print('{:3}  {}  {}  {}'.format(number, session.subject, os.path.relpath(session.parameters_file), ', '.join(parameters.active_tasks(session.values))))
+
+""" this calls the 'main' function when this script is executed """
+if __name__ == '__main__':
+    main()
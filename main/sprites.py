@@ -0,0 +1,327 @@
+""" sprites.py
+        Sprites the tasks of game.py are drawn with: the Pointer that follows
+        the input device, the Target circle of Chase and Pursuit, and the
+        Stimuli images of MTS, DMTS and LS, with the choosing and building of
+        the stimuli of a trial that runs on the prefetch thread.
+"""
+
+import random, time, collections
+
+# pip install pygame --user
+import pygame
+
+# speed of the Pointer in pixels per second with the joystick all the way over (10 pixels a frame at 60 fps)
+POINTER_SPEED = 600
+
+# joystick axes closer to the center than this are taken as 0
+DEADZONE = 0.1
+
+RED = (255,0,0)
+GREEN = (0,255,0)
+BACKGROUND_COLOR = (250,250,250)
+
+""" Class for Stimuli inside of our pygame setup for MTS, DMTS, LS """
+class Stimuli(pygame.sprite.Sprite):
+    still = True # Stimuli never move, so the 'Dirty' render mode draws them once into its cached scene
+
+    """ Stimuli Constructor
+        @param self
+        @param stimuli_cache stimuli.StimuliCache of the display-ready stimuli images
+        @param stimuli filename to use for self.image
+        @param x position to place stimuli
+        @param y position to place stimuli """
+    def __init__(self, stimuli_cache, stimuli, x, y):
+        pygame.sprite.Sprite.__init__(self)  # call Sprite initializer
+        self.image = stimuli_cache.get(stimuli) # get display-ready stimuli image from the cache
+        self.rect = self.image.get_rect(center=(x,y)) # place Stimuli on passed in x,y
+
+""" Class for Target circle for Chase, Pursuit """
+class Target(pygame.sprite.Sprite):
+    """ Target Constructor
+        @param self
+        @param background from pygame
+        @param current_task that is running
+        @param diameter for the circle
+        @param input_device the Target moves with in Chase """
+    def __init__(self, background, current_task, diameter, input_device):
+        pygame.sprite.Sprite.__init__(self) #call Sprite initializer
+
+        self.input_device = input_device
+        self.diameter = int(diameter) # set desired diameter
+        self.current_task = current_task # set current_task
+        self.velX = random.choice((-5, 5)) # random X initial vel 5 left or 5 right
+        self.velY = random.choice((-5, 5)) # random Y initial vel 5 up or 5 down
+
+        # set Target object to a green circle of desired diameter with background color filled in
+        self.image = pygame.Surface([self.diameter,self.diameter])
+        self.image.fill((BACKGROUND_COLOR))
+        self.rect = pygame.draw.circle(self.image, GREEN, (int(self.diameter/2),int(self.diameter/2)), int(self.diameter/2), 2)
+
+        # set initial x and y to be randomly somewhere on the screen atleast diameter distance away from the edges
+        self.rect.x = random.randint(0, background.get_width() - self.diameter)
+        self.rect.y = random.randint(0, background.get_height() - self.diameter)
+
+    """ Function to change Target's color during Pursuit
+        @param self
+        @param color to set the circle to """
+    def change_color(self, color):
+        # save x, y coords
+        x = self.rect.x
+        y = self.rect.y
+
+        # redraw circle with same x, y and diameter but change color to passed in color
+        self.rect = pygame.draw.circle(self.image, color, (int(self.diameter/2),int(self.diameter/2)), int(self.diameter/2), 2)
+
+        # reassign x, y coords
+        self.rect.x = x
+        self.rect.y = y
+
+    """ Update function for Target movement
+        @param self
+        @param background from pygame """
+    def update(self, background):
+        joystick_moved = False
+
+        # if Chase task
+        if self.current_task == 'Chase':
+            # move based on the input device
+            # check if joystick has moved in x axis atleast 0.1
+            horiz_axis_pos = self.input_device.get_axis(0)
+            if abs(horiz_axis_pos) < 0.1:
+                horiz_axis_pos = 0
+
+            # check if joystick has move in y axis atleast 0.1
+            vert_axis_pos = self.input_device.get_axis(1)
+            if abs(vert_axis_pos) < 0.1:
+                vert_axis_pos = 0
+
+            # if joystick has moved atleast 0.1, 
+            if (horiz_axis_pos != 0 or vert_axis_pos != 0):
+                joystick_moved = True
+        
+        # if Pursuit task, or if in Chase task and joystick has moved
+        if (joystick_moved or self.current_task == 'Pursuit'):
+            # update x,y based on velocities
+            self.rect.x = self.rect.x + self.velX;
+            self.rect.y = self.rect.y + self.velY;
+
+        # if Target hits any screen border, reverse directions and 
+        # make sure it does not go through the border
+        if self.rect.x >= background.get_width() - (self.diameter + 1):
+            self.rect.x = background.get_width() - (self.diameter + 1)
+            self.velX *= -1
+        if self.rect.x < 0:
+            self.rect.x = 0
+            self.velX *= -1
+        if self.rect.y >= background.get_height() - (self.diameter + 1):
+            self.rect.y = background.get_height() - (self.diameter + 1)
+            self.velY *= -1
+        if self.rect.y < 0:
+            self.rect.y = 0
+            self.velY *= -1
+
+""" Class for Pointer that follows the input device """
+class Pointer(pygame.sprite.Sprite):
+    """ Pointer Constructor
+        @param self
+        @param diameter for the Pointer
+        @param input_device devices input device the Pointer follows """
+    def __init__(self, diameter, input_device):
+        pygame.sprite.Sprite.__init__(self) # call Sprite initializer
+
+        self.input_device = input_device
+        # make pygame object of a RED filled in circle of desired diameter
+        self.diameter = int(diameter) # set diameter of circle
+        self.image = pygame.Surface([self.diameter,self.diameter])
+        self.image.fill(BACKGROUND_COLOR)
+        self.rect = pygame.draw.circle(self.image, RED, (int(self.diameter/2),int(self.diameter/2)), int(self.diameter/2))
+
+        self.x = float(self.rect.x) # exact position, the rect is rounded to pixels
+        self.y = float(self.rect.y)
+        self.time = time.perf_counter() # time the position was last moved up to
+        self.axes = (0, 0) # axes of the input device after the deadzone, as of self.time
+        self.segments = [] # (start time, x, y, x velocity, y velocity, end time) of every straight move in the last update
+        self.start_trial()
+
+    """ Function to reset Pointer to desired location
+        @param self
+        @param x position
+        @param y position """
+    def reset(self, x, y):
+        self.rect.x = x
+        self.rect.y = y
+        self.x = float(x)
+        self.y = float(y)
+        self.time = time.perf_counter()
+        self.segments = []
+        self.start_trial()
+
+    """ Function to start timing the first movement of a trial
+        @param self
+        @param start time.perf_counter() to time from, or None for now """
+    def start_trial(self, start = None):
+        self.start_time = time.perf_counter() if start is None else start
+        self.first_move_time = None # time the joystick first moved past the deadzone in the trial
+
+        # a stick held over at the start, or the Pointer moving in the update of the frame that started
+        # the trial, is a movement at the start
+        if self.axes != (0, 0) or self.segments:
+            self.first_move_time = self.start_time
+
+    """ Function to get how long it took to start moving in the trial
+        @param self
+        @return seconds from the start of the trial to the first movement out of the deadzone, or None if it has not moved """
+    def first_move_latency(self):
+        if self.first_move_time is None:
+            return None
+        return self.first_move_time - self.start_time
+
+    """ Function to move the Pointer at the current axes up to a time, stopping at the screen borders
+        @param self
+        @param t time.perf_counter() to move up to
+        @param background from pygame """
+    def move_to(self, t, background):
+        max_x = background.get_width() - (self.diameter+1)
+        max_y = background.get_height() - (self.diameter+1)
+
+        while t > self.time:
+            # move x,y according to the joystick axes, unless already against the screen border in that direction
+            vx = self.axes[0] * POINTER_SPEED
+            vy = self.axes[1] * POINTER_SPEED
+            if (vx > 0 and self.x >= max_x) or (vx < 0 and self.x <= 0):
+                vx = 0
+            if (vy > 0 and self.y >= max_y) or (vy < 0 and self.y <= 0):
+                vy = 0
+            if vx == 0 and vy == 0:
+                self.time = t
+                return
+
+            # if Pointer reaches a screen border, stop the move there so it doesnt go past it
+            border_x = max_x if vx > 0 else 0
+            border_y = max_y if vy > 0 else 0
+            # an axis that is not moving never reaches its border
+            hit_x = self.time + (border_x - self.x) / vx if vx != 0 else float('inf')
+            hit_y = self.time + (border_y - self.y) / vy if vy != 0 else float('inf')
+            end = min(t, hit_x, hit_y)
+
+            self.segments.append((self.time, self.x, self.y, vx, vy, end))
+            self.x = border_x if hit_x <= end else self.x + vx * (end - self.time)
+            self.y = border_y if hit_y <= end else self.y + vy * (end - self.time)
+            self.time = end
+
+    """ Function to set the axes from an input sample
+        @param self
+        @param horiz_axis_pos, vert_axis_pos of the input device """
+    def set_axes(self, horiz_axis_pos, vert_axis_pos):
+        # if joystick has not moved atleast 0.1, set movement to 0
+        if abs(horiz_axis_pos) < DEADZONE:
+            horiz_axis_pos = 0
+        if abs(vert_axis_pos) < DEADZONE:
+            vert_axis_pos = 0
+        self.axes = (horiz_axis_pos, vert_axis_pos)
+
+    """ Function to drop the input since the last update without moving, for the frames of feedback,
+            inter-trial intervals and delays the Pointer is not shown in. Only where the stick is now is kept,
+            so the Pointer does not make up for the whole wait in its next update
+        @param self """
+    def skip_input(self):
+        for t, horiz_axis_pos, vert_axis_pos in self.input_device.read():
+            self.set_axes(horiz_axis_pos, vert_axis_pos)
+        self.time = time.perf_counter()
+        self.segments = []
+
+    """ Function to update the Pointer on screen, moves it through every input sample since the last update
+        @param self
+        @param background from pygame """
+    def update(self, background):
+        self.segments = []
+
+        for t, horiz_axis_pos, vert_axis_pos in self.input_device.read():
+            # move at the old axes up to the time of the sample
+            self.move_to(t, background)
+            self.set_axes(horiz_axis_pos, vert_axis_pos)
+
+            if self.first_move_time is None and self.axes != (0, 0):
+                self.first_move_time = max(t, self.start_time)
+
+        self.move_to(time.perf_counter(), background)
+        self.rect.x = round(self.x)
+        self.rect.y = round(self.y)
+
+    """ Function to find when the Pointer got into a rect during the last update, between frames
+        @param self
+        @param rect to check
+        @param inside True for when the Pointer was first inside rect, False for when it first touched it
+        @return time.perf_counter() it got there, or None if it did not get there during the last update """
+    def entry_time(self, rect, inside = True):
+        # range of x, y the Pointer's top left corner has to be in
+        if inside:
+            x_range = (rect.left, rect.right - self.rect.width)
+            y_range = (rect.top, rect.bottom - self.rect.height)
+        else:
+            x_range = (rect.left - self.rect.width, rect.right)
+            y_range = (rect.top - self.rect.height, rect.bottom)
+
+        for start, x, y, vx, vy, end in self.segments:
+            # times during the move that x and y are in their range
+            lo, hi = start, end
+            for pos, v, (low, high) in ((x, vx, x_range), (y, vy, y_range)):
+                if v == 0:
+                    if pos < low or pos > high:
+                        lo, hi = end, start
+                else:
+                    t1 = start + (low - pos) / v
+                    t2 = start + (high - pos) / v
+                    lo = max(lo, min(t1, t2))
+                    hi = min(hi, max(t1, t2))
+            if lo <= hi:
+                return lo
+
+        return None
+
+# stimuli chosen and built for one MTS, DMTS or LS trial
+# stimuli_bottom is None for LS, which has no sample stimuli on the bottom
+StimuliTrial = collections.namedtuple('StimuliTrial', ['correct_stimuli', 'wrong_stimuli', 'stimuli_correct_str', 'left_stimuli', 'right_stimuli', 'stimuli_correct', 'stimuli_wrong', 'stimuli_bottom'])
+
+""" Function to choose the stimuli for a MTS, DMTS or LS trial and build their sprites,
+        this is run on the prefetch thread during the inter-trial interval before the trial
+    @param current_task MTS, DMTS or LS
+    @param stimuli_catalogue to draw the stimuli from
+    @param stimuli_cache stimuli.StimuliCache to take the images from
+    @param background from pygame
+    @param rng random.Random to draw with, its own so the draws do not depend on when the thread runs
+    @param correct_stimuli to keep for the trial (same LS problem), or None to draw a new one
+    @return StimuliTrial """
+def prepare_stimuli_trial(current_task, stimuli_catalogue, stimuli_cache, background, rng, correct_stimuli=None):
+    # randomly select two different stimuli from the catalogue of main/data/stimuli/
+    if correct_stimuli is None:
+        correct_stimuli, wrong_stimuli = stimuli_catalogue.sample_pair(rng)
+    else:
+        wrong_stimuli = stimuli_catalogue.choice_other(correct_stimuli, rng)
+
+    # randomly decide whether the correct will be on the left or right
+    correct_position = rng.choice([0.15, 0.85])
+
+    # assign stimuli_correct_str for logging
+    if correct_position == 0.15:
+        stimuli_correct_str = 'Left'
+        left_stimuli = correct_stimuli
+        right_stimuli = wrong_stimuli
+    else:
+        stimuli_correct_str = 'Right'
+        right_stimuli = correct_stimuli
+        left_stimuli = wrong_stimuli
+
+    # LS shows the two choices in the middle of the screen, MTS and DMTS show them on top with the sample on the bottom
+    if current_task == 'LS':
+        choice_y = background.get_height()/2
+        stimuli_bottom = None
+    else:
+        choice_y = background.get_height()/4
+        stimuli_bottom = Stimuli(stimuli_cache, correct_stimuli, background.get_width()/2, background.get_height()*.8)
+
+    # construct Stimuli objects for pygame
+    stimuli_correct = Stimuli(stimuli_cache, correct_stimuli, background.get_width() * correct_position, choice_y)
+    stimuli_wrong = Stimuli(stimuli_cache, wrong_stimuli, background.get_width() * (1 - correct_position), choice_y)
+
+    return StimuliTrial(correct_stimuli, wrong_stimuli, stimuli_correct_str, left_stimuli, right_stimuli, stimuli_correct, stimuli_wrong, stimuli_bottom)
@@ -0,0 +1,80 @@
+""" startup.py
+        Times the startup of game.py, from its imports to the first frame a
+        session is ready to run, for 'python game.py --profile-startup'. Every
+        step is a phase with the thread it ran on, so the steps done in the
+        background while the subject selection menu is open (the assets and
+        the reward motor) show next to the ones the menu has to wait for.
+
+        The report lists every phase in the order it started:
+            phase               start ms   time ms   thread
+        then the time to ready, and the same without the time spent waiting
+        on the user, to pick a subject in the menu or to start a queued session.
+"""
+
+import time, threading, contextlib
+
+# phases waiting on the user, left out of the time to ready without them
+PICKER_PHASE = 'subject selection menu'
+OPERATOR_PHASE = 'waiting for operator'
+USER_PHASES = (PICKER_PHASE, OPERATOR_PHASE)
+
+""" Class for the startup phases of game.py """
+class StartupProfile:
+    """ StartupProfile Constructor
+        @param self
+        @param start time.perf_counter() the startup started at, before the imports """
+    def __init__(self, start):
+        self.start = start
+        self.phases = [] # (name, start, end, thread name) of every phase, in the order they ended
+        self.lock = threading.Lock() # phases are added from the background threads too
+        self.ready_time = None # time.perf_counter() the first session was ready to run
+
+    """ Function to add a phase that has already been timed
+        @param self
+        @param name of the phase
+        @param start time.perf_counter() it started
+        @param end time.perf_counter() it ended
+        @param thread name of the thread it ran on, the current one by default """
+    def add(self, name, start, end, thread = None):
+        with self.lock:
+            self.phases.append((name, start, end, thread or threading.current_thread().name))
+
+    """ Function to time a phase, used as 'with profile.phase(name):'
+        @param self
+        @param name of the phase """
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    """ Function to mark the first session ready to run, only the first call counts
+        @param self
+        @return True if it was the first call """
+    def ready(self):
+        if self.ready_time is not None:
+            return False
+        self.ready_time = time.perf_counter()
+        return True
+
+    """ Function to make the text of the report
+        @param self
+        @return text """
+    def report(self):
+        end = self.ready_time if self.ready_time is not None else time.perf_counter()
+        lines = ['{:<26}{:>10}{:>10}   {}'.format('phase', 'start ms', 'time ms', 'thread')]
+        with self.lock:
+            phases = sorted(self.phases, key = lambda phase: phase[1])
+        waiting = 0
+        for name, start, phase_end, thread in phases:
+            lines.append('{:<26}{:>10.1f}{:>10.1f}   {}'.format(name, (start - self.start) * 1000, (phase_end - start) * 1000, thread))
+            if name in USER_PHASES:
+                waiting += phase_end - start
+
+        total = end - self.start
+        lines.append('ready to run in {:.1f}ms'.format(total * 1000))
+        if waiting:
+            lines.append('ready to run in {:.1f}ms without the {:.1f}ms waiting on the user'.format((total - waiting) * 1000, waiting * 1000))
+        return '\n'.join(lines)
@@ -0,0 +1,527 @@
+""" stimuli.py
+        Keeps the stimuli images used by MTS, DMTS and LS ready for display so
+        that setting up a trial only needs a dictionary lookup. The catalogue
+        lists the loadable images in the stimuli directory once, and the cache
+        holds the images scaled to fit their box and converted to the display
+        format, dropping the least recently used ones past a memory budget.
+
+        The stimuli pack is a single file holding every image already scaled and
+        in the display pixel format, so loading an image is a copy out of a
+        memory-mapped file instead of decoding a png. Running this file builds
+        the pack and compares startup times:
+
+            python stimuli.py --build
+            python stimuli.py --compare
+"""
+
+import os, collections, hashlib, random, struct, mmap, time, argparse, threading
+
+# pip install pygame --user
+import pygame
+
+# box that stimuli images are scaled down to fit in (650 width x 300 height)
+STIMULI_BOX = (650, 300)
+
+# information kept about every image in the catalogue
+# format is PNG, JPEG, GIF or BMP, hash is the sha1 hex digest of the file contents
+StimuliInfo = collections.namedtuple('StimuliInfo', ['filename', 'width', 'height', 'format', 'hash', 'nbytes', 'mtime'])
+
+""" Function to read the format and size of an image from the start of its file
+        without decoding it
+    @param header first bytes of the image file (atleast 32)
+    @param image_file open binary file, only used to search for the JPEG size
+    @return (format, width, height), or None if it is not an image pygame can load """
+def read_image_header(header, image_file):
+    # PNG, size is in the IHDR chunk right after the signature
+    if header[:8] == b'\x89PNG\r\n\x1a\n':
+        width, height = struct.unpack('>II', header[16:24])
+        return ('PNG', width, height)
+
+    # GIF, size is in the logical screen descriptor
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        width, height = struct.unpack('<HH', header[6:10])
+        return ('GIF', width, height)
+
+    # BMP, size is in the info header, height is negative for top-down images
+    if header[:2] == b'BM':
+        width, height = struct.unpack('<ii', header[18:26])
+        return ('BMP', width, abs(height))
+
+    # JPEG, size is in the first start of frame segment
+    if header[:2] == b'\xff\xd8':
+        image_file.seek(2)
+        while True:
+            marker = image_file.read(4)
+            if len(marker) < 4 or marker[0] != 0xff:
+                return None
+            length = struct.unpack('>H', marker[2:4])[0]
+            # start of frame markers, excluding DHT (c4), JPG (c8) and DAC (cc)
+            if marker[1] in (0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf):
+                height, width = struct.unpack('>HH', image_file.read(5)[1:5])
+                return ('JPEG', width, height)
+            image_file.seek(length - 2, 1)
+
+    # anything else (WMF, text files, ...) is not a stimuli
+    return None
+
+""" Function to get the sha1 hex digest of a file's contents
+    @param path of the file
+    @return hex digest string """
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as hashed_file:
+        for block in iter(lambda: hashed_file.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+""" Function to get the scale that makes an image fit inside of a box
+    @param width of the image
+    @param height of the image
+    @param box (width, height) the image has to fit in
+    @return scale to use, 1.0 if the image already fits """
+def fit_scale(width, height, box):
+    scale = 1.0
+
+    # shrink by 0.9 steps like the images have always been scaled, but only
+    # work out the final scale here so the image is resampled a single time
+    while (width * scale > box[0] or height * scale > box[1]):
+        scale *= 0.9
+
+    return scale
+
+""" Function to scale a pygame image so that it fits inside of a box
+    @param image pygame surface to scale
+    @param box (width, height) the image has to fit in
+    @return scaled pygame surface, keeps the width x height ratio """
+def fit_to_box(image, box):
+    scale = fit_scale(image.get_width(), image.get_height(), box)
+
+    # image already fits, nothing to do
+    if scale == 1.0:
+        return image
+
+    return pygame.transform.rotozoom(image, 0, scale)
+
+""" Function to get the number of bytes a pygame surface takes up
+    @param surface pygame surface
+    @return size of the pixel data in bytes """
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+""" Class for the catalogue of loadable stimuli images in a directory.
+        The directory is only read when the catalogue is built or refreshed,
+        drawing stimuli for a trial is done from the list in memory. """
+class StimuliCatalogue:
+    """ StimuliCatalogue Constructor
+        @param self
+        @param directory with the stimuli images """
+    def __init__(self, directory):
+        self.directory = directory
+        self.filenames = [] # list of image filenames to draw from
+        self.positions = {} # position of every filename in self.filenames
+        self.info = {} # StimuliInfo of every image by filename
+        self.refresh()
+
+    """ Function to reread the stimuli directory, only files that are new or have
+            changed size or modified time are opened again
+        @param self
+        @return True if the set of images changed """
+    def refresh(self):
+        info = {}
+
+        for filename in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, filename)
+            if not os.path.isfile(path):
+                continue
+
+            stat = os.stat(path)
+
+            # keep what we already know about unchanged files
+            old = self.info.get(filename)
+            if old is not None and old.nbytes == stat.st_size and old.mtime == stat.st_mtime:
+                info[filename] = old
+                continue
+
+            # only keep files that are images pygame can load
+            with open(path, 'rb') as image_file:
+                header = read_image_header(image_file.read(32), image_file)
+            if header is None:
+                continue
+
+            info[filename] = StimuliInfo(filename, header[1], header[2], header[0], file_hash(path), stat.st_size, stat.st_mtime)
+
+        changed = (info != self.info)
+        self.info = info
+        self.filenames = list(info)
+        self.positions = {filename: i for i, filename in enumerate(self.filenames)}
+
+        return changed
+
+    """ Function to get the number of stimuli images
+        @param self
+        @return number of images """
+    def __len__(self):
+        return len(self.filenames)
+
+    """ Function to check if a filename is in the catalogue
+        @param self
+        @param filename of the image
+        @return True if it is a stimuli image """
+    def __contains__(self, filename):
+        return filename in self.info
+
+    """ Function to draw a random stimuli
+        @param self
+        @param rng random.Random to draw with, the random module by default
+        @return filename of the stimuli """
+    def choice(self, rng = random):
+        return self.filenames[rng.randrange(len(self.filenames))]
+
+    """ Function to draw a random stimuli that is different from the one passed in
+        @param self
+        @param filename of the stimuli to not draw
+        @param rng random.Random to draw with, the random module by default
+        @return filename of the other stimuli """
+    def choice_other(self, filename, rng = random):
+        # draw from every position except the excluded one, so there is never a retry
+        other = rng.randrange(len(self.filenames) - 1)
+        if other >= self.positions[filename]:
+            other += 1
+        return self.filenames[other]
+
+    """ Function to draw two different random stimuli
+        @param self
+        @param rng random.Random to draw with, the random module by default
+        @return (first, second) filenames of the stimuli """
+    def sample_pair(self, rng = random):
+        # draw without replacement, the second draw skips over the first
+        first = rng.randrange(len(self.filenames))
+        second = rng.randrange(len(self.filenames) - 1)
+        if second >= first:
+            second += 1
+        return self.filenames[first], self.filenames[second]
+
+""" Class for a cache of display-ready stimuli surfaces, keyed by filename and box """
+class StimuliCache:
+    """ StimuliCache Constructor
+        @param self
+        @param loader function(filename, box) returning a display-ready pygame surface
+        @param budget maximum number of bytes of surfaces to keep """
+    def __init__(self, loader, budget):
+        self.loader = loader
+        self.budget = budget
+        self.size = 0 # bytes of surfaces currently kept
+        self.surfaces = collections.OrderedDict() # least recently used first
+        self.lock = threading.RLock() # the next trial can be prepared on another thread
+
+        # counters to see how well the cache is doing
+        self.hits = 0
+        self.misses = 0
+
+    """ Function to get the display-ready surface of a stimuli, loading it on a miss
+        @param self
+        @param filename of the stimuli image
+        @param box (width, height) the image has to fit in
+        @return pygame surface """
+    def get(self, filename, box = STIMULI_BOX):
+        key = (filename, tuple(box))
+
+        with self.lock:
+            surface = self.surfaces.get(key)
+            if surface is not None:
+                # mark as most recently used
+                self.surfaces.move_to_end(key)
+                self.hits += 1
+                return surface
+
+            # not cached yet, load it and keep it for the next trial
+            self.misses += 1
+            surface = self.loader(filename, box)
+            self.put(filename, box, surface)
+
+        return surface
+
+    """ Function to add a display-ready surface to the cache
+        @param self
+        @param filename of the stimuli image
+        @param box (width, height) the image was fit in
+        @param surface pygame surface to keep """
+    def put(self, filename, box, surface):
+        key = (filename, tuple(box))
+        nbytes = surface_bytes(surface)
+
+        # never keep a surface that could not fit in the budget by itself
+        if nbytes > self.budget:
+            return
+
+        with self.lock:
+            # replace an old surface for this key
+            if key in self.surfaces:
+                self.size -= surface_bytes(self.surfaces.pop(key))
+
+            self.surfaces[key] = surface
+            self.size += nbytes
+
+            # drop least recently used surfaces until we are back in budget
+            while self.size > self.budget:
+                old_key, old_surface = self.surfaces.popitem(last = False)
+                self.size -= surface_bytes(old_surface)
+
+    """ Function to check if a stimuli is already cached
+        @param self
+        @param filename of the stimuli image
+        @param box (width, height) the image was fit in
+        @return True if cached """
+    def contains(self, filename, box = STIMULI_BOX):
+        return (filename, tuple(box)) in self.surfaces
+
+    """ Function to remove every surface from the cache
+        @param self """
+    def clear(self):
+        with self.lock:
+            self.surfaces.clear()
+            self.size = 0
+
+
+# stimuli pack file format, all numbers little endian
+# header: magic, version, number of images, box width, box height, bits per pixel, R G B A masks
+# index entry: name length, name (utf-8), sha1 of the source image, width, height, pitch, data offset
+# pixel data for every image follows the index, each starting on a 16 byte boundary
+PACK_MAGIC = b'CTPSTIM1'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<8sIIHHI4I')
+PACK_NAME_LENGTH = struct.Struct('<H')
+PACK_ENTRY = struct.Struct('<20sHHIQ')
+
+# information about an image in the stimuli pack
+PackEntry = collections.namedtuple('PackEntry', ['hash', 'width', 'height', 'pitch', 'offset'])
+
+""" Class for a stimuli pack file that has been memory-mapped """
+class StimuliPack:
+    """ StimuliPack Constructor, maps the pack file and reads its index
+        @param self
+        @param path of the pack file """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self.file.close()
+            raise
+
+        try:
+            self.read_index()
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+    """ Function to read the header and the index of every image, a truncated
+            pack raises struct.error or ValueError
+        @param self """
+    def read_index(self):
+        magic, version, count, box_width, box_height, bitsize, r, g, b, a = PACK_HEADER.unpack_from(self.map, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(self.path + ' is not a stimuli pack')
+
+        self.box = (box_width, box_height)
+        self.bitsize = bitsize
+        self.masks = (r, g, b, a)
+
+        # read the index of every image
+        self.entries = {}
+        position = PACK_HEADER.size
+        for i in range(count):
+            name_length = PACK_NAME_LENGTH.unpack_from(self.map, position)[0]
+            position += PACK_NAME_LENGTH.size
+            name = self.map[position:position + name_length].decode('utf-8')
+            position += name_length
+            entry = PackEntry(*PACK_ENTRY.unpack_from(self.map, position))
+            position += PACK_ENTRY.size
+
+            # the pixels of every image have to be in the file as well
+            if entry.offset + entry.pitch * entry.height > len(self.map):
+                raise ValueError(self.path + ' is truncated')
+            self.entries[name] = entry
+
+    """ Function to check if the pack was built from the images of a catalogue,
+            for a box and a display format
+        @param self
+        @param catalogue StimuliCatalogue of the source images
+        @param box (width, height) images should be fit in
+        @param display pygame display surface
+        @return True if the pack can be used as it is """
+    def is_current(self, catalogue, box, display):
+        if self.bitsize != display.get_bitsize() or self.masks != display.get_masks():
+            return False
+
+        return self.matches(catalogue, box)
+
+    """ Function to check if the pack was built from the images of a catalogue
+            for a box, without needing the display to be setup
+        @param self
+        @param catalogue StimuliCatalogue of the source images
+        @param box (width, height) images should be fit in
+        @return True if the pack has the same images """
+    def matches(self, catalogue, box):
+        if self.box != tuple(box):
+            return False
+
+        # every source image needs to be in the pack with the same contents
+        if len(self.entries) != len(catalogue):
+            return False
+        for filename, info in catalogue.info.items():
+            entry = self.entries.get(filename)
+            if entry is None or entry.hash != bytes.fromhex(info.hash):
+                return False
+
+        return True
+
+    """ Function to check if an image is in the pack
+        @param self
+        @param filename of the image
+        @return True if the pack has the image """
+    def __contains__(self, filename):
+        return filename in self.entries
+
+    """ Function to make a display-ready pygame surface from the pixels in the pack
+        @param self
+        @param filename of the image
+        @param display pygame display surface the pack was built for
+        @return pygame surface """
+    def surface(self, filename, display):
+        entry = self.entries[filename]
+        image = pygame.Surface((entry.width, entry.height), 0, display)
+
+        # pixels are already scaled and in the display format, so this is just a copy
+        size = entry.pitch * entry.height
+        if image.get_pitch() == entry.pitch:
+            image.get_buffer().write(self.map[entry.offset:entry.offset + size], 0)
+        else:
+            # surface rows are padded differently, copy the rows one at a time
+            for row in range(entry.height):
+                start = entry.offset + row * entry.pitch
+                image.get_buffer().write(self.map[start:start + entry.width * display.get_bytesize()], row * image.get_pitch())
+
+        return image
+
+    """ Function to unmap and close the pack file
+        @param self """
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+""" Function to build a stimuli pack from every image in a catalogue
+    @param path of the pack file to write
+    @param catalogue StimuliCatalogue of the source images
+    @param box (width, height) to fit the images in
+    @param display pygame display surface, images are stored in its pixel format
+    @param images optional dictionary of images already decoded and scaled by filename """
+def build_pack(path, catalogue, box, display, images = None):
+    entries = []
+    pixels = []
+
+    # decode, scale and convert every image the same way as loading it from the png
+    for filename in catalogue.filenames:
+        if images is not None and filename in images:
+            image = images[filename].convert(display)
+        else:
+            image = pygame.image.load(os.path.join(catalogue.directory, filename))
+            image = fit_to_box(image, box).convert(display)
+        pixels.append(image.get_buffer().raw)
+        entries.append((filename.encode('utf-8'), bytes.fromhex(catalogue.info[filename].hash), image.get_width(), image.get_height(), image.get_pitch()))
+
+    # work out where the pixels start, after the header and index, on a 16 byte boundary
+    offset = PACK_HEADER.size + sum(PACK_NAME_LENGTH.size + len(entry[0]) + PACK_ENTRY.size for entry in entries)
+    offsets = []
+    for data in pixels:
+        offset = (offset + 15) & ~15
+        offsets.append(offset)
+        offset += len(data)
+
+    # write to a temporary file first so a half written pack is never used
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as pack_file:
+        pack_file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries), box[0], box[1], display.get_bitsize(), *display.get_masks()))
+        for entry, data_offset in zip(entries, offsets):
+            pack_file.write(PACK_NAME_LENGTH.pack(len(entry[0])) + entry[0])
+            pack_file.write(PACK_ENTRY.pack(entry[1], entry[2], entry[3], entry[4], data_offset))
+        for data, data_offset in zip(pixels, offsets):
+            pack_file.write(bytes(data_offset - pack_file.tell()))
+            pack_file.write(data)
+
+    os.replace(temp_path, path)
+
+""" Function to open the stimuli pack, rebuilding it first if it is missing or
+        any of the source images have changed
+    @param path of the pack file
+    @param catalogue StimuliCatalogue of the source images
+    @param box (width, height) to fit the images in
+    @param display pygame display surface
+    @param images optional dictionary of images already decoded and scaled by filename
+    @return opened StimuliPack """
+def load_pack(path, catalogue, box, display, images = None):
+    if os.path.exists(path):
+        try:
+            pack = StimuliPack(path)
+        except (ValueError, struct.error, OSError):
+            pack = None
+
+        if pack is not None:
+            if pack.is_current(catalogue, box, display):
+                return pack
+            pack.close()
+
+    build_pack(path, catalogue, box, display, images)
+    return StimuliPack(path)
+
+""" Function to build the stimuli pack, or time loading every stimuli from the
+        png files against loading them from the pack, run as 'python stimuli.py' """
+def main():
+    main_dir = os.path.split(os.path.abspath(__file__))[0]
+
+    parser = argparse.ArgumentParser(description = 'Build the stimuli pack and compare startup times')
+    parser.add_argument('--build', action = 'store_true', help = 'rebuild the stimuli pack')
+    parser.add_argument('--compare', action = 'store_true', help = 'time loading every stimuli from png files and from the pack')
+    parser.add_argument('--stimuli', default = os.path.join(main_dir, 'data', 'stimuli'), help = 'stimuli directory')
+    parser.add_argument('--pack', default = os.path.join(main_dir, 'data', 'stimuli.pack'), help = 'stimuli pack file')
+    args = parser.parse_args()
+
+    # the pack is in the display format, so a display is needed
+    pygame.display.init()
+    display = pygame.display.set_mode((1, 1))
+
+    start = time.perf_counter()
+    catalogue = StimuliCatalogue(args.stimuli)
+    print('catalogue: {} images in {:.3f}s'.format(len(catalogue), time.perf_counter() - start))
+
+    if args.build:
+        start = time.perf_counter()
+        build_pack(args.pack, catalogue, STIMULI_BOX, display)
+        print('build: {} in {:.3f}s'.format(args.pack, time.perf_counter() - start))
+
+    if args.compare:
+        # load every stimuli by decoding and scaling its png
+        start = time.perf_counter()
+        for filename in catalogue.filenames:
+            image = pygame.image.load(os.path.join(catalogue.directory, filename))
+            image = fit_to_box(image, STIMULI_BOX).convert(display)
+            image.set_colorkey(image.get_at((0,0)), pygame.RLEACCEL)
+        png_time = time.perf_counter() - start
+        print('png:  {:.3f}s'.format(png_time))
+
+        # load every stimuli from the pack, including checking it is up to date
+        start = time.perf_counter()
+        pack = load_pack(args.pack, catalogue, STIMULI_BOX, display)
+        for filename in catalogue.filenames:
+            image = pack.surface(filename, display)
+            image.set_colorkey(image.get_at((0,0)), pygame.RLEACCEL)
+        pack_time = time.perf_counter() - start
+        pack.close()
+        print('pack: {:.3f}s ({:.1f}x faster)'.format(pack_time, png_time / pack_time))
+
+    pygame.quit()
+
+# this calls the 'main' function when this script is executed
+if __name__ == '__main__':
+    main()
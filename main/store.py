@@ -0,0 +1,289 @@
+""" store.py
+        Optional SQLite database of the results, results/Results.sqlite, that
+        can be queried by subject, task, date and stimulus instead of going
+        through the results files. game.py writes to it when run with --store,
+        from the results writer thread, one transaction per batch of records.
+
+        Tables:
+            sessions - subject, start and end times, the 'Session' line clocks,
+                       the text of the parameters file the session ran with,
+                       and where it came from ('game.py' or the imported file)
+            trials   - one row per trial, the fields of every task from SCHEMAS
+                       in resultswriter.py (left and right are left_stimulus and
+                       right_stimulus), and the DMTS delay in seconds when the
+                       parameters of the session are known, results files do
+                       not have them so imported sessions have a NULL delay
+                       unless their parameters file is given with --parameters
+
+        Times are text 'YYYY-MM-DD HH:MM:SS.mmm' so they sort and compare as dates.
+
+        'python store.py import results/*Data.txt' adds results files from
+        before the database, sessions already in it are skipped.
+        'python store.py import --parameters parameters.txt results/A123Data.txt'
+        keeps the parameters file with the imported sessions and takes their DMTS
+        delay from it.
+        'python store.py query --subject ID --task DMTS --start 2026-03-01 --end 2026-04-01 --min-delay 5'
+        prints trials.
+"""
+
+import os, sqlite3, argparse, time
+
+# fields of every task, main/resultswriter.py
+import resultswriter
+
+# results file parser, main/results.py
+import results
+
+# parameters file reading, main/parameters.py, named so it is not mixed up with the parameters text of a session
+import parameters as parameter_files
+
+main_dir = os.path.split(os.path.abspath(__file__))[0] # current starting directory, should be main/
+
+# database file in the results directory
+STORE_FILE = 'Results.sqlite'
+
+# column of every trial field that is not named like the field
+COLUMN_NAMES = {'left': 'left_stimulus', 'right': 'right_stimulus'}
+
+# trial columns after session_id, subject, time and task, in order
+TRIAL_COLUMNS = ('total_trials', 'trials', 'problem', 'level', 'walls', 'circle_size', 'percent', 'left_stimulus', 'correct_side',
+                 'right_stimulus', 'latency', 'result', 'delay', 'first_move', 'onset_ns', 'response_ns', 'feedback_ns')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    subject TEXT NOT NULL,
+    started TEXT NOT NULL,
+    ended TEXT,
+    perf_counter_ns INTEGER,
+    time_ns INTEGER,
+    parameters TEXT,
+    source TEXT,
+    UNIQUE (subject, started)
+);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started);
+
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    subject TEXT NOT NULL,
+    time TEXT NOT NULL,
+    task TEXT NOT NULL,
+    total_trials INTEGER,
+    trials INTEGER,
+    problem INTEGER,
+    level INTEGER,
+    walls TEXT,
+    circle_size TEXT,
+    percent REAL,
+    left_stimulus TEXT,
+    correct_side TEXT,
+    right_stimulus TEXT,
+    latency REAL,
+    result TEXT,
+    delay REAL,
+    first_move REAL,
+    onset_ns INTEGER,
+    response_ns INTEGER,
+    feedback_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS trials_subject_task_time ON trials (subject, task, time);
+CREATE INDEX IF NOT EXISTS trials_task_time ON trials (task, time);
+CREATE INDEX IF NOT EXISTS trials_time ON trials (time);
+CREATE INDEX IF NOT EXISTS trials_session ON trials (session_id);
+'''
+
+INSERT_TRIAL = 'INSERT INTO trials (session_id, subject, time, task, {}) VALUES ({})'.format(', '.join(TRIAL_COLUMNS), ', '.join('?' * (4 + len(TRIAL_COLUMNS))))
+
+""" Function to turn the time of a results line into database time
+    @param stamp text 'MM-DD-YYYY HH:MM:SS.mmm'
+    @return text 'YYYY-MM-DD HH:MM:SS.mmm' """
+def iso_stamp(stamp):
+    return stamp[6:10] + '-' + stamp[0:5] + stamp[10:]
+
+""" Function to get the DMTS delay out of the text of a parameters file
+    @param parameters text of the parameters file, or None
+    @return delay in seconds, or None """
+def dmts_delay(parameters):
+    if parameters is None:
+        return None
+    try:
+        return float(parameter_files.parse(parameters).get('DMTS Delay Time'))
+    except (TypeError, ValueError):
+        return None
+
+""" Function to make the row of a trial
+    @param session_id of the trial's session
+    @param subject ID
+    @param time database time of the trial
+    @param task name
+    @param values of the fields of the task, in order
+    @param delay DMTS delay of the session, or None
+    @return tuple of the trial columns """
+def trial_row(session_id, subject, time, task, values, delay):
+    columns = dict.fromkeys(TRIAL_COLUMNS)
+    for name, value in zip(resultswriter.fields(task), values):
+        columns[COLUMN_NAMES.get(name, name)] = value
+    if task == 'DMTS':
+        columns['delay'] = delay
+    return (session_id, subject, time, task) + tuple(columns.values())
+
+""" Class for the results database """
+class ResultsStore:
+    """ ResultsStore Constructor, opens or makes the database
+        @param self
+        @param path of the database file
+        @param parameters text of the parameters file of the session written to it, or None """
+    def __init__(self, path, parameters = None):
+        self.path = path
+        self.parameters = parameters
+        self.delay = dmts_delay(parameters)
+        # written from the results writer thread after it is made on the main thread, only one thread uses it at a time
+        self.connection = sqlite3.connect(path, check_same_thread = False)
+        self.connection.executescript(SCHEMA)
+        self.session_id = None # session trials are added to
+        self.subject = None
+        self.last_time = None # time of the last record of the session
+
+    """ Function to add a batch of records in one transaction
+        @param self
+        @param records list of (stamp, task, values) like resultswriter.ResultsWriter.write() takes """
+    def write(self, records):
+        with self.connection:
+            rows = []
+            for stamp, task, values in records:
+                stamp = iso_stamp(stamp)
+                if task == 'Session':
+                    self.end_session()
+                    self.subject = values[0]
+                    self.session_id = self.connection.execute('INSERT INTO sessions (subject, started, perf_counter_ns, time_ns, parameters, source) VALUES (?, ?, ?, ?, ?, ?)',
+                                                              (self.subject, stamp, values[1], values[2], self.parameters, 'game.py')).lastrowid
+                elif self.session_id is not None:
+                    rows.append(trial_row(self.session_id, self.subject, stamp, task, values, self.delay))
+                self.last_time = stamp
+            self.connection.executemany(INSERT_TRIAL, rows)
+
+    """ Function to set the end time of the current session
+        @param self """
+    def end_session(self):
+        if self.session_id is not None:
+            self.connection.execute('UPDATE sessions SET ended = ? WHERE id = ?', (self.last_time, self.session_id))
+
+    """ Function to end the current session and close the database
+        @param self """
+    def close(self):
+        with self.connection:
+            self.end_session()
+        self.connection.close()
+
+    """ Function to add the sessions of a results file that are not in the database yet
+        @param self
+        @param path of {ID}Data.txt or {ID}Data.jsonl
+        @param batch number of trials held before they are inserted
+        @param parameters text of the parameters file the sessions ran with, or None if it is not known
+        @return (sessions added, sessions skipped) """
+    def import_file(self, path, batch = 10000, parameters = None):
+        subject = results.subject_of(path)
+        delay = dmts_delay(parameters)
+        added = skipped = 0
+        session = None # session number in the file being read
+        session_id = None # database id of it, None when it is skipped
+        rows = []
+        last_time = None
+
+        with self.connection:
+            for record in results.read_records(path, errors = 'skip'):
+                stamp = record.time.strftime('%Y-%m-%d %H:%M:%S.') + '{:03d}'.format(record.time.microsecond // 1000)
+
+                if record.session != session:
+                    # end the last session, start the next one unless it is already in the database
+                    if session_id is not None:
+                        self.connection.execute('UPDATE sessions SET ended = ? WHERE id = ?', (last_time, session_id))
+                    session = record.session
+                    clocks = (record.perf_counter_ns, record.time_ns) if record.task == 'Session' else (None, None)
+                    cursor = self.connection.execute('INSERT OR IGNORE INTO sessions (subject, started, perf_counter_ns, time_ns, parameters, source) VALUES (?, ?, ?, ?, ?, ?)',
+                                                     (subject, stamp, clocks[0], clocks[1], parameters, os.path.abspath(path)))
+                    if cursor.rowcount == 1:
+                        session_id = cursor.lastrowid
+                        added += 1
+                    else:
+                        session_id = None
+                        skipped += 1
+
+                if session_id is not None and record.task != 'Session':
+                    rows.append(trial_row(session_id, subject, stamp, record.task, record[len(results.RECORD_FIELDS):], delay))
+                    if len(rows) >= batch:
+                        self.connection.executemany(INSERT_TRIAL, rows)
+                        rows = []
+                last_time = stamp
+
+            self.connection.executemany(INSERT_TRIAL, rows)
+            if session_id is not None:
+                self.connection.execute('UPDATE sessions SET ended = ? WHERE id = ?', (last_time, session_id))
+        return added, skipped
+
+""" Function to query trials
+    @param connection to the database
+    @param subject ID, or None for every subject
+    @param task name, or None for every task
+    @param start first time 'YYYY-MM-DD ...', or None
+    @param end time to stop before 'YYYY-MM-DD ...', or None
+    @param min_delay only DMTS trials with a longer delay than this many seconds, or None
+    @param stimulus only trials with this stimulus on the left or right, or None
+    @return list of sqlite3.Row trials """
+def query_trials(connection, subject = None, task = None, start = None, end = None, min_delay = None, stimulus = None):
+    where = []
+    arguments = []
+    for condition, argument in (('subject = ?', subject), ('task = ?', task), ('time >= ?', start), ('time < ?', end), ('delay > ?', min_delay)):
+        if argument is not None:
+            where.append(condition)
+            arguments.append(argument)
+    if stimulus is not None:
+        where.append('(left_stimulus = ? OR right_stimulus = ?)')
+        arguments += [stimulus, stimulus]
+
+    connection.row_factory = sqlite3.Row
+    sql = 'SELECT * FROM trials' + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY time'
+    return connection.execute(sql, arguments).fetchall()
+
+""" Main function, imports results files into the database or queries it """
+def main():
+    parser = argparse.ArgumentParser(description = 'Import results files into the results database or query it')
+    parser.add_argument('--database', default = os.path.join(main_dir, 'results', STORE_FILE), help = 'database file, main/results/' + STORE_FILE + ' by default')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    import_parser = commands.add_parser('import', help = 'add the sessions of results files that are not in the database yet')
+    import_parser.add_argument('paths', nargs = '+', help = 'results/{ID}Data.txt files')
+    import_parser.add_argument('--parameters', help = 'parameters file the sessions ran with, for the DMTS delay')
+
+    query_parser = commands.add_parser('query', help = 'print trials')
+    query_parser.add_argument('--subject')
+    query_parser.add_argument('--task')
+    query_parser.add_argument('--start', help = 'first date, YYYY-MM-DD')
+    query_parser.add_argument('--end', help = 'date to stop before, YYYY-MM-DD')
+    query_parser.add_argument('--min-delay', type = float, help = 'DMTS delay longer than this many seconds')
+    query_parser.add_argument('--stimulus', help = 'stimulus on the left or right')
+    args = parser.parse_args()
+
+    store = ResultsStore(args.database)
+    if args.command == 'import':
+        parameters = None
+        if args.parameters is not None:
+            with open(args.parameters) as parameter_file:
+                parameters = parameter_file.read()
+        for path in args.paths:
+            start = time.perf_counter()
+            added, skipped = store.import_file(path, parameters = parameters)
+            print('{}  {} sessions added, {} already in the database  {:.2f}s'.format(path, added, skipped, time.perf_counter() - start))
+    else:
+        start = time.perf_counter()
+        trials = query_trials(store.connection, args.subject, args.task, args.start, args.end, args.min_delay, args.stimulus)
+        elapsed = time.perf_counter() - start
+        for trial in trials:
+            print('  '.join('NA' if value is None else str(value) for value in tuple(trial)[2:]))
+        print('{} trials  {:.1f}ms'.format(len(trials), elapsed * 1000))
+    store.connection.close()
+
+""" this calls the 'main' function when this script is executed """
+if __name__ == '__main__':
+    main()
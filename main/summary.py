@@ -0,0 +1,240 @@
+""" summary.py
+        Keeps a small summary of every subject in results/{ID}Summary.json so
+        where an animal is can be read without going through its whole results
+        file: the number of sessions, the time of the last one, and for every
+        task the trials so far and the fields of the last trial (like the Side
+        level it is on). Tasks that log a result (MTS, DMTS, LS) also keep
+        their correct trials and the results of the last ROLLING_TRIALS trials,
+        Side, Chase and Pursuit have no result so they have neither.
+
+        The results writer thread adds every record it writes and saves the
+        summary every time it flushes the results file. The summary is written
+        to a temporary file that then replaces the old one, so it is never
+        left half written. It also holds the size of {ID}Data.txt it covers, with its archived sessions,
+        if that does not match the file the summary is rebuilt from the file.
+
+        'python summary.py ID ...' prints the summaries, '--rebuild' rebuilds
+        them from the results files first, '--all' does every subject.
+"""
+
+import os, json, glob, argparse
+
+# fields of every task, main/resultswriter.py
+import resultswriter
+
+# results file parser, main/results.py
+import results
+
+# archived sessions of the results files, main/archive.py
+import archive
+
+main_dir = os.path.split(os.path.abspath(__file__))[0] # current starting directory, should be main/
+
+# number of last trials the rolling accuracy is over
+ROLLING_TRIALS = 20
+
+# tasks that log if the trial was correct
+CHOICE_TASKS = ('MTS', 'DMTS', 'LS')
+
+# version of the summary file, a summary of another version is rebuilt
+VERSION = 2
+
+""" Function to get the summary file of a subject
+    @param results_path directory of the results files
+    @param subject ID
+    @return path of {subject}Summary.json """
+def summary_path(results_path, subject):
+    return os.path.join(results_path, subject + 'Summary.json')
+
+""" Function to get the size of a subject's text results file, with its archived sessions
+    @param results_path directory of the results files
+    @param subject ID
+    @return size in bytes, 0 if there is no file """
+def data_size(results_path, subject):
+    return archive.history_size(os.path.join(results_path, subject + 'Data.txt'))
+
+""" Class for the summary of a subject """
+class SubjectSummary:
+    """ SubjectSummary Constructor, an empty summary
+        @param self
+        @param results_path directory of the results files
+        @param subject ID """
+    def __init__(self, results_path, subject):
+        self.results_path = results_path
+        self.subject = subject
+        self.path = summary_path(results_path, subject)
+        self.data = {
+            'version': VERSION,
+            'subject': subject,
+            'data_size': 0, # bytes of {ID}Data.txt the summary covers
+            'sessions': 0,
+            'last_session': None, # time of the last 'Session' line
+            'last_time': None, # time of the last record
+            'tasks': {}, # task: {'trials', 'last'}, and 'correct', 'recent' for tasks with a 'result' field
+        }
+
+    """ Function to add a record written to the results file
+        @param self
+        @param stamp date and time text of the record
+        @param task name, a key of resultswriter.SCHEMAS
+        @param values of the fields of the task, in order """
+    def add(self, stamp, task, values):
+        data = self.data
+        data['last_time'] = stamp
+        if task == 'Session':
+            data['sessions'] += 1
+            data['last_session'] = stamp
+            return
+
+        # only the tasks that log if the trial was correct count their correct trials
+        schema = resultswriter.SCHEMAS[task]
+        stats = data['tasks'].get(task)
+        if stats is None:
+            stats = data['tasks'][task] = {'trials': 0, 'last': None}
+            if 'result' in schema:
+                stats['correct'] = 0
+                stats['recent'] = ''
+        stats['trials'] += 1
+        if 'result' in schema:
+            # results of the last trials as a string of 1 for correct and 0 for wrong, oldest first
+            correct = values[schema.index('result')] == 'Correct'
+            stats['correct'] += correct
+            stats['recent'] = (stats['recent'] + ('1' if correct else '0'))[-ROLLING_TRIALS:]
+        # seconds are rounded like in the text line, so a rebuilt summary is the same
+        stats['last'] = {name: round(value, 3) if name in resultswriter.SECONDS_FIELDS and value is not None else value for name, value in zip(resultswriter.fields(task), values)}
+
+    """ Function to get the accuracy of the last trials of a task
+        @param self
+        @param task name
+        @return fraction correct of the last ROLLING_TRIALS trials, None if there are none """
+    def rolling_accuracy(self, task):
+        stats = self.data['tasks'].get(task)
+        if stats is None or not stats.get('recent'):
+            return None
+        return stats['recent'].count('1') / len(stats['recent'])
+
+    """ Function to get a field of the last trial of a task
+        @param self
+        @param task name
+        @param name of the field, like 'level'
+        @return value, None if the task was never run """
+    def last(self, task, name):
+        stats = self.data['tasks'].get(task)
+        if stats is None or stats['last'] is None:
+            return None
+        return stats['last'].get(name)
+
+    """ Function to save the summary, replacing the old file only once the new one is written
+        @param self
+        @param size of {ID}Data.txt the summary covers
+        @param fsync True to fsync the file before it replaces the old one """
+    def save(self, size, fsync = False):
+        self.data['data_size'] = size
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as summary_file:
+            json.dump(self.data, summary_file, separators = (',', ':'))
+            if fsync:
+                summary_file.flush()
+                os.fsync(summary_file.fileno())
+        os.replace(temp_path, self.path)
+
+    """ Function to check the summary covers the whole results file
+        @param self
+        @return True if it does, False if it does not match the results file """
+    def matches(self):
+        return self.data['data_size'] == data_size(self.results_path, self.subject)
+
+    """ Function to rebuild the summary from the results file and save it
+        @param self """
+    def rebuild(self):
+        self.data = SubjectSummary(self.results_path, self.subject).data # start from an empty summary
+        size = data_size(self.results_path, self.subject)
+        sessions = 0
+
+        if size > 0:
+            for record in results.read_records(os.path.join(self.results_path, self.subject + 'Data.txt'), errors = 'skip'):
+                stamp = record.time.strftime('%m-%d-%Y %H:%M:%S.') + '{:03d}'.format(record.time.microsecond // 1000)
+                values = tuple(record[len(results.RECORD_FIELDS):])
+                if record.task == 'Session':
+                    values = (self.subject,) + values
+                self.add(stamp, record.task, values)
+                sessions = record.session
+        # older results files have no 'Session' lines, their sessions are counted by the parser
+        self.data['sessions'] = sessions
+
+        self.save(size)
+
+    """ Function to rebuild the summary if it does not match the results file
+        @param self """
+    def sync(self):
+        if not self.matches():
+            self.rebuild()
+
+    """ Function to get a one line description for the subject selection menu
+        @param self
+        @return text """
+    def describe(self):
+        data = self.data
+        if data['last_session'] is None and not data['tasks']:
+            return 'No sessions yet'
+        text = ['{} sessions'.format(data['sessions'])]
+        last_session = data['last_session'] or data['last_time'] # older results files have no 'Session' lines
+        if last_session is not None:
+            text.append('last ' + last_session[:16])
+        level = self.last('Side', 'level')
+        if level is not None:
+            text.append('Side level {}'.format(level))
+        for task in CHOICE_TASKS:
+            accuracy = self.rolling_accuracy(task)
+            if accuracy is not None:
+                text.append('{} {:.0%}'.format(task, accuracy))
+        return ', '.join(text)
+
+""" Function to read a subject's summary, without checking it against the results file
+    @param results_path directory of the results files
+    @param subject ID
+    @return SubjectSummary, empty if there is no summary file or it cannot be read """
+def read(results_path, subject):
+    summary = SubjectSummary(results_path, subject)
+    try:
+        with open(summary.path, 'r') as summary_file:
+            data = json.load(summary_file)
+        if data.get('version') == VERSION:
+            summary.data = data
+    except (OSError, ValueError):
+        pass
+    return summary
+
+""" Function to load a subject's summary, rebuilding it if it does not match the results file
+    @param results_path directory of the results files
+    @param subject ID
+    @return SubjectSummary """
+def load(results_path, subject):
+    summary = read(results_path, subject)
+    summary.sync()
+    return summary
+
+""" Main function, prints or rebuilds the summaries of the subjects given on the command line """
+def main():
+    parser = argparse.ArgumentParser(description = 'Show or rebuild the summaries of subjects')
+    parser.add_argument('subjects', nargs = '*', help = 'animal IDs')
+    parser.add_argument('--all', action = 'store_true', help = 'every subject with a results file')
+    parser.add_argument('--rebuild', action = 'store_true', help = 'rebuild the summaries from the results files')
+    parser.add_argument('--results', default = os.path.join(main_dir, 'results'), help = 'directory of the results files, main/results by default')
+    args = parser.parse_args()
+
+    subjects = list(args.subjects)
+    if args.all:
+        subjects += [results.subject_of(path) for path in sorted(glob.glob(os.path.join(args.results, '*Data.txt')))]
+
+    for subject in subjects:
+        summary = read(args.results, subject)
+        if args.rebuild:
+            summary.rebuild()
+        elif not summary.matches():
+            print('{}: summary does not match the results file, run with --rebuild'.format(subject))
+        print('{}: {}'.format(subject, summary.describe()))
+
+""" this calls the 'main' function when this script is executed """
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,597 @@
+""" tasks.py
+        The tasks game.py runs: Side, Chase, Pursuit, MTS, DMTS and LS. Every
+        task is a class with the same interface, registered by its name in
+        REGISTRY, so the game loop looks the task up once when it starts and
+        then only calls its methods every frame, instead of comparing the name
+        of the task with every other task:
+            setup(context)     - set up the next trial, its sprites and walls
+            step(context)      - called every frame of the trial once it is set up, checks for a
+                                 response and sets correct, chosen or timeout when the trial ends
+            record(context)    - fields of the trial for its results line, in the order of
+                                 resultswriter.SCHEMAS[name], without the trial timing fields
+            evaluate(context)  - called once the trial is recorded, moves on to the next level
+                                 or problem and sets over once the task is done
+        end_trial() counts the trial, then calls record() and evaluate().
+
+        The state of every task is kept in its object and the state of the
+        session the tasks share in a TaskContext, both with __slots__, so
+        nothing is left over from one task or trial in the next.
+
+        A new task can be added without changing game.py. A module in main/
+        subclasses Task, decorates it with @register and calls add_task() for
+        its parameters and results fields. It is then imported by running
+        'python game.py --task-plugin {module}'.
+
+        The time the task takes every frame, dispatch included, is the 'task
+        logic' phase of the frame timing in {ID}FrameStats.txt (framestats.py).
+"""
+
+import os, random
+
+# pip install pygame --user
+import pygame
+
+# Pointer, Target and Stimuli sprites, main/sprites.py
+import sprites
+
+# trial phases and their deadlines, main/scheduler.py
+import scheduler
+
+# nanosecond session times, main/sessionclock.py
+import sessionclock
+
+# parameters of every task, main/parameters.py
+import parameters
+
+# results fields of every task, main/resultswriter.py
+import resultswriter
+
+# results file parser, main/results.py
+import results
+
+# task classes by name, filled in by register()
+REGISTRY = {}
+
+# diameter of the Target for the 'Circle Size' parameters
+CIRCLE_SIZES = {'Small': 100, 'Medium': 200, 'Large': 300}
+
+""" Function to register a task class by its name, used as @register on the class
+    @param task_class subclass of Task
+    @return task_class """
+def register(task_class):
+    REGISTRY[task_class.name] = task_class
+    return task_class
+
+""" Function to add the parameters and results fields of a task from a plugin
+    @param name of the task
+    @param specs list of parameters.Parameter of the task, with its section set to name, see parameters.add_task()
+    @param fields names of the fields of its results lines, without the trial timing fields """
+def add_task(name, specs, fields):
+    parameters.add_task(name, specs)
+    resultswriter.SCHEMAS[name] = tuple(fields)
+    results.RECORD_TYPES[name] = results.make_record_types()[name]
+
+""" Function to make the task to run
+    @param name of the task, a key of REGISTRY
+    @param task_parameters dictionary of the parameters of the task from parameters.validate()
+    @param context TaskContext of the session
+    @return Task """
+def make(name, task_parameters, context):
+    return REGISTRY[name](task_parameters, context)
+
+""" Function to return a randomly generated list
+    @param start value for list
+    @param end value for list
+    @param length of list to return
+    @return random list generated """
+def random_list(start, end, length):
+    # make empty list
+    rlist = []
+
+    # loop until rlist is of desired length
+    while len(rlist) != length:
+        # generate random int in desired range
+        r = random.randint(start, end)
+
+        # only add if random int is not already in rlist
+        if r not in rlist:
+            rlist.append(r)
+
+    return rlist
+
+""" Function to get the name of a stimuli for the results file
+    @param filename of the stimuli
+    @return filename without its directory and extension """
+def stimuli_name(filename):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+""" Class for what the tasks of a session share """
+class TaskContext:
+    __slots__ = ('background', 'pointer', 'renderer', 'session_clock', 'trial_scheduler', 'stimuli_catalogue',
+                 'stimuli_cache', 'stimuli_random', 'prefetcher', 'input_device', 'start_time', 'total_trials')
+
+    """ TaskContext Constructor
+        @param self
+        @param background from pygame
+        @param pointer sprites.Pointer
+        @param renderer render.Renderer the trials are drawn with
+        @param session_clock sessionclock.SessionClock of the session
+        @param trial_scheduler scheduler.TrialScheduler of the trial phases
+        @param stimuli_catalogue to draw the stimuli from
+        @param stimuli_cache stimuli.StimuliCache to take the images from
+        @param stimuli_random random.Random the stimuli of the trials are drawn with
+        @param prefetcher executor the next stimuli trial is prepared on
+        @param input_device the Pointer and Target follow """
+    def __init__(self, background, pointer, renderer, session_clock, trial_scheduler, stimuli_catalogue, stimuli_cache, stimuli_random, prefetcher, input_device):
+        self.background = background
+        self.pointer = pointer
+        self.renderer = renderer
+        self.session_clock = session_clock
+        self.trial_scheduler = trial_scheduler
+        self.stimuli_catalogue = stimuli_catalogue
+        self.stimuli_cache = stimuli_cache
+        self.stimuli_random = stimuli_random
+        self.prefetcher = prefetcher
+        self.input_device = input_device
+        self.start_time = None # session time the response window of the trial opened
+        self.total_trials = 0 # trials of every task in the session
+
+""" Class for a task, the base of every task """
+class Task:
+    __slots__ = ('parameters', 'trials', 'correct_trials', 'over', 'correct', 'chosen', 'timeout', 'response_time', 'target')
+    name = None # name of the task in the parameters and the results files
+
+    """ Task Constructor
+        @param self
+        @param task_parameters dictionary of the parameters of the task from parameters.validate()
+        @param context TaskContext of the session """
+    def __init__(self, task_parameters, context):
+        self.parameters = task_parameters
+        self.trials = 0
+        self.correct_trials = 0
+        self.over = False # True once the task is done
+        self.target = None # Target of the trial for the trajectory, for Chase and Pursuit
+        self.reset_trial()
+
+    """ Function to reset the trial ending variables for the next trial, it is set up once the feedback or timeout is over
+        @param self """
+    def reset_trial(self):
+        self.correct = False
+        self.chosen = False # True once a stimuli was chosen
+        self.timeout = False
+        self.response_time = None # session time of the response or timeout that ended the trial, found between frames
+
+    """ Function to set up the next trial
+        @param self
+        @param context TaskContext of the session """
+    def setup(self, context):
+        raise NotImplementedError
+
+    """ Function called every frame of the trial, checks for a response
+        @param self
+        @param context TaskContext of the session """
+    def step(self, context):
+        raise NotImplementedError
+
+    """ Function to get the fields of the trial for the results file
+        @param self
+        @param context TaskContext of the session
+        @return tuple of the fields in resultswriter.SCHEMAS[name] """
+    def record(self, context):
+        raise NotImplementedError
+
+    """ Function called once the trial is recorded, sets over if the task is done
+        @param self
+        @param context TaskContext of the session """
+    def evaluate(self, context):
+        pass
+
+    """ Function called once the DMTS delay of the trial is over
+        @param self
+        @param context TaskContext of the session """
+    def end_delay(self, context):
+        pass
+
+    """ Function to start preparing the next trial during the feedback or inter-trial interval
+        @param self
+        @param context TaskContext of the session """
+    def prefetch(self, context):
+        pass
+
+    """ Function to check if the trial is over
+        @param self
+        @return True once it has ended with a response, a choice or a timeout """
+    def ended(self):
+        return self.correct or self.chosen or self.timeout
+
+    """ Function to count the trial once it has ended and record it
+        @param self
+        @param context TaskContext of the session
+        @return tuple of the fields of the trial for the results file """
+    def end_trial(self, context):
+        self.trials += 1
+        context.total_trials += 1
+
+        # if correct criterion update correct_trials
+        if self.correct:
+            self.correct_trials += 1
+
+        value = self.record(context)
+        self.evaluate(context)
+        return value
+
+    """ Function to time out the trial if there was no response in Response Time seconds
+        @param self
+        @param context TaskContext of the session
+        @return True if it timed out """
+    def check_timeout(self, context):
+        if context.session_clock.elapsed(context.start_time) > self.parameters['RESPONSE']:
+            self.timeout = True
+            self.response_time = context.session_clock.now()
+        return self.timeout
+
+    """ Function to get the session time of a response the Pointer made, the Pointer moves before
+            the display update that starts the response window so it is not counted from before it
+        @param self
+        @param context TaskContext of the session
+        @param t time.perf_counter() of the response, or None for now
+        @return session time in nanoseconds """
+    def response_at(self, context, t):
+        return max(context.start_time, context.session_clock.at(t))
+
+    """ Function to get the latency of the response of the trial
+        @param self
+        @param context TaskContext of the session
+        @return seconds from the start of the response window to the response """
+    def latency(self, context):
+        return sessionclock.to_seconds(self.response_time - context.start_time)
+
+@register
+class Side(Task):
+    __slots__ = ('level', 'walls', 'wall_list')
+    name = 'Side'
+
+    """ Side Constructor
+        @param self
+        @param task_parameters dictionary of the parameters of the task
+        @param context TaskContext of the session """
+    def __init__(self, task_parameters, context):
+        Task.__init__(self, task_parameters, context)
+        background = context.background
+        self.level = task_parameters['START_LEVEL']
+        self.wall_list = () # indices of the walls of the trial
+        self.walls = [ # list of all the possible walls for side, first 4 are full length, last 4 are partial
+                        pygame.Rect(0,0,background.get_width(),200),
+                        pygame.Rect(0,background.get_height() - 200,background.get_width(),200),
+                        pygame.Rect(0,0,200,background.get_height()),
+                        pygame.Rect(background.get_width()-200,0,200,background.get_height()),
+                        pygame.Rect(0,0,background.get_width()/4,200),
+                        pygame.Rect(0,background.get_height() - 200,background.get_width()/4,200),
+                        pygame.Rect(0,0,200,background.get_height()/4),
+                        pygame.Rect(background.get_width()-200,0,200,background.get_height()/4)
+                     ]
+
+    def setup(self, context):
+        # based on current level, generate a random list of indices for the walls
+        if self.level in (1, 2):
+            self.wall_list = (0, 1, 2, 3)
+        elif self.level == 3:
+            self.wall_list = random_list(0, 3, 3)
+        elif self.level == 4:
+            self.wall_list = random_list(0, 3, 2)
+        elif self.level == 5:
+            self.wall_list = random_list(0, 3, 1)
+        elif self.level == 6:
+            self.wall_list = random_list(4, 7, 1)
+
+        # reset pointer to the center of the screen
+        context.pointer.reset(context.background.get_width() / 2, context.background.get_height() / 2)
+
+        # draw random green walls from setup selection
+        context.renderer.set_sprites((context.pointer,), [(sprites.GREEN, self.walls[i]) for i in self.wall_list])
+
+    def step(self, context):
+        pointer = context.pointer
+        if self.check_timeout(context):
+            return
+
+        if self.level == 1:
+            # if Pointer was moved from the center of the screen, correct criterion
+            if pointer.rect.x != context.background.get_width() / 2 or pointer.rect.y != context.background.get_height() / 2:
+                self.correct = True
+                self.response_time = self.response_at(context, pointer.first_move_time)
+
+        else:
+            for i in self.wall_list:
+                # if Pointer collides with a wall, correct criterion
+                if self.walls[i].colliderect(pointer):
+                    self.correct = True
+                    self.response_time = self.response_at(context, pointer.entry_time(self.walls[i], False))
+
+    def record(self, context):
+        # generate side log string for which walls are up
+        # T - top, R - right, B - bottom, L - left
+        walls = ''
+        if 0 in self.wall_list or 4 in self.wall_list:
+            walls += 'T'
+        if 3 in self.wall_list or 7 in self.wall_list:
+            walls += 'R'
+        if 1 in self.wall_list or 5 in self.wall_list:
+            walls += 'B'
+        if 2 in self.wall_list or 6 in self.wall_list:
+            walls += 'L'
+
+        return (context.total_trials, self.trials, self.level, walls, self.latency(context))
+
+    def evaluate(self, context):
+        # if enough correct trials have been completed, go to next side level
+        if self.correct_trials >= self.parameters['TRIALS']:
+            self.correct_trials = 0
+            self.level += 1
+
+            # if level 6 has been completed, go to next task
+            if self.level > 6:
+                self.level = self.parameters['START_LEVEL']
+                self.over = True
+
+""" Class for the tasks with a Target circle, Chase and Pursuit """
+class TargetTask(Task):
+    __slots__ = ()
+
+    def setup(self, context):
+        pointer = context.pointer
+        background = context.background
+
+        # construct Target circle with the circle size from parameters
+        self.target = sprites.Target(background, self.name, CIRCLE_SIZES[self.parameters['CIRCLE_SIZE']], context.input_device)
+
+        # loop until Pointer is placed somewhere not colliding with Target
+        while(self.target.rect.colliderect(pointer)):
+            newX = random.randint(0, background.get_width() - pointer.diameter)
+            newY = random.randint(0, background.get_height() - pointer.diameter)
+            pointer.reset(newX, newY)
+
+        # add Target to list of sprites to maintain
+        context.renderer.set_sprites((self.target, pointer))
+
+    def record(self, context):
+        return (context.total_trials, self.trials, self.parameters['CIRCLE_SIZE'], self.latency(context))
+
+    def evaluate(self, context):
+        # if enough correct trials have been completed, go to next task
+        if self.correct_trials >= self.parameters['TRIALS']:
+            self.over = True
+
+@register
+class Chase(TargetTask):
+    __slots__ = ()
+    name = 'Chase'
+
+    def step(self, context):
+        if self.check_timeout(context):
+            return
+
+        # check if Pointer has reached Target circle
+        if self.target.rect.contains(context.pointer):
+            self.correct = True
+            self.response_time = self.response_at(context, context.pointer.entry_time(self.target.rect))
+
+@register
+class Pursuit(TargetTask):
+    __slots__ = ('inside', 'start_contains_time')
+    name = 'Pursuit'
+
+    """ Pursuit Constructor
+        @param self
+        @param task_parameters dictionary of the parameters of the task
+        @param context TaskContext of the session """
+    def __init__(self, task_parameters, context):
+        TargetTask.__init__(self, task_parameters, context)
+        self.inside = False # True while the Pointer is inside the Target
+        self.start_contains_time = None # session time the Pointer got inside the Target
+
+    def setup(self, context):
+        TargetTask.setup(self, context)
+        self.inside = False
+
+    def step(self, context):
+        if self.check_timeout(context):
+            return
+
+        # if Pointer is inside of Target
+        if self.target.rect.contains(context.pointer):
+            # if it was already inside
+            if self.inside:
+                self.target.change_color(sprites.GREEN) # change target color to green
+                # if its been Pursuit Time, correct criterion
+                if (context.session_clock.elapsed(self.start_contains_time) >= self.parameters['PURSUIT_TIME']):
+                    self.correct = True
+                    self.response_time = self.start_contains_time + sessionclock.to_ns(self.parameters['PURSUIT_TIME'])
+
+            # if Pointer has not been inside Target yet
+            else:
+                self.inside = True
+                self.start_contains_time = context.session_clock.at(context.pointer.entry_time(self.target.rect)) # reset timer
+
+        # if Pointer is not inside of Target, change circle color to red
+        else:
+            self.target.change_color(sprites.RED)
+            self.inside = False
+
+""" Class for the tasks choosing between two stimuli, MTS, DMTS and LS """
+class StimuliTask(Task):
+    __slots__ = ('trial', 'next_trial')
+
+    """ StimuliTask Constructor
+        @param self
+        @param task_parameters dictionary of the parameters of the task
+        @param context TaskContext of the session """
+    def __init__(self, task_parameters, context):
+        Task.__init__(self, task_parameters, context)
+        self.trial = None # sprites.StimuliTrial of the trial
+        self.next_trial = None # future sprites.StimuliTrial of the next trial
+
+    """ Function to get the correct stimuli to keep for the next trial
+        @param self
+        @return filename, or None to draw a new one """
+    def kept_stimuli(self):
+        return None
+
+    """ Function to get the stimuli of the trial, the ones prepared during the inter-trial interval, or prepared now for the first trial
+        @param self
+        @param context TaskContext of the session
+        @return sprites.StimuliTrial """
+    def take_trial(self, context):
+        if self.next_trial is not None:
+            trial = self.next_trial.result()
+            self.next_trial = None
+            return trial
+        return sprites.prepare_stimuli_trial(self.name, context.stimuli_catalogue, context.stimuli_cache, context.background, context.stimuli_random, self.kept_stimuli())
+
+    """ Function to check if the Pointer chose one of the stimuli
+        @param self
+        @param context TaskContext of the session """
+    def check_choice(self, context):
+        if self.check_timeout(context):
+            return
+
+        # if Pointer collides with correct stimuli, correct criterion
+        if self.trial.stimuli_correct.rect.contains(context.pointer):
+            self.correct = True
+            self.chosen = True
+            self.response_time = self.response_at(context, context.pointer.entry_time(self.trial.stimuli_correct.rect))
+
+        # if Pointer collides with incorrect stimuli, incorrect criterion
+        elif self.trial.stimuli_wrong.rect.contains(context.pointer):
+            self.correct = False
+            self.chosen = True
+            self.response_time = self.response_at(context, context.pointer.entry_time(self.trial.stimuli_wrong.rect))
+
+    def step(self, context):
+        self.check_choice(context)
+
+    """ Function to get the stimuli fields of the results line
+        @param self
+        @param context TaskContext of the session
+        @return (percent, left, correct side, right, latency, result) """
+    def stimuli_record(self, context):
+        trial = self.trial
+        return (round(self.parameters['PERCENT'],2), stimuli_name(trial.left_stimuli), trial.stimuli_correct_str, stimuli_name(trial.right_stimuli), self.latency(context), 'Correct' if self.correct else 'Incorrect')
+
+    def record(self, context):
+        return (context.total_trials, self.trials) + self.stimuli_record(context)
+
+    def evaluate(self, context):
+        # if enough correct trials have been completed
+        if self.correct_trials >= self.parameters['TRIALS']:
+            # if accuracy of trials is > parameters percent, go to next task
+            if (self.correct_trials / self.trials) >= (self.parameters['PERCENT'] / 100):
+                self.over = True
+
+    def prefetch(self, context):
+        # prepare the stimuli of the next trial while we wait, if the task is going to continue
+        if not self.over:
+            self.next_trial = context.prefetcher.submit(sprites.prepare_stimuli_trial, self.name, context.stimuli_catalogue, context.stimuli_cache, context.background, context.stimuli_random, self.kept_stimuli())
+
+""" Match-to-Sample task """
+@register
+class MTS(StimuliTask):
+    __slots__ = ()
+    name = 'MTS'
+
+    def setup(self, context):
+        self.trial = self.take_trial(context)
+
+        # add stimuli to list of sprites
+        context.renderer.set_sprites((self.trial.stimuli_correct, self.trial.stimuli_wrong, self.trial.stimuli_bottom, context.pointer))
+
+        # reset Pointer to center of screen
+        context.pointer.reset(context.background.get_width()/2, context.background.get_height()/2)
+
+""" Delayed-Match-to-Sample task """
+@register
+class DMTS(StimuliTask):
+    __slots__ = ('delay_over',)
+    name = 'DMTS'
+
+    """ DMTS Constructor
+        @param self
+        @param task_parameters dictionary of the parameters of the task
+        @param context TaskContext of the session """
+    def __init__(self, task_parameters, context):
+        StimuliTask.__init__(self, task_parameters, context)
+        self.delay_over = False
+
+    def setup(self, context):
+        self.trial = self.take_trial(context)
+
+        # add only bottom stimuli to sprite list
+        context.renderer.set_sprites((self.trial.stimuli_bottom, context.pointer))
+
+        # reset pointer to center of screen
+        context.pointer.reset(context.background.get_width()/2, context.background.get_height()/2)
+        self.delay_over = False
+
+    def step(self, context):
+        # if delay is over
+        if self.delay_over:
+            self.check_choice(context)
+
+        # start delay when Pointer collides bottom stimuli
+        elif self.trial.stimuli_bottom.rect.contains(context.pointer):
+            # blank screen for the delay, the choices are shown once it is over
+            context.renderer.blank()
+            context.trial_scheduler.enter(scheduler.DELAY, self.parameters['DELAY'])
+
+    def end_delay(self, context):
+        # add wrong and correct stimuli to sprites, remove bottom one
+        context.renderer.set_sprites((self.trial.stimuli_wrong, self.trial.stimuli_correct, context.pointer))
+        self.delay_over = True
+
+""" Learning Set task """
+@register
+class LS(StimuliTask):
+    __slots__ = ('new_stimuli', 'problem_trials', 'problems')
+    name = 'LS'
+
+    """ LS Constructor
+        @param self
+        @param task_parameters dictionary of the parameters of the task
+        @param context TaskContext of the session """
+    def __init__(self, task_parameters, context):
+        StimuliTask.__init__(self, task_parameters, context)
+        self.new_stimuli = True # True at the start of a problem, it needs a new correct stimuli
+        self.problem_trials = 0
+        self.problems = 1
+
+    def kept_stimuli(self):
+        # the correct stimuli stays the same for every trial of a problem
+        return None if self.new_stimuli else self.trial.correct_stimuli
+
+    def setup(self, context):
+        self.trial = self.take_trial(context)
+        self.new_stimuli = False
+
+        # add stimuli to sprite list
+        context.renderer.set_sprites((self.trial.stimuli_correct, self.trial.stimuli_wrong, context.pointer))
+
+        # reset pointer to center of screen
+        context.pointer.reset(context.background.get_width()/2, context.background.get_height()/2)
+
+    def record(self, context):
+        return (context.total_trials, self.problems, self.trials) + self.stimuli_record(context)
+
+    def evaluate(self, context):
+        self.problem_trials += 1
+
+        # if enough problem trials have been completed
+        if self.problem_trials >= self.parameters['TRIALS_PER_PROB']:
+            self.problem_trials = 0
+            self.problems += 1 # increment number of problems
+            self.new_stimuli = True # new problem
+
+            # if enough problems have been completed
+            if (self.problems > self.parameters['NUM_PROBS']):
+                # if accuracy of all ls trials is > parameters percent, go to next task
+                if (self.correct_trials / self.trials) >= (self.parameters['PERCENT'] / 100):
+                    self.over = True
@@ -0,0 +1,221 @@
+""" trajectory.py
+        Records the path of the Pointer during every trial, and the Target
+        for Chase and Pursuit, as rows of (trial, t_ns, x, y, target_x, target_y).
+        Rows go into fixed size chunks of array.array columns, full chunks are
+        handed to a writer thread that appends them to a temporary file per
+        column, so the game loop never writes to disk. When the session ends
+        the columns are packed into results/{ID}Trajectory_{session start}.npz,
+        one .npy array per column, which numpy.load() can read.
+
+        trial is the trial number (total trials) of the line in results/{ID}Data.txt,
+        t_ns is the session time in nanoseconds (sessionclock.py) like the
+        onset_ns, response_ns and feedback_ns of the trial, x, y and target_x,
+        target_y are the centers in screen pixels, target_x and target_y are NaN when there is no Target.
+
+        If the writer thread fails, the rows of the rest of the session are
+        dropped, the temporary files are removed and the error is logged when
+        the recorder is closed.
+"""
+
+import os, sys, array, queue, struct, threading, zipfile, ast, logging
+
+# messages about the trajectory file, shown by the program running the session
+log = logging.getLogger('trajectory')
+
+# name, array.array typecode and numpy type of every column
+COLUMNS = (
+    ('trial', 'I', 'u4'),
+    ('t_ns', 'q', 'i8'),
+    ('x', 'f', 'f4'),
+    ('y', 'f', 'f4'),
+    ('target_x', 'f', 'f4'),
+    ('target_y', 'f', 'f4'),
+)
+
+# rows in a chunk, a chunk is written out once it is full
+CHUNK_ROWS = 4096
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+NAN = float('nan')
+
+""" Function to make the header of a 1 dimensional .npy array
+    @param numpy_type of the array, like 'f8'
+    @param length of the array
+    @return bytes of the header """
+def npy_header(numpy_type, length):
+    header = "{{'descr': '{}{}', 'fortran_order': False, 'shape': ({},), }}".format(BYTE_ORDER, numpy_type, length)
+    # header is padded with spaces so the data starts on a multiple of 64 bytes
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header += ' ' * (padding % 64) + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+""" Class that records trajectories and writes them off the game loop """
+class TrajectoryRecorder:
+    """ TrajectoryRecorder Constructor, starts the writer thread
+        @param self
+        @param path of the .npz file written when the session ends
+        @param session_clock sessionclock.SessionClock the rows are timed with
+        @param chunk_rows number of rows in a chunk """
+    def __init__(self, path, session_clock, chunk_rows = CHUNK_ROWS):
+        self.path = path
+        self.session_clock = session_clock
+        self.chunk_rows = chunk_rows
+        self.rows = 0 # rows used in the current chunk
+        self.total_rows = 0 # rows recorded in the session
+        self.last_time = 0.0 # time.perf_counter() of the last row added by add_pointer
+
+        self.free_chunks = queue.Queue() # chunks the writer is done with, to reuse
+        self.chunk = self.new_chunk()
+
+        self.chunks = queue.Queue() # (chunk, rows) to write, None to finish the file
+        self.error = None
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    """ Function to get an empty chunk, reusing one the writer is done with if there is one
+        @param self
+        @return list of array.array columns, each chunk_rows long """
+    def new_chunk(self):
+        try:
+            return self.free_chunks.get_nowait()
+        except queue.Empty:
+            return [array.array(typecode, bytes(array.array(typecode).itemsize * self.chunk_rows)) for name, typecode, numpy_type in COLUMNS]
+
+    """ Function to add a row
+        @param self
+        @param trial number of the trial in the results file
+        @param t_ns session time of the row in nanoseconds
+        @param x, y center of the Pointer
+        @param target_x, target_y center of the Target, or NaN """
+    def add(self, trial, t_ns, x, y, target_x = NAN, target_y = NAN):
+        i = self.rows
+        chunk = self.chunk
+        chunk[0][i] = trial
+        chunk[1][i] = t_ns
+        chunk[2][i] = x
+        chunk[3][i] = y
+        chunk[4][i] = target_x
+        chunk[5][i] = target_y
+
+        self.rows = i + 1
+        if self.rows == self.chunk_rows:
+            self.flush()
+
+    """ Function to add the path the Pointer moved along in its last update
+        @param self
+        @param trial number of the trial in the results file
+        @param pointer that was just updated
+        @param target for Chase and Pursuit, or None """
+    def add_pointer(self, trial, pointer, target = None):
+        half = pointer.rect.width / 2
+        if target is None:
+            target_x = target_y = NAN
+        else:
+            target_x, target_y = target.rect.center
+
+        # start of every straight move, then where the Pointer is now, the first move
+        # usually starts where the last update ended which is already recorded
+        for start, x, y, vx, vy, end in pointer.segments:
+            if start > self.last_time:
+                self.add(trial, self.session_clock.at(start), x + half, y + half, target_x, target_y)
+        if pointer.time > self.last_time:
+            self.add(trial, self.session_clock.at(pointer.time), pointer.x + half, pointer.y + half, target_x, target_y)
+        self.last_time = pointer.time
+
+    """ Function to hand the current chunk to the writer thread
+        @param self """
+    def flush(self):
+        # once the writer failed the rows are dropped, the chunk is used again
+        if self.error is not None:
+            self.rows = 0
+        elif self.rows > 0:
+            self.chunks.put((self.chunk, self.rows))
+            self.total_rows += self.rows
+            self.chunk = self.new_chunk()
+            self.rows = 0
+
+    """ Function to write the last rows and finish the .npz file, waits for the writer thread
+            and logs the error if it failed
+        @param self """
+    def close(self):
+        self.flush()
+        self.chunks.put(None)
+        self.thread.join()
+        if self.error is not None:
+            log.error('Trajectory could not be written to %s: %s', self.path, self.error)
+
+    """ Function to get the temporary file of a column
+        @param self
+        @param name of the column
+        @return path of the file """
+    def column_path(self, name):
+        return '{}.{}.tmp'.format(self.path, name)
+
+    """ Function run on the writer thread, appends chunks to the column files until closed
+        @param self """
+    def run(self):
+        files = []
+        lengths = [0] * len(COLUMNS)
+        try:
+            for name, typecode, numpy_type in COLUMNS:
+                files.append(open(self.column_path(name), 'wb'))
+
+            while True:
+                item = self.chunks.get()
+                if item is None:
+                    break
+                chunk, rows = item
+                try:
+                    for i, column in enumerate(chunk):
+                        files[i].write(memoryview(column)[:rows])
+                        lengths[i] += rows
+                finally:
+                    self.free_chunks.put(chunk)
+
+            for column_file in files:
+                column_file.close()
+            self.write_npz(lengths)
+        except Exception as e:
+            self.error = e
+        finally:
+            for column_file in files:
+                column_file.close()
+            # the column files are only needed until they are packed, or not at all once writing failed
+            for name, typecode, numpy_type in COLUMNS:
+                try:
+                    os.remove(self.column_path(name))
+                except FileNotFoundError:
+                    pass
+
+    """ Function to pack the column files into the .npz file
+        @param self
+        @param lengths number of rows written to each column file """
+    def write_npz(self, lengths):
+        with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_DEFLATED) as npz:
+            for (name, typecode, numpy_type), length in zip(COLUMNS, lengths):
+                with npz.open(name + '.npy', 'w', force_zip64 = True) as member, open(self.column_path(name), 'rb') as column_file:
+                    member.write(npy_header(numpy_type, length))
+                    while True:
+                        block = column_file.read(1024 * 1024)
+                        if not block:
+                            break
+                        member.write(block)
+
+""" Function to read a trajectory file without numpy
+    @param path of the .npz file
+    @return dictionary of array.array columns by name """
+def read_npz(path):
+    typecodes = {numpy_type: typecode for name, typecode, numpy_type in COLUMNS}
+    columns = {}
+    with zipfile.ZipFile(path) as npz:
+        for member in npz.namelist():
+            data = npz.read(member)
+            header_length = struct.unpack('<H', data[8:10])[0]
+            header = ast.literal_eval(data[10:10 + header_length].decode('latin1'))
+            column = array.array(typecodes[header['descr'][1:]])
+            column.frombytes(data[10 + header_length:])
+            if header['descr'][0] != BYTE_ORDER:
+                column.byteswap()
+            columns[os.path.splitext(member)[0]] = column
+    return columns
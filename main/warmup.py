@@ -0,0 +1,138 @@
+""" warmup.py
+        Does the expensive work on the assets that does not need the display
+        on background threads, so it can run while the subject selection menu
+        is open. Builds the stimuli catalogue, decodes and scales the stimuli
+        images (or checks the stimuli pack is still good and reads it into
+        memory) and parses the sound files.
+"""
+
+import os, time, threading, wave, struct, concurrent.futures
+
+# pip install pygame --user
+import pygame
+
+# stimuli catalogue, pack and scaling, main/stimuli.py
+import stimuli
+
+""" Function to decode and scale one stimuli image, run on a worker thread
+    @param path of the image
+    @param box (width, height) to fit the image in
+    @return pygame surface scaled to fit, not converted to the display format yet """
+def decode_stimuli(path, box):
+    return stimuli.fit_to_box(pygame.image.load(path), box)
+
+""" Function to parse a wav file into the format pygame.mixer needs
+    @param path of the wav file
+    @return ((frequency, size, channels), frames) where size is in the pygame.mixer.init format """
+def parse_wav(path):
+    with wave.open(path, 'rb') as wav:
+        # 8 bit wav samples are unsigned, wider samples are signed
+        size = 8 if wav.getsampwidth() == 1 else -8 * wav.getsampwidth()
+        return (wav.getframerate(), size, wav.getnchannels()), wav.readframes(wav.getnframes())
+
+""" Class for warming up the assets in the background """
+class AssetWarmup(threading.Thread):
+    """ AssetWarmup Constructor
+        @param self
+        @param stimuli_dir directory with the stimuli images
+        @param data_dir directory with the sound files
+        @param sound_files list of sound filenames to parse
+        @param box (width, height) to fit the stimuli images in
+        @param pack_file stimuli pack to check, or None to always decode the images """
+    def __init__(self, stimuli_dir, data_dir, sound_files, box, pack_file):
+        threading.Thread.__init__(self, daemon = True)
+
+        self.stimuli_dir = stimuli_dir
+        self.data_dir = data_dir
+        self.sound_files = sound_files
+        self.box = box
+        self.pack_file = pack_file
+
+        # results of the warm up
+        self.catalogue = None # StimuliCatalogue
+        self.images = {} # decoded and scaled stimuli images by filename, empty if the pack is used
+        self.sounds = {} # ((frequency, size, channels), frames) by sound filename
+        self.pack_ok = False # True if the stimuli pack matches the stimuli images
+        self.error = None # exception if the warm up failed
+
+        # progress of the warm up
+        self.step = 'Starting'
+        self.done = 0
+        self.total = 0
+        self.start_time = None
+        self.elapsed = None
+
+    """ Function run on the background thread
+        @param self """
+    def run(self):
+        self.start_time = time.perf_counter()
+
+        try:
+            # list and hash the stimuli images
+            self.step = 'Listing stimuli'
+            self.catalogue = stimuli.StimuliCatalogue(self.stimuli_dir)
+            self.total = len(self.catalogue) + len(self.sound_files)
+
+            # if the stimuli pack is still good, read it so its pages are in memory instead of decoding the images
+            if self.pack_file is not None and os.path.exists(self.pack_file):
+                self.step = 'Checking stimuli pack'
+                # a truncated or unreadable pack is left for the station to rebuild, the images are decoded instead
+                try:
+                    pack = stimuli.StimuliPack(self.pack_file)
+                    self.pack_ok = pack.matches(self.catalogue, self.box)
+                    pack.close()
+
+                    if self.pack_ok:
+                        self.step = 'Reading stimuli pack'
+                        with open(self.pack_file, 'rb') as pack_file:
+                            while pack_file.read(1 << 20):
+                                pass
+                except (ValueError, struct.error, OSError):
+                    self.pack_ok = False
+
+            if self.pack_ok:
+                self.done += len(self.catalogue)
+
+            # decode and scale every stimuli image on a pool of threads, pygame lets go of the GIL while it does this
+            else:
+                self.step = 'Loading stimuli'
+                with concurrent.futures.ThreadPoolExecutor(max_workers = os.cpu_count()) as pool:
+                    futures = {pool.submit(decode_stimuli, os.path.join(self.stimuli_dir, filename), self.box): filename for filename in self.catalogue.filenames}
+                    for future in concurrent.futures.as_completed(futures):
+                        self.images[futures[future]] = future.result()
+                        self.done += 1
+
+            # parse the sound files
+            self.step = 'Loading sounds'
+            for filename in self.sound_files:
+                self.sounds[filename] = parse_wav(os.path.join(self.data_dir, filename))
+                self.done += 1
+
+            self.step = 'Ready'
+
+        except (OSError, pygame.error, wave.Error) as e:
+            self.error = e
+            self.step = 'Failed'
+
+        self.elapsed = time.perf_counter() - self.start_time
+
+    """ Function to get a line of text describing the progress
+        @param self
+        @return progress text """
+    def progress(self):
+        if self.elapsed is not None:
+            if self.error is not None:
+                return 'Loading failed: {}'.format(self.error)
+            return 'Ready, loaded in {:.2f}s'.format(self.elapsed)
+        if self.total == 0:
+            return self.step
+        return '{} {}/{}'.format(self.step, self.done, self.total)
+
+    """ Function to get the mixer format all of the parsed sounds share
+        @param self
+        @return (frequency, size, channels) or None if the sounds differ """
+    def mixer_format(self):
+        formats = set(sound[0] for sound in self.sounds.values())
+        if len(formats) == 1:
+            return formats.pop()
+        return None
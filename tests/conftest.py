@@ -0,0 +1,13 @@
+""" conftest.py
+        Lets the tests import the modules in main/ by name, the way they
+        import each other, and keeps pygame off the real display and mixer.
+"""
+
+import os, sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+main_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main')
+sys.path.insert(0, os.path.abspath(main_dir))
@@ -0,0 +1,88 @@
+""" test_archive.py
+        Tests of moving past sessions of a results file into its archive and reading them back.
+"""
+
+import pytest
+
+import archive, results, resultswriter
+
+""" Function to make the text lines of a session
+    @param session number, used in the times of its lines
+    @param trials number of Chase trials in it
+    @return text of the lines """
+def session_lines(session, trials):
+    stamp = '01-{:02d}-2026 10:00:{:02d}.000'
+    lines = [resultswriter.text_line(stamp.format(session, 0), 'Session', ('TEST', session, session * 1000))]
+    for trial in range(1, trials + 1):
+        lines.append(resultswriter.text_line(stamp.format(session, trial), 'Chase', (trial, trial, 'Medium', 1.0, None, 1, 2, 3)))
+    return ''.join(lines)
+
+@pytest.fixture
+def results_file(tmp_path):
+    return str(tmp_path / 'TESTData.txt')
+
+def test_rotate_archives_every_session_and_empties_file(results_file):
+    first, second = session_lines(1, 3), session_lines(2, 2)
+    with open(results_file, 'w') as text_file:
+        text_file.write(first + second)
+
+    assert archive.rotate(results_file, fsync = False) == 2
+    with open(results_file) as text_file:
+        assert text_file.read() == ''
+
+    segments = archive.read_index(results_file)
+    assert [(segment.session, segment.lines) for segment in segments] == [(1, 4), (2, 3)]
+    assert segments[0].started == '01-01-2026 10:00:00.000' and segments[0].ended == '01-01-2026 10:00:03.000'
+    assert archive.archived_size(results_file) == len(first + second)
+    assert ''.join(archive.read_session(results_file, 2)) == second
+
+def test_sessions_read_the_same_after_rotating(results_file):
+    with open(results_file, 'w') as text_file:
+        text_file.write(session_lines(1, 3) + session_lines(2, 2))
+    before = list(results.read_records(results_file))
+
+    archive.rotate(results_file, fsync = False)
+    assert list(results.read_records(results_file)) == before
+    assert [record.session for record in before] == [1, 1, 1, 1, 2, 2, 2]
+
+def test_rotate_continues_the_history(results_file):
+    with open(results_file, 'w') as text_file:
+        text_file.write(session_lines(1, 3))
+    archive.rotate(results_file, fsync = False)
+
+    third = session_lines(2, 1)
+    with open(results_file, 'a') as text_file:
+        text_file.write(third)
+    assert ''.join(archive.read_session(results_file, 2)) == third # still in the results file
+    assert archive.read_session(results_file, 3) == []
+
+    assert archive.rotate(results_file, fsync = False) == 1
+    last = archive.last_segment(results_file)
+    assert (last.session, last.data_offset) == (2, len(session_lines(1, 3)))
+    assert ''.join(archive.iter_lines(results_file)) == session_lines(1, 3) + third
+
+def test_rotate_after_crash_does_not_archive_twice(results_file):
+    lines = session_lines(1, 2)
+    with open(results_file, 'w') as text_file:
+        text_file.write(lines)
+    archive.rotate(results_file, fsync = False)
+
+    # the archive and index were written but the results file was not emptied
+    with open(results_file, 'w') as text_file:
+        text_file.write(lines)
+    assert archive.rotate(results_file, fsync = False) == 0
+    assert len(archive.read_index(results_file)) == 1
+    assert ''.join(archive.iter_lines(results_file)) == lines
+
+def test_rotate_only_archives_whole_lines(results_file):
+    lines = session_lines(1, 2)
+    with open(results_file, 'w') as text_file:
+        text_file.write(lines + '01-01-2026 10:00')
+    assert archive.rotate(results_file, fsync = False) == 1
+    assert ''.join(archive.read_session(results_file, 1)) == lines
+
+def test_rotate_nothing(results_file):
+    assert archive.rotate(results_file, fsync = False) == 0
+    open(results_file, 'w').close()
+    assert archive.rotate(results_file, fsync = False) == 0
+    assert archive.read_index(results_file) == [] and archive.last_segment(results_file) is None
@@ -0,0 +1,66 @@
+""" test_framestats.py
+        Tests of counting late and dropped frames per trial.
+"""
+
+import pytest
+
+import framestats
+
+FRAME = 1 / 60
+
+""" Class for a clock that only moves when told to """
+class StepClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    step_clock = StepClock()
+    monkeypatch.setattr(framestats.time, 'perf_counter', step_clock)
+    return step_clock
+
+""" Function to run a frame of a given length
+    @param stats framestats.FrameStats
+    @param clock StepClock it is timed with
+    @param frames frame times the frame takes
+    @param wait phase the frame waits in, or None """
+def run_frame(stats, clock, frames = 1, wait = None):
+    stats.begin_frame('MTS', wait)
+    clock.now += frames * FRAME
+
+def test_wait_frames_are_not_frames_of_the_trial(clock):
+    stats = framestats.FrameStats(60)
+
+    run_frame(stats, clock)
+    run_frame(stats, clock, 4) # late, 3 dropped
+    run_frame(stats, clock)
+    stats.end_trial('MTS', 1)
+
+    # a feedback with a long frame, then the next trial
+    run_frame(stats, clock, 1, 'Feedback')
+    run_frame(stats, clock, 10, 'Feedback')
+    run_frame(stats, clock)
+    run_frame(stats, clock, 3)
+    stats.end_trial('MTS', 2)
+    run_frame(stats, clock, 1, 'ITI')
+
+    assert stats.trials == [('MTS', 1, 3, 1, 3), ('MTS', 2, 2, 1, 2)]
+    histogram, late, dropped = stats.waits[('MTS', 'Feedback')]
+    assert (histogram.count, late, dropped) == (2, 1, 9)
+    assert stats.task_histograms('MTS')['frame'].count == 5
+
+def test_write_keeps_last_trial(clock, tmp_path):
+    stats = framestats.FrameStats(60)
+    run_frame(stats, clock)
+    run_frame(stats, clock, 1, 'Delay')
+    run_frame(stats, clock)
+    stats.end_trial('MTS', 1)
+    stats.write(str(tmp_path / 'TESTFrameStats.txt'), 'TEST')
+
+    assert stats.trials == [('MTS', 1, 1, 0, 0)]
+    text = (tmp_path / 'TESTFrameStats.txt').read_text()
+    assert '  MTS Delay waits  frames 1' in text
+    assert '    MTS  1  1  0  0' in text
@@ -0,0 +1,87 @@
+""" test_parameters.py
+        Tests of reading, checking and writing back the parameters files.
+"""
+
+import os
+
+import pytest
+
+import parameters
+
+defaults_file = os.path.join(os.path.dirname(parameters.__file__), 'defaults.txt')
+
+""" Function to read main/defaults.txt
+    @return text of the file """
+def defaults_text():
+    with open(defaults_file, 'r') as text_file:
+        return text_file.read()
+
+def test_defaults_validate():
+    values = parameters.load(defaults_file)
+    assert values['general'] == {'TASKORDER': 'Series', 'RENDER_MODE': 'Full'}
+    assert values['Side']['START_LEVEL'] == 4
+    assert values['DMTS']['DELAY'] == 3.0
+    assert values['Chase']['CIRCLE_SIZE'] == 'Medium'
+    assert parameters.active_tasks(values) == list(parameters.TASKS)
+
+def test_round_trip_keeps_text():
+    text = defaults_text()
+    assert parameters.parse(text).text() == text
+
+def test_round_trip_of_changed_values(tmp_path):
+    parameter_file = parameters.parse(defaults_text())
+    parameter_file.set('Side Start Level', 2)
+    parameter_file.set('chase circle size [small, medium, large]', 'Large')
+    parameter_file.write(str(tmp_path / 'parameters.txt'))
+
+    values = parameters.load(str(tmp_path / 'parameters.txt'))
+    assert values['Side']['START_LEVEL'] == 2
+    assert values['Chase']['CIRCLE_SIZE'] == 'Large'
+
+    # only the changed lines differ
+    changed = [pair for pair in zip(defaults_text().splitlines(), parameter_file.text().splitlines()) if pair[0] != pair[1]]
+    assert changed == [('4', '2'), ('Medium', 'Large')]
+
+def test_last_value_without_newline():
+    parameter_file = parameters.parse('Task Order [Series, Random]\nSeries\nRender Mode\nFull')
+    assert parameter_file.get('Render Mode') == 'Full'
+    parameter_file.set('Render Mode', 'Dirty')
+    assert parameters.parse(parameter_file.text()).get('Render Mode') == 'Dirty'
+
+def test_lookup_ignores_case_and_choices():
+    parameter_file = parameters.parse(defaults_text())
+    assert parameter_file.get('TASK ORDER') == 'Series'
+    assert parameter_file.has('Side Task Active')
+    assert not parameter_file.has('Side Task')
+    assert parameter_file.get('Missing', 'x') == 'x'
+
+def test_validate_lists_every_problem():
+    parameter_file = parameters.parse(defaults_text())
+    parameter_file.set('Side Start Level', 7)
+    parameter_file.set('Chase Circle Size', 'Huge')
+    parameter_file.set('MTS Task Trials for Criterion', 'three')
+    parameter_file.set('DMTS Task Titration', 'Maybe')
+    with pytest.raises(parameters.ParameterError) as error:
+        parameters.validate(parameter_file)
+    message = str(error.value)
+    assert '"Side Start Level" is "7", has to be from 1 to 6' in message
+    assert '"Chase Circle Size" is "Huge"' in message
+    assert '"MTS Task Trials for Criterion" is "three"' in message
+    assert '"DMTS Task Titration" is "Maybe", has to be Yes or No' in message
+
+def test_inactive_task_needs_only_active():
+    text = defaults_text().replace('Side Task Active [Yes, No]\nYes', 'Side Task Active [Yes, No]\nNo').replace('Side Start Level\n4', 'Side Start Level\nnot a number')
+    values = parameters.validate(parameters.parse(text))
+    assert values['Side'] == {'ACTIVE': False}
+    assert 'Side' not in parameters.active_tasks(values)
+
+def test_missing_parameters():
+    text = defaults_text().replace('Render Mode [Full, Dirty]\nFull\n', '').replace('Side Task Timeout Time\n5\n', '')
+    with pytest.raises(parameters.ParameterError) as error:
+        parameters.validate(parameters.parse(text))
+    # Render Mode has a default, the timeout does not
+    assert str(error.value) == '"Side Task Timeout Time" parameter does not exist'
+
+def test_load_missing_file(tmp_path):
+    with pytest.raises(parameters.ParameterError):
+        parameters.load(str(tmp_path / 'parameters.txt'))
@@ -0,0 +1,89 @@
+""" test_results.py
+        Tests of parsing the results files.
+"""
+
+import datetime
+
+import pytest
+
+import results
+
+# lines as older versions of game.py wrote them: no Session line or trial timing fields, MTS trial numbers as floats
+OLD_LINES = (
+    '03-01-2026 10:00:00  Side  1  1  4  TRB  2.5\n'
+    '03-01-2026 10:00:05  MTS  2.0  1.0  60.0  CAT  Left  DOG  1.25  Correct\n'
+    '03-01-2026 11:00:00  Side  1  1  4  L  3.0\n'
+)
+
+NEW_LINES = (
+    '03-02-2026 10:00:00.000  Session  A1  100  200\n'
+    '03-02-2026 10:00:01.500  Chase  1  1  Medium  1.500  NA  10  20  30\n'
+    '03-02-2026 10:00:03.250  LS  2  1  1  50.0  CAT  Right  DOG  0.750  Incorrect  0.125  40  50  60\n'
+)
+
+""" Function to write a results file
+    @param tmp_path directory to write it in
+    @param name of the file
+    @param text of the file
+    @return path of the file """
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_read_old_lines(tmp_path):
+    records = list(results.read_records(write(tmp_path, 'A1Data.txt', OLD_LINES)))
+    side, mts, next_side = records
+    assert (side.subject, side.session, side.task, side.walls, side.latency, side.first_move) == ('A1', 1, 'Side', 'TRB', 2.5, None)
+    assert (mts.total_trials, mts.trials, mts.result) == (2, 1, 'Correct')
+    assert mts.time == datetime.datetime(2026, 3, 1, 10, 0, 5)
+
+    # a trial number that does not go up starts a new session
+    assert next_side.session == 2
+
+def test_read_new_lines(tmp_path):
+    session, chase, ls = results.read_records(write(tmp_path, 'A1Data.txt', NEW_LINES))
+    assert (session.perf_counter_ns, session.time_ns) == (100, 200)
+    assert (chase.session, chase.latency, chase.first_move, chase.feedback_ns) == (1, 1.5, None, 30)
+    assert (ls.problem, ls.first_move, ls.onset_ns) == (1, 0.125, 40)
+    assert chase.time == datetime.datetime(2026, 3, 2, 10, 0, 1, 500000)
+
+def test_columns_with_na_and_floats_after_plain_values(tmp_path):
+    text = (
+        '03-02-2026 10:00:00.000  Session  A1  100  1792312093785440872\n'
+        '03-02-2026 10:00:01.500  MTS  1  1  60.0  CAT  Left  DOG  1.25  Correct  0.100  10  20  30\n'
+        '03-02-2026 10:00:02.500  MTS  2.0  2.0  60.0  CAT  Left  DOG  NA  Correct  NA  40  NA  60\n'
+        '03-02-2026 10:00:03.500  MTS  3  3  60.0  CAT  Left  DOG  1.50  Correct  0.200  70  80  90\n'
+        '03-02-2026 10:00:04.000  Session  A1  200  1792312093785440873\n'
+    )
+    session, first, legacy, plain, next_session = results.read_records(write(tmp_path, 'A1Data.txt', text))
+    assert (first.total_trials, first.latency, first.response_ns) == (1, 1.25, 20)
+    assert (legacy.total_trials, legacy.trials, legacy.latency, legacy.first_move, legacy.response_ns) == (2, 2, None, None, None)
+    assert (plain.total_trials, plain.latency, plain.first_move, plain.response_ns) == (3, 1.5, 0.2, 80)
+
+    # nanosecond times stay exact
+    assert (session.time_ns, next_session.time_ns) == (1792312093785440872, 1792312093785440873)
+
+def test_filter_tasks(tmp_path):
+    records = list(results.read_records(write(tmp_path, 'A1Data.txt', OLD_LINES + NEW_LINES), tasks = ['Side']))
+    assert [(record.task, record.session) for record in records] == [('Side', 1), ('Side', 2)]
+
+def test_bad_lines(tmp_path):
+    path = write(tmp_path, 'A1Data.txt', NEW_LINES + '03-02-2026 10:00:04.000  Chase  3  2\n03-02-2026 10:00:05.000  Nope  1\n')
+    with pytest.raises(results.ParseError, match = 'line 4'):
+        list(results.read_records(path))
+    assert len(list(results.read_records(path, errors = 'skip'))) == 3
+
+def test_json_lines(tmp_path):
+    path = write(tmp_path, 'A1Data.jsonl',
+                 '{"time": "03-02-2026 10:00:00.000", "task": "Session", "subject": "A1", "perf_counter_ns": 1, "time_ns": 2}\n'
+                 '{"time": "03-02-2026 10:00:01.500", "task": "Chase", "total_trials": 1, "trials": 1, "circle_size": "Small", "latency": 1.5}\n')
+    session, chase = results.read_records(path)
+    assert (chase.subject, chase.session, chase.circle_size, chase.onset_ns) == ('A1', 1, 'Small', None)
+
+def test_to_columns(tmp_path):
+    records = results.read_records(write(tmp_path, 'A1Data.txt', NEW_LINES + NEW_LINES), tasks = ['Chase'])
+    columns = results.to_columns(records)
+    assert list(columns['session']) == [1, 2]
+    assert columns['circle_size'] == ['Medium', 'Medium']
+    assert all(value != value for value in columns['first_move']) # NaN for NA
@@ -0,0 +1,88 @@
+""" test_resultswriter.py
+        Tests of writing the results files and repairing a cut off last line.
+"""
+
+import json
+
+import pytest
+
+import resultswriter
+
+CHASE = (3, 2, 'Medium', 1.23456, 0.5, 100, 200, 300)
+
+def test_repair_removes_cut_off_last_line(tmp_path):
+    path = tmp_path / 'TESTData.txt'
+    path.write_bytes(b'line one\nline two\nline th')
+    assert resultswriter.repair(str(path)) == len(b'line th')
+    assert path.read_bytes() == b'line one\nline two\n'
+
+def test_repair_keeps_whole_lines(tmp_path):
+    path = tmp_path / 'TESTData.txt'
+    path.write_bytes(b'line one\nline two\n')
+    assert resultswriter.repair(str(path)) == 0
+    assert path.read_bytes() == b'line one\nline two\n'
+
+    path.write_bytes(b'')
+    assert resultswriter.repair(str(path)) == 0
+    assert resultswriter.repair(str(tmp_path / 'missing.txt')) == 0
+
+@pytest.mark.parametrize('torn', [4095, 4096, 4097, 10000])
+def test_repair_cut_off_line_longer_than_a_block(tmp_path, torn):
+    path = tmp_path / 'TESTData.txt'
+    path.write_bytes(b'first\n' + b'x' * torn)
+    assert resultswriter.repair(str(path)) == torn
+    assert path.read_bytes() == b'first\n'
+
+def test_repair_file_without_a_whole_line(tmp_path):
+    path = tmp_path / 'TESTData.txt'
+    path.write_bytes(b'x' * 5000)
+    assert resultswriter.repair(str(path)) == 5000
+    assert path.read_bytes() == b''
+
+def test_writer_writes_text_and_json_lines(tmp_path):
+    writer = resultswriter.ResultsWriter(str(tmp_path), 'TEST', fsync = False)
+    writer.write('01-02-2026 10:00:00.000', 'Chase', CHASE)
+    writer.write('01-02-2026 10:00:01.000', 'Chase', CHASE[:4] + (None,) + CHASE[5:])
+    writer.close()
+    assert writer.error is None and writer.written == 2
+
+    lines = (tmp_path / 'TESTData.txt').read_text().splitlines()
+    assert lines[0] == '01-02-2026 10:00:00.000  Chase  3  2  Medium  1.235  0.500  100  200  300'
+    assert lines[1].split('  ')[6] == 'NA'
+
+    record = json.loads((tmp_path / 'TESTData.jsonl').read_text().splitlines()[0])
+    assert record['task'] == 'Chase' and record['latency'] == 1.23456 and record['feedback_ns'] == 300
+
+def test_writer_repairs_before_appending(tmp_path):
+    (tmp_path / 'TESTData.txt').write_text('01-02-2026 09:00:00.000  Chase  1  1  Medium  1.000  NA  1  2  3\n01-02-2026 09:00')
+    writer = resultswriter.ResultsWriter(str(tmp_path), 'TEST', fsync = False)
+    writer.write('01-02-2026 10:00:00.000', 'Chase', CHASE)
+    writer.close()
+
+    lines = (tmp_path / 'TESTData.txt').read_text().splitlines()
+    assert len(lines) == 2
+    assert lines[1].startswith('01-02-2026 10:00:00.000  Chase')
+
+def test_writer_rejects_wrong_number_of_fields(tmp_path):
+    writer = resultswriter.ResultsWriter(str(tmp_path), 'TEST', fsync = False)
+    with pytest.raises(ValueError):
+        writer.write('01-02-2026 10:00:00.000', 'Chase', CHASE[:3])
+    writer.close()
+
+""" Class for a results store that fails like a full disk """
+class FailingStore:
+    def write(self, batch):
+        raise OSError('No space left on device')
+
+    def close(self):
+        pass
+
+def test_writer_raises_once_its_thread_failed(tmp_path):
+    writer = resultswriter.ResultsWriter(str(tmp_path), 'TEST', fsync = False, store = FailingStore())
+    writer.write('01-02-2026 10:00:00.000', 'Chase', CHASE)
+    writer.join(5)
+    assert isinstance(writer.error, OSError)
+
+    with pytest.raises(resultswriter.WriterError):
+        writer.write('01-02-2026 10:00:01.000', 'Chase', CHASE)
+    writer.close()
@@ -0,0 +1,59 @@
+""" test_sessionqueue.py
+        Tests of reading and checking a queue of sessions.
+"""
+
+import os, shutil
+
+import pytest
+
+import sessionqueue
+
+defaults_file = os.path.join(os.path.dirname(sessionqueue.__file__), 'defaults.txt')
+
+""" Function to write a queue file next to a copy of main/defaults.txt
+    @param directory to write them in
+    @param text of the queue file
+    @return path of the queue file """
+def write_queue(directory, text):
+    shutil.copy(defaults_file, str(directory / 'defaults.txt'))
+    (directory / 'queue.txt').write_text(text)
+    return str(directory / 'queue.txt')
+
+def test_load_queue(tmp_path):
+    os.mkdir(str(tmp_path / 'other'))
+    shutil.copy(defaults_file, str(tmp_path / 'other' / 'short.txt'))
+    path = write_queue(tmp_path, '# subject  parameters file\nA1  defaults.txt\n\n  B2   other/short.txt \nA1 defaults.txt\n')
+
+    sessions = sessionqueue.load(path, ['A1', 'B2'])
+    assert [session.subject for session in sessions] == ['A1', 'B2', 'A1']
+    assert sessions[1].parameters_file == str(tmp_path / 'other' / 'short.txt')
+    assert sessions[0].values['Side']['START_LEVEL'] == 4
+    with open(defaults_file) as text_file:
+        assert sessions[0].text == text_file.read()
+
+    # every parameters file is only read once
+    assert sessions[2].values is sessions[0].values
+
+def test_load_lists_every_problem(tmp_path):
+    (tmp_path / 'bad.txt').write_text('Task Order\nSideways\n')
+    path = write_queue(tmp_path, 'A1  defaults.txt\nC3  defaults.txt\nB2\nA1  missing.txt\nA1  bad.txt\n')
+
+    with pytest.raises(sessionqueue.QueueError) as error:
+        sessionqueue.load(path, ['A1', 'B2'])
+    message = str(error.value)
+    assert 'line 2: "C3" is not an animal ID' in message
+    assert 'line 3: "B2" has no parameters file' in message
+    assert 'line 4: There must be a parameters file named' in message
+    assert 'line 5: ' in message and '"Task Order" is "Sideways"' in message
+    assert 'line 1' not in message
+
+def test_any_subject_without_ids(tmp_path):
+    path = write_queue(tmp_path, 'ANY  defaults.txt\n')
+    assert sessionqueue.load(path)[0].subject == 'ANY'
+
+def test_empty_or_missing_queue(tmp_path):
+    path = write_queue(tmp_path, '# nothing to run\n')
+    with pytest.raises(sessionqueue.QueueError, match = 'no sessions in the queue'):
+        sessionqueue.load(path)
+    with pytest.raises(sessionqueue.QueueError, match = 'There must be a queue file'):
+        sessionqueue.load(str(tmp_path / 'missing.txt'))
@@ -0,0 +1,121 @@
+""" test_sprites.py
+        Tests of the Pointer moving from the input device samples.
+"""
+
+import pytest, pygame
+
+import sprites
+
+WIDTH, HEIGHT = 1920, 1080
+
+""" Class for an input device that gives the samples it was made with once """
+class SampleInput:
+    def __init__(self, samples = ()):
+        self.samples = list(samples)
+
+    def read(self):
+        samples, self.samples = self.samples, []
+        return samples
+
+""" Function to make a Pointer at a position
+    @param x position
+    @param y position
+    @param samples (time, horizontal axis, vertical axis) the input device gives
+    @return sprites.Pointer """
+def make_pointer(x = 960, y = 540, samples = ()):
+    pointer = sprites.Pointer(24, SampleInput(samples))
+    pointer.reset(x, y)
+    return pointer
+
+def test_horizontal_move_keeps_y():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer()
+    pointer.axes = (1, 0)
+    pointer.move_to(pointer.time + 0.1, background)
+    assert pointer.x == pytest.approx(960 + sprites.POINTER_SPEED * 0.1)
+    assert pointer.y == 540
+
+def test_vertical_move_keeps_x():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer()
+    pointer.axes = (0, 1)
+    pointer.move_to(pointer.time + 0.1, background)
+    assert pointer.x == 960
+    assert pointer.y == pytest.approx(540 + sprites.POINTER_SPEED * 0.1)
+
+def test_move_stops_at_border():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer(x = 10)
+    pointer.axes = (-1, 0)
+    pointer.move_to(pointer.time + 1, background)
+    assert (pointer.x, pointer.y) == (0, 540)
+
+    # pushing into the border does not move it, the other axis still does
+    pointer.axes = (-1, -1)
+    pointer.move_to(pointer.time + 0.1, background)
+    assert pointer.x == 0
+    assert pointer.y == pytest.approx(540 - sprites.POINTER_SPEED * 0.1)
+
+def test_diagonal_move_slides_along_border():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    max_x = WIDTH - (24 + 1)
+    pointer = make_pointer(x = max_x - 6)
+    pointer.axes = (1, 1)
+    pointer.move_to(pointer.time + 0.1, background)
+    assert pointer.x == max_x
+    assert pointer.y == pytest.approx(540 + sprites.POINTER_SPEED * 0.1)
+
+def test_first_move_from_centre():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer()
+    start = pointer.time
+    pointer.start_trial(start)
+    pointer.input_device.samples = [(start + 0.002, 0.05, 0), (start + 0.004, 0.5, 0)]
+    pointer.update(background)
+    assert pointer.first_move_latency() == pytest.approx(0.004)
+
+def test_first_move_of_a_stick_held_at_the_onset():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer()
+    pointer.axes = (1, 0)
+    start = pointer.time
+    pointer.start_trial(start)
+    assert pointer.first_move_latency() == 0
+
+    # let go and moved again, the first movement stays the one at the onset
+    pointer.input_device.samples = [(start + 0.002, 0, 0), (start + 0.004, 0, -0.5)]
+    pointer.update(background)
+    assert pointer.first_move_latency() == 0
+
+def test_first_move_keeps_the_movement_of_the_first_frame():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer()
+    start = pointer.time
+
+    # the stick moved and came back during the update of the frame that showed the stimulus
+    pointer.input_device.samples = [(start + 0.001, 0.5, 0), (start + 0.003, 0, 0)]
+    pointer.update(background)
+    pointer.start_trial(start + 0.005)
+    assert pointer.first_move_latency() == 0
+
+def test_no_first_move_while_centred():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer()
+    start = pointer.time
+    pointer.start_trial(start)
+    pointer.input_device.samples = [(start + 0.002, 0.05, -0.05)]
+    pointer.update(background)
+    assert pointer.first_move_latency() is None
+
+def test_skip_input_keeps_only_where_the_stick_is():
+    background = pygame.Surface((WIDTH, HEIGHT))
+    pointer = make_pointer()
+    pointer.input_device.samples = [(pointer.time + 0.5, 1, 0), (pointer.time + 1, 0.05, -0.5)]
+    pointer.skip_input()
+    assert (pointer.x, pointer.y) == (960, 540)
+    assert pointer.axes == (0, -0.5)
+
+    # the next update only moves for the time since the skip
+    pointer.update(background)
+    assert pointer.x == 960
+    assert 540 - pointer.y < sprites.POINTER_SPEED * 0.1
@@ -0,0 +1,158 @@
+""" test_stimuli.py
+        Tests of the stimuli surface cache, catalogue and pack.
+"""
+
+import os, random, itertools
+
+import pygame
+
+import stimuli
+
+""" Function to make a surface that takes up a known number of bytes
+    @param width in pixels, 4 bytes each
+    @return 32 bit pygame surface of width x 1 """
+def make_surface(width):
+    return pygame.Surface((width, 1), 0, 32)
+
+""" Function to make a cache that loads surfaces of the width in the filename, counting the loads
+    @param budget bytes the cache can keep
+    @return (cache, list of loaded filenames) """
+def make_cache(budget):
+    loaded = []
+    def loader(filename, box):
+        loaded.append(filename)
+        return make_surface(int(filename))
+    return stimuli.StimuliCache(loader, budget), loaded
+
+def test_cache_hit_does_not_reload():
+    cache, loaded = make_cache(1000)
+    first = cache.get('10')
+    assert cache.get('10') is first
+    assert loaded == ['10']
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_cache_evicts_least_recently_used_over_budget():
+    cache, loaded = make_cache(100) # room for two surfaces of 10 pixels (40 bytes), not three
+    cache.get('10')
+    cache.get('11')
+    cache.get('10') # '11' is now the least recently used
+    cache.get('12')
+    assert cache.contains('10') and cache.contains('12')
+    assert not cache.contains('11')
+    assert cache.size == 40 + 48 <= cache.budget
+
+    cache.get('11')
+    assert loaded == ['10', '11', '12', '11']
+    assert not cache.contains('10')
+
+def test_cache_keys_on_box():
+    cache, loaded = make_cache(1000)
+    cache.get('10', (100, 100))
+    cache.get('10', (200, 100))
+    assert loaded == ['10', '10']
+
+def test_cache_does_not_keep_surface_over_budget():
+    cache, loaded = make_cache(100)
+    cache.get('10')
+    cache.get('30') # 120 bytes
+    assert not cache.contains('30')
+    assert cache.contains('10')
+    assert cache.size == 40
+
+def test_cache_put_replaces_and_clear_empties():
+    cache, loaded = make_cache(1000)
+    cache.put('a', stimuli.STIMULI_BOX, make_surface(10))
+    cache.put('a', stimuli.STIMULI_BOX, make_surface(20))
+    assert cache.size == 80
+    cache.clear()
+    assert cache.size == 0 and not cache.contains('a')
+
+""" Function to make a directory of stimuli images
+    @param directory to write them in
+    @param names of the png files, without .png
+    @return directory """
+def make_stimuli(directory, names):
+    for i, name in enumerate(names):
+        surface = pygame.Surface((10 + i, 20), 0, 32)
+        surface.fill((i * 20, 0, 0))
+        pygame.image.save(surface, os.path.join(str(directory), name + '.png'))
+    return str(directory)
+
+def test_catalogue_lists_only_images(tmp_path):
+    directory = make_stimuli(tmp_path, ['b', 'a', 'c'])
+    (tmp_path / 'notes.txt').write_text('not an image')
+    os.mkdir(os.path.join(directory, 'sub'))
+
+    catalogue = stimuli.StimuliCatalogue(directory)
+    assert catalogue.filenames == ['a.png', 'b.png', 'c.png']
+    assert len(catalogue) == 3 and 'notes.txt' not in catalogue
+    assert catalogue.info['b.png'][1:4] == (10, 20, 'PNG')
+
+def test_catalogue_refresh_finds_changes(tmp_path):
+    directory = make_stimuli(tmp_path, ['a', 'b'])
+    catalogue = stimuli.StimuliCatalogue(directory)
+    assert not catalogue.refresh()
+
+    make_stimuli(tmp_path, ['a', 'b', 'c'])
+    os.remove(os.path.join(directory, 'a.png'))
+    assert catalogue.refresh()
+    assert catalogue.filenames == ['b.png', 'c.png']
+    assert catalogue.positions == {'b.png': 0, 'c.png': 1}
+
+def test_catalogue_sampling_never_repeats_and_reaches_every_stimuli(tmp_path):
+    catalogue = stimuli.StimuliCatalogue(make_stimuli(tmp_path, ['a', 'b', 'c', 'd']))
+    random.seed(1)
+
+    pairs = set()
+    others = set()
+    for _ in range(500):
+        first, second = catalogue.sample_pair()
+        assert first != second
+        pairs.add((first, second))
+
+        other = catalogue.choice_other('b.png')
+        assert other != 'b.png'
+        others.add(other)
+        assert catalogue.choice() in catalogue
+
+    assert pairs == set(itertools.permutations(catalogue.filenames, 2))
+    assert others == {'a.png', 'c.png', 'd.png'}
+
+def test_truncated_pack_is_rebuilt_and_skipped_by_the_warmup(tmp_path):
+    import warmup
+    pygame.display.init()
+    display = pygame.display.set_mode((1, 1))
+    directory = make_stimuli(tmp_path, ['a', 'b'])
+    catalogue = stimuli.StimuliCatalogue(directory)
+    path = str(tmp_path / 'stimuli.pack')
+    stimuli.build_pack(path, catalogue, (40, 40), display)
+    size = os.path.getsize(path)
+
+    # cut the pack off in its index and in its pixels
+    for length in (stimuli.PACK_HEADER.size + 4, size - 1):
+        with open(path, 'r+b') as pack_file:
+            pack_file.truncate(length)
+
+        assets = warmup.AssetWarmup(directory, str(tmp_path), [], (40, 40), path)
+        assets.run()
+        assert assets.error is None and not assets.pack_ok
+        assert sorted(assets.images) == ['a.png', 'b.png']
+
+        pack = stimuli.load_pack(path, catalogue, (40, 40), display)
+        assert os.path.getsize(path) == size
+        pack.close()
+
+def test_prepared_trials_repeat_with_the_same_generator(tmp_path):
+    import sprites
+    catalogue = stimuli.StimuliCatalogue(make_stimuli(tmp_path, ['a', 'b', 'c', 'd', 'e']))
+    cache = stimuli.StimuliCache(lambda filename, box: make_surface(10), 1000)
+    background = pygame.Surface((1920, 1080))
+
+    def draws(seed):
+        rng = random.Random(seed)
+        trials = [sprites.prepare_stimuli_trial('MTS', catalogue, cache, background, rng) for _ in range(20)]
+        trials.append(sprites.prepare_stimuli_trial('LS', catalogue, cache, background, rng, 'c.png'))
+        return [(trial.correct_stimuli, trial.wrong_stimuli, trial.stimuli_correct_str) for trial in trials]
+
+    assert draws(7) == draws(7)
+    assert draws(7) != draws(8)
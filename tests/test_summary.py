@@ -0,0 +1,35 @@
+""" test_summary.py
+        Tests of the summary of a subject kept as its trials are written.
+"""
+
+import summary, resultswriter
+
+STAMP = '01-01-2026 10:00:00.000'
+
+def test_only_tasks_with_a_result_count_correct_trials(tmp_path):
+    subject_summary = summary.SubjectSummary(str(tmp_path), 'TEST')
+    subject_summary.add(STAMP, 'Side', (1, 1, 4, 'TB', 1.0, 0.2, 1, 2, 3))
+    subject_summary.add(STAMP, 'MTS', (2, 1, 0.0, 'A', 'Left', 'B', 1.0, 'Correct', 0.2, 1, 2, 3))
+    subject_summary.add(STAMP, 'MTS', (3, 2, 0.0, 'A', 'Left', 'B', 1.0, 'Incorrect', 0.2, 1, 2, 3))
+
+    side = subject_summary.data['tasks']['Side']
+    assert side['trials'] == 1
+    assert 'correct' not in side and 'recent' not in side
+    assert subject_summary.rolling_accuracy('Side') is None
+    assert subject_summary.last('Side', 'level') == 4
+
+    mts = subject_summary.data['tasks']['MTS']
+    assert (mts['trials'], mts['correct'], mts['recent']) == (2, 1, '10')
+    assert subject_summary.rolling_accuracy('MTS') == 0.5
+
+def test_rebuilt_summary_matches_the_one_kept(tmp_path):
+    subject_summary = summary.SubjectSummary(str(tmp_path), 'TEST')
+    with open(str(tmp_path / 'TESTData.txt'), 'w') as text_file:
+        for task, values in (('Session', ('TEST', 1, 2)), ('Side', (1, 1, 4, 'TB', 1.0, 0.2, 1, 2, 3)), ('LS', (2, 1, 1, 0.0, 'A', 'Left', 'B', 1.0, 'Correct', None, 1, 2, 3))):
+            text_file.write(resultswriter.text_line(STAMP, task, values))
+            subject_summary.add(STAMP, task, values)
+
+    rebuilt = summary.SubjectSummary(str(tmp_path), 'TEST')
+    rebuilt.rebuild()
+    assert rebuilt.data['tasks'] == subject_summary.data['tasks']
+    assert 'correct' not in rebuilt.data['tasks']['Side']
@@ -0,0 +1,69 @@
+""" test_tasks.py
+        Tests of the task registry and adding a task from a plugin.
+"""
+
+import os, sys
+
+import pytest
+
+import tasks, parameters, resultswriter, results, game
+
+PLUGIN = '''
+import parameters, tasks
+
+@tasks.register
+class Reach(tasks.Task):
+    __slots__ = ('reached',)
+    name = 'Reach'
+
+tasks.add_task('Reach', [parameters.parameter('Reach Task Active', 'Reach', 'ACTIVE', 'bool', default = 'No'),
+                         parameters.parameter('Reach Task Timeout Time', 'Reach', 'TIMEOUT', 'float', default = '1')],
+               ('total_trials', 'trials', 'latency'))
+'''
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    # put back everything a plugin adds to once the test is over
+    monkeypatch.setattr(parameters, 'SCHEMA', parameters.SCHEMA)
+    monkeypatch.setattr(parameters, 'TASKS', parameters.TASKS)
+    monkeypatch.setattr(tasks, 'REGISTRY', dict(tasks.REGISTRY))
+    monkeypatch.setattr(resultswriter, 'SCHEMAS', dict(resultswriter.SCHEMAS))
+    monkeypatch.setattr(results, 'RECORD_TYPES', dict(results.RECORD_TYPES))
+
+    (tmp_path / 'reachplugin.py').write_text(PLUGIN)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield 'reachplugin'
+    sys.modules.pop('reachplugin', None)
+
+def test_registry_has_every_task():
+    assert tuple(tasks.REGISTRY) == parameters.TASKS
+
+def test_tasks_are_slotted():
+    for task_class in tasks.REGISTRY.values():
+        for cls in task_class.__mro__[:-1]:
+            assert '__slots__' in vars(cls), cls
+    assert '__slots__' in vars(tasks.TaskContext)
+
+def test_plugin_task(plugin):
+    game.load_task_plugins([plugin])
+    assert 'Reach' in tasks.REGISTRY
+    assert parameters.TASKS[-1] == 'Reach'
+    assert results.RECORD_TYPES['Reach']._fields[-7:] == ('total_trials', 'trials', 'latency') + resultswriter.TRIAL_FIELDS
+
+    # older files without the task still load, it is not active
+    values = parameters.load(os.path.join(game.main_dir, 'defaults.txt'))
+    assert values['Reach'] == {'ACTIVE': False}
+
+    text = 'Reach Task Active\nYes\nReach Task Timeout Time\n2.5\n'
+    with open(os.path.join(game.main_dir, 'defaults.txt')) as text_file:
+        values = parameters.validate(parameters.parse(text_file.read() + '\n' + text))
+    assert values['Reach'] == {'ACTIVE': True, 'TIMEOUT': 2.5}
+    assert parameters.active_tasks(values)[-1] == 'Reach'
+
+    task = tasks.make('Reach', values['Reach'], None)
+    with pytest.raises(AttributeError):
+        task.unknown = 1
+
+def test_missing_plugin():
+    with pytest.raises(game.SessionError, match = 'nosuchplugin'):
+        game.load_task_plugins(['nosuchplugin'])
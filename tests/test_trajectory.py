@@ -0,0 +1,64 @@
+""" test_trajectory.py
+        Tests of recording the pointer and target paths of the trials.
+"""
+
+import pytest, numpy, pygame
+
+import trajectory, sessionclock, sprites
+
+""" Class for an input device that gives no samples """
+class NoInput:
+    def read(self):
+        return []
+
+def test_rows_are_in_session_time(tmp_path):
+    clock = sessionclock.SessionClock()
+    path = str(tmp_path / 'TESTTrajectory.npz')
+    recorder = trajectory.TrajectoryRecorder(path, clock, chunk_rows = 3)
+
+    background = pygame.Surface((1920, 1080))
+    pointer = sprites.Pointer(24, NoInput())
+    pointer.reset(100, 200)
+    start = pointer.time
+    pointer.axes = (1, 0)
+
+    # every update after the first starts where the last one ended, which is already recorded
+    times = []
+    for trial in (1, 2, 3):
+        pointer.segments = []
+        pointer.move_to(pointer.time + 0.1, background)
+        recorder.add_pointer(trial, pointer)
+        times.append(pointer.time)
+    recorder.close()
+    assert recorder.error is None and recorder.total_rows == 4
+
+    columns = trajectory.read_npz(path)
+    assert list(columns['trial']) == [1, 1, 2, 3]
+    assert list(columns['t_ns']) == [clock.at(t) for t in [start] + times]
+    assert list(columns['x']) == pytest.approx([112, 112 + 60, 112 + 120, 112 + 180])
+    assert all(value != value for value in columns['target_x'])
+
+    # numpy reads the same columns
+    with numpy.load(path) as npz:
+        assert npz['t_ns'].dtype == numpy.int64
+        assert list(npz['t_ns']) == list(columns['t_ns'])
+
+def test_writer_error_is_kept_and_temporary_files_removed(tmp_path, monkeypatch, caplog):
+    def fail(self, lengths):
+        raise OSError('No space left on device')
+    monkeypatch.setattr(trajectory.TrajectoryRecorder, 'write_npz', fail)
+
+    path = str(tmp_path / 'TESTTrajectory.npz')
+    recorder = trajectory.TrajectoryRecorder(path, sessionclock.SessionClock(), chunk_rows = 2)
+    for i in range(5):
+        recorder.add(1, i, 1.0, 2.0)
+    recorder.close()
+
+    assert isinstance(recorder.error, OSError)
+    assert 'No space left on device' in caplog.text
+    assert list(tmp_path.iterdir()) == []
+
+    # rows added after the writer failed are dropped instead of queued
+    recorder.add(1, 5, 1.0, 2.0)
+    recorder.flush()
+    assert recorder.chunks.empty()